@@ -3,55 +3,146 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware import Middleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import HTTPConnection
 from starlette.templating import _TemplateResponse
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
 import psycopg2.extras
+from psycopg2.errors import QueryCanceled
 
+import bulkheads
+import invalidation_bus
+import jobs
+import queries
+import reports
+from listener import listener
+
+import db
 from db import get_connection
 from session import session_data
 
 
 # ========= MIDDLEWARE: подгружаем текущего пользователя =========
+#
+# Чистый ASGI-middleware (без BaseHTTPMiddleware): не создаёт лишних задач
+# и потоков на каждый запрос и не мешает StreamingResponse.
+# Пользователь загружается лениво — только при первом обращении
+# к request.state.user. Запросы к /static проходят мимо вообще.
+
+STATIC_PREFIX = "/static"
+
+
+def load_current_user():
+    user_id = session_data.get("current_user_id")
+    if not user_id:
+        return None
+
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    user = queries.fetchone(cursor, "employee_by_id", (user_id,))
+    conn.close()
+
+    return user
+
+
+class LazyRequestState(dict):
+    """
+    Словарь scope["state"]: ключ "user" вычисляется при первом чтении.
+    request.state.user → State.__getattr__ → dict[key] → __missing__.
+    """
+
+    def __missing__(self, key):
+        if key != "user":
+            raise KeyError(key)
+        user = load_current_user()
+        self["user"] = user
+        return user
+
+
+class AuthMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith(STATIC_PREFIX):
+            scope["state"] = LazyRequestState(scope.get("state") or {})
+
+        await self.app(scope, receive, send)
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        user = None
-
-        user_id = session_data.get("current_user_id")
-        if user_id:
-            conn = get_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-            cursor.execute("""
-                SELECT
-                    "IDСотрудника" AS id,
-                    "ФИО"          AS full_name,
-                    "Должность"    AS position,
-                    "КонтактныеДанные" AS phone,
-                    "Пароль"       AS password,
-                    "Статус"       AS status,
-                    CASE
-                        WHEN "Должность" = 'Администратор' THEN 'admin'
-                        WHEN "Должность" = 'Руководитель'  THEN 'director'
-                        WHEN "Должность" = 'Менеджер'      THEN 'manager'
-                        WHEN "Должность" = 'Зоотехник'     THEN 'zootechnician'
-                        ELSE 'zootechnician'
-                    END            AS role
-                FROM "Сотрудник"
-                WHERE "IDСотрудника" = %s
-            """, (user_id,))
-            user = cursor.fetchone()
-            conn.close()
-
-        request.state.user = user
-        response = await call_next(request)
-        return response
+
+# ========= MIDDLEWARE: чтение после записи =========
+#
+# GET-обработчики читают с реплики (db.get_read_connection). После любого
+# изменяющего запроса клиент получает короткоживущую cookie, и пока она
+# жива, его чтения идут на основной сервер — редирект после POST
+# покажет уже сохранённые данные, даже если реплика чуть отстаёт.
+
+PIN_COOKIE = "db_primary"
+PIN_SECONDS = int(db.REPLICA_MAX_LAG) + 5
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class PrimaryPinMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or db.replica_pool is None or scope["path"].startswith(STATIC_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        writes = scope["method"] not in SAFE_METHODS
+        if writes or PIN_COOKIE in HTTPConnection(scope).cookies:
+            db.primary_pinned.set(True)
+
+        if not writes:
+            await self.app(scope, receive, send)
+            return
+
+        cookie = f"{PIN_COOKIE}=1; Max-Age={PIN_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
 
 
 # ========= FASTAPI app =========
 
-app = FastAPI(middleware=[Middleware(AuthMiddleware)])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Фоновые задания (jobs.py), очередь отчётов (reports.py),
+    # LISTEN-поток (listener.py), шина инвалидации (invalidation_bus.py)
+    # и проверка реплики (db.py) работают, пока работает приложение
+    listener.start()
+    invalidation_bus.start()
+    db.replica_state.start()
+    try:
+        async with jobs.run_scheduler(), reports.run_worker():
+            yield
+    finally:
+        await asyncio.to_thread(invalidation_bus.stop)
+        await asyncio.to_thread(listener.stop)
+        await asyncio.to_thread(db.replica_state.stop)
+        db.primary_pool.close()
+        if db.replica_pool is not None:
+            db.replica_pool.close()
+
+
+app = FastAPI(
+    middleware=[
+        Middleware(bulkheads.BulkheadMiddleware),
+        Middleware(PrimaryPinMiddleware),
+        Middleware(AuthMiddleware),
+    ],
+    lifespan=lifespan,
+)
+
+app.add_exception_handler(bulkheads.BudgetExceeded, bulkheads.budget_exceeded_handler)
+app.add_exception_handler(QueryCanceled, bulkheads.statement_timeout_handler)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -88,6 +179,11 @@ from routers import (
     medical,
     rations,
     analytics_faults,
+    dossier,
+    vaccinations,
+    reports as reports_router,
+    events,
+    metrics,
 )
 
 app.include_router(auth_router)
@@ -102,6 +198,11 @@ app.include_router(analytics_expenses.router)
 app.include_router(rations.router)
 app.include_router(medical.router)
 app.include_router(analytics_faults.router)
+app.include_router(dossier.router)
+app.include_router(vaccinations.router)
+app.include_router(reports_router.router)
+app.include_router(events.router)
+app.include_router(metrics.router)
 
 
 # ========= ГЛАВНАЯ (редирект на /login) =========
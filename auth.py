@@ -3,8 +3,11 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse, HTMLResponse
 import psycopg2.extras
 
+import dashboards
+import queries
 from db import get_connection
 from session import session_data
+from table_versions import bump
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -32,28 +35,7 @@ async def login(
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-    cursor.execute("""
-        SELECT
-            "IDСотрудника" AS id,
-            "ФИО" AS full_name,
-            "Должность" AS position,
-            "КонтактныеДанные" AS phone,
-            "Пароль" AS password,
-            "Статус" AS status,
-            CASE
-                WHEN "Должность" = 'Администратор' THEN 'admin'
-                WHEN "Должность" = 'Руководитель'  THEN 'director'
-                WHEN "Должность" = 'Менеджер'      THEN 'manager'
-                WHEN "Должность" = 'Зоотехник'     THEN 'zootechnician'
-                ELSE 'zootechnician'
-            END AS role
-        FROM "Сотрудник"
-        WHERE "ФИО" = %s
-          AND "Пароль" = %s
-          AND "Статус" = 'Активен'
-    """, (full_name, password))
-
-    user = cursor.fetchone()
+    user = queries.fetchone(cursor, "employee_login", (full_name, password))
     conn.close()
 
     if not user:
@@ -66,8 +48,8 @@ async def login(
     session_data["current_user_role"] = user["role"]
     session_data["current_user_name"] = user["full_name"]
 
-    # ⬅ сразу отправляем на профиль
-    return RedirectResponse(url="/profile", status_code=303)
+    # ⬅ сразу отправляем на главную своей роли
+    return RedirectResponse(url="/home", status_code=303)
 
 
 # =====================
@@ -122,6 +104,7 @@ async def register(
 
     conn.commit()
     conn.close()
+    bump("Сотрудник")
 
     return templates.TemplateResponse(
         "register.html",
@@ -130,39 +113,31 @@ async def register(
 
 
 # =====================
-#     HOME — теперь не нужен
+#     HOME — показатели по роли (dashboards.py)
 # =====================
 
 @router.get("/home", response_class=HTMLResponse)
 async def home_page(request: Request):
-    # Полностью заменяем домашнюю страницу на переход к профилю
-    return RedirectResponse("/profile", status_code=303)
+
+    user = request.state.user
+    if not user:
+        return RedirectResponse(url="/login", status_code=303)
+
+    if user["role"] not in dashboards.TEMPLATES:
+        return RedirectResponse("/profile", status_code=303)
+
+    kpis = await dashboards.load(user["role"])
+
+    return templates.TemplateResponse(
+        dashboards.TEMPLATES[user["role"]],
+        {"request": request, "user": user, "kpis": kpis},
+    )
 
 
 # =====================
 #     PROFILE
 # =====================
 
-PROFILE_SELECT_SQL = """
-    SELECT
-        "IDСотрудника" AS id,
-        "ФИО" AS full_name,
-        "Должность" AS position,
-        "КонтактныеДанные" AS phone,
-        "Пароль" AS password,
-        "Статус" AS status,
-        CASE
-            WHEN "Должность" = 'Администратор' THEN 'admin'
-            WHEN "Должность" = 'Руководитель'  THEN 'director'
-            WHEN "Должность" = 'Менеджер'      THEN 'manager'
-            WHEN "Должность" = 'Зоотехник'     THEN 'zootechnician'
-            ELSE 'zootechnician'
-        END AS role
-    FROM "Сотрудник"
-    WHERE "IDСотрудника" = %s
-"""
-
-
 @router.get("/profile", response_class=HTMLResponse)
 async def profile_page(request: Request):
 
@@ -174,8 +149,7 @@ async def profile_page(request: Request):
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-    cursor.execute(PROFILE_SELECT_SQL, (user_id,))
-    user = cursor.fetchone()
+    user = queries.fetchone(cursor, "employee_by_id", (user_id,))
     conn.close()
 
     return templates.TemplateResponse(
@@ -209,8 +183,7 @@ async def update_profile(
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-    cursor.execute(PROFILE_SELECT_SQL, (user_id,))
-    user = cursor.fetchone()
+    user = queries.fetchone(cursor, "employee_by_id", (user_id,))
 
     if not user:
         conn.close()
@@ -236,6 +209,7 @@ async def update_profile(
     )
     conn.commit()
     conn.close()
+    bump("Сотрудник")
 
     user["password"] = new_password
 
@@ -0,0 +1,155 @@
+"""
+Микро-бенчмарк накладных расходов AuthMiddleware.
+
+Сравнивает старый вариант (BaseHTTPMiddleware + запрос пользователя
+на каждый запрос) с новым чистым ASGI-middleware из app.py на трёх
+типах запросов:
+    • /static/CSS/style.css     — статика
+    • /ping                     — обработчик, которому пользователь не нужен
+    • /whoami                   — обработчик, читающий request.state.user
+
+Запросы гоняются напрямую через ASGI-интерфейс, без сети и сервера.
+Загрузка пользователя подменяется счётчиком с искусственной задержкой
+(--query-ms), чтобы бенчмарк не требовал PostgreSQL и показывал,
+сколько раз middleware сходил бы в "Сотрудник".
+
+Запуск:
+    python bench_auth_middleware.py
+    python bench_auth_middleware.py --requests 5000 --query-ms 0.5
+"""
+
+import argparse
+import asyncio
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+import app as app_module
+from session import session_data
+
+
+class UserLoader:
+    """Заменитель запроса к "Сотрудник": считает вызовы и «спит» query_ms."""
+
+    def __init__(self, query_ms: float):
+        self.query_ms = query_ms
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.query_ms:
+            deadline = time.perf_counter() + self.query_ms / 1000
+            while time.perf_counter() < deadline:
+                pass
+        return {"id": 1, "full_name": "Бенчмарк", "role": "manager"}
+
+
+# ---------- старый вариант (как было до перехода на ASGI) ----------
+
+def make_old_middleware(loader):
+
+    class OldAuthMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            request.state.user = loader() if session_data.get("current_user_id") else None
+            return await call_next(request)
+
+    return OldAuthMiddleware
+
+
+# ---------- тестовое приложение ----------
+
+async def ping(request):
+    return PlainTextResponse("pong")
+
+
+async def whoami(request):
+    user = request.state.user
+    return PlainTextResponse(user["full_name"] if user else "-")
+
+
+def build_app(middleware_cls):
+    return Starlette(
+        routes=[
+            Route("/ping", ping),
+            Route("/whoami", whoami),
+            Mount("/static", StaticFiles(directory="static"), name="static"),
+        ],
+        middleware=[Middleware(middleware_cls)],
+    )
+
+
+async def call(asgi_app, path: str):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    status = None
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await asyncio.wait_for(asgi_app(scope, receive, send), timeout=5)
+    return status
+
+
+async def run_case(asgi_app, path: str, n: int) -> float:
+    assert await call(asgi_app, path) == 200, path
+    start = time.perf_counter()
+    for _ in range(n):
+        await call(asgi_app, path)
+    return (time.perf_counter() - start) / n * 1_000_000
+
+
+async def main(n: int, query_ms: float):
+    session_data["current_user_id"] = 1
+
+    old_loader = UserLoader(query_ms)
+    new_loader = UserLoader(query_ms)
+
+    old_app = build_app(make_old_middleware(old_loader))
+
+    app_module.load_current_user = new_loader
+    new_app = build_app(app_module.AuthMiddleware)
+
+    print(f"Запросов на случай: {n}, имитация запроса к БД: {query_ms} мс\n")
+    print(f"{'путь':<24}{'старый, мкс':>14}{'новый, мкс':>14}{'запросов к БД (стар/нов)':>30}")
+
+    for path in ("/static/CSS/style.css", "/ping", "/whoami"):
+        old_loader.calls = new_loader.calls = 0
+        old_us = await run_case(old_app, path, n)
+        new_us = await run_case(new_app, path, n)
+        print(f"{path:<24}{old_us:>14.1f}{new_us:>14.1f}"
+              f"{f'{old_loader.calls} / {new_loader.calls}':>30}")
+
+    session_data.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--query-ms", type=float, default=0.3)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests, args.query_ms))
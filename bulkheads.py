@@ -0,0 +1,234 @@
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+from psycopg2 import errors
+
+from db import current_route, request_connections, release_request_connections
+
+# ==========================================================
+# ПЕРЕГОРОДКИ (BULKHEADS) ПО КЛАССАМ МАРШРУТОВ
+#
+# Тяжёлая аналитика или выгрузка за всю историю не должна занимать
+# соединения, нужные зоотехнику, чтобы записать кормление. Каждый запрос
+# относится к одному классу (classify), и у класса свои:
+#   • лимит одновременных запросов (семафор; слот держится, пока
+#     не отправлен весь ответ — в том числе поток CSV);
+#   • бюджет соединений с БД (проверяется в db при выдаче соединения);
+#   • statement_timeout для всех запросов этого класса.
+# Соединения, не закрытые обработчиком (ошибка до conn.close()),
+# закрываются после ответа — бюджет возвращается в любом случае.
+#
+# Если мест нет — сразу 503 с Retry-After вместо бесконечной очереди.
+# Счётчики по классам — /metrics (routers/metrics.py).
+# ==========================================================
+
+
+class BudgetExceeded(Exception):
+    """Класс маршрута исчерпал свой лимит — отвечаем 503."""
+
+    def __init__(self, route: "RouteClass", what: str):
+        super().__init__(f"{route.name}: {what}")
+        self.route = route
+
+
+@dataclass(eq=False)
+class RouteClass:
+    name: str
+    concurrency: int             # одновременных запросов
+    connections: int             # одновременно выданных соединений
+    statement_timeout_ms: int
+    queue_seconds: float         # сколько запрос может подождать слот
+    retry_after: int             # подсказка клиенту в 503
+
+    active: int = 0
+    peak: int = 0
+    served: int = 0
+    rejected: int = 0
+    connections_in_use: int = 0
+    connections_rejected: int = 0
+    _semaphore: asyncio.Semaphore | None = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    # --- слоты запросов (в цикле событий) ---
+
+    async def enter(self) -> bool:
+        try:
+            if self.queue_seconds > 0:
+                await asyncio.wait_for(self.semaphore.acquire(), self.queue_seconds)
+            elif self.semaphore.locked():
+                raise asyncio.TimeoutError
+            else:
+                await self.semaphore.acquire()
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        return True
+
+    def leave(self):
+        self.active -= 1
+        self.served += 1
+        self.semaphore.release()
+
+    # --- соединения (вызывается из db, в т.ч. из потоков) ---
+
+    def take_connection(self):
+        with self._lock:
+            if self.connections_in_use >= self.connections:
+                self.connections_rejected += 1
+                raise BudgetExceeded(self, "connection budget exhausted")
+            self.connections_in_use += 1
+
+    def give_connection(self):
+        with self._lock:
+            self.connections_in_use -= 1
+
+    def metrics(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "peak": self.peak,
+            "saturation": round(self.active / self.concurrency, 2),
+            "served": self.served,
+            "rejected": self.rejected,
+            "connections": self.connections,
+            "connections_in_use": self.connections_in_use,
+            "connections_rejected": self.connections_rejected,
+            "statement_timeout_ms": self.statement_timeout_ms,
+        }
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+# Сумма бюджетов соединений укладывается в DB_POOL_MAX (20 по умолчанию)
+ROUTE_CLASSES = {
+    "write": RouteClass(
+        "write",
+        concurrency=_env_int("BULKHEAD_WRITE_CONCURRENCY", 16),
+        connections=_env_int("BULKHEAD_WRITE_CONNECTIONS", 8),
+        statement_timeout_ms=_env_int("BULKHEAD_WRITE_TIMEOUT_MS", 5_000),
+        queue_seconds=2, retry_after=1,
+    ),
+    "read": RouteClass(
+        "read",
+        concurrency=_env_int("BULKHEAD_READ_CONCURRENCY", 16),
+        connections=_env_int("BULKHEAD_READ_CONNECTIONS", 8),
+        statement_timeout_ms=_env_int("BULKHEAD_READ_TIMEOUT_MS", 10_000),
+        queue_seconds=1, retry_after=1,
+    ),
+    "analytics": RouteClass(
+        "analytics",
+        concurrency=_env_int("BULKHEAD_ANALYTICS_CONCURRENCY", 2),
+        connections=_env_int("BULKHEAD_ANALYTICS_CONNECTIONS", 2),
+        statement_timeout_ms=_env_int("BULKHEAD_ANALYTICS_TIMEOUT_MS", 30_000),
+        queue_seconds=0, retry_after=5,
+    ),
+    "export": RouteClass(
+        "export",
+        concurrency=_env_int("BULKHEAD_EXPORT_CONCURRENCY", 2),
+        connections=_env_int("BULKHEAD_EXPORT_CONNECTIONS", 2),
+        statement_timeout_ms=_env_int("BULKHEAD_EXPORT_TIMEOUT_MS", 120_000),
+        queue_seconds=0, retry_after=10,
+    ),
+}
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Без БД или долгоживущие без запросов к БД: SSE, статика, готовые файлы отчётов
+EXEMPT_PREFIXES = ("/static", "/events", "/metrics")
+
+
+def classify(method: str, path: str) -> RouteClass | None:
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/reports/") and path.endswith("/download"):
+        return None
+
+    # Массовая загрузка CSV — такая же долгая, как выгрузка
+    if path.endswith("/export/csv") or path.endswith("/import") and method == "POST":
+        return ROUTE_CLASSES["export"]
+    if method not in SAFE_METHODS:
+        return ROUTE_CLASSES["write"]
+    if path.startswith("/analytics"):
+        return ROUTE_CLASSES["analytics"]
+    return ROUTE_CLASSES["read"]
+
+
+def retry_after_response(route: RouteClass) -> tuple[int, list, bytes]:
+    body = f"Сервер занят ({route.name}), повторите через {route.retry_after} с".encode()
+    headers = [
+        (b"content-type", b"text/plain; charset=utf-8"),
+        (b"retry-after", str(route.retry_after).encode()),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    return 503, headers, body
+
+
+class BulkheadMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        route = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await route.enter():
+            status, headers, body = retry_after_response(route)
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        token = current_route.set(route)
+        conns: list = []
+        conns_token = request_connections.set(conns)
+        try:
+            # Возвращается только после отправки всего тела ответа
+            await self.app(scope, receive, send)
+        finally:
+            release_request_connections(conns)
+            request_connections.reset(conns_token)
+            current_route.reset(token)
+            route.leave()
+
+
+# ----------------------------------------------------------
+# Обработчики исключений (app.py)
+# ----------------------------------------------------------
+
+def _busy(route: RouteClass | None, text: str) -> PlainTextResponse:
+    retry_after = route.retry_after if route else 1
+    return PlainTextResponse(text, status_code=503, headers={"Retry-After": str(retry_after)})
+
+
+async def budget_exceeded_handler(request: Request, exc: BudgetExceeded):
+    return _busy(exc.route, f"Сервер занят ({exc.route.name}), повторите позже")
+
+
+async def statement_timeout_handler(request: Request, exc: errors.QueryCanceled):
+    # Сработал statement_timeout класса маршрута
+    route = current_route.get()
+    return _busy(route, "Запрос выполнялся слишком долго, повторите позже или сузьте период")
+
+
+def metrics() -> dict:
+    return {
+        "time": time.time(),
+        "classes": {name: rc.metrics() for name, rc in ROUTE_CLASSES.items()},
+    }
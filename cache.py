@@ -0,0 +1,53 @@
+import time
+
+import table_versions
+
+# ================================
+# ЛОКАЛЬНЫЙ КЭШ РЕЗУЛЬТАТОВ
+# ================================
+# Запись кэша помнит версии таблиц, из которых она посчитана
+# (см. table_versions.py). Как только любой путь записи сделает
+# bump() одной из этих таблиц, запись считается устаревшей.
+# Дополнительно можно задать TTL в секундах.
+
+
+class TableCache:
+
+    def __init__(self, tables, ttl: float | None = None, max_entries: int = 256):
+        self.tables = tuple(tables)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: dict = {}
+
+    def get(self, key):
+        """Значение или None, если записи нет или она устарела."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        versions, expires_at, value = entry
+        if versions != table_versions.snapshot(self.tables) or (
+            expires_at is not None and expires_at < time.monotonic()
+        ):
+            self._data.pop(key, None)
+            return None
+
+        return value
+
+    def versions(self) -> tuple:
+        """
+        Снимок версий до чтения из БД: если изменение (в т.ч. из другого
+        процесса) придёт во время запроса, запись сразу будет устаревшей.
+        """
+        return table_versions.snapshot(self.tables)
+
+    def set(self, key, value, versions: tuple | None = None):
+        if len(self._data) >= self.max_entries:
+            # Самая старая запись — первая в dict
+            self._data.pop(next(iter(self._data)), None)
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (versions or self.versions(), expires_at, value)
+
+    def clear(self):
+        self._data.clear()
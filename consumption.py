@@ -0,0 +1,164 @@
+from datetime import date, timedelta
+
+# ==========================================================
+# ДИНАМИКА РАСХОДА КОРМА (временной ряд для графика)
+#
+# Источник — сводки по дням, а не сырые таблицы:
+#   "СводкаРасходаПоДням"  — по кормам и сотрудникам (из "Расход");
+#   "СводкаРасходаПоВидам" — то же с видом животного (из "Кормление":
+#                            у "Расход" нет связи с животным, поэтому
+#                            количество берётся по норме рациона вида).
+# Сводки обновляет задание expense_rollup (jobs.py) за последние
+# ROLLUP_DAYS дней, сегодняшний день дочитывается из живых таблиц.
+#
+# Пропущенные дни/недели/месяцы заполняются нулями (generate_series).
+# Если точек получается больше MAX_POINTS, шаг укрупняется:
+# день → неделя → месяц → год.
+# ==========================================================
+
+GRAINS = ["day", "week", "month", "year"]
+STEPS = {"day": "1 day", "week": "1 week", "month": "1 month", "year": "1 year"}
+MAX_POINTS = 400
+DEFAULT_DAYS = 90
+
+# Расход по норме рациона вида — так же, как списывает feedings.feeding_add
+# (первый рацион вида)
+SPECIES_CONSUMPTION_SELECT = """
+    SELECT
+        f."ДатаИВремя"::date AS "Дата",
+        j."Вид"              AS "ВидЖивотного",
+        r."IDКорма",
+        f."IDСотрудника",
+        SUM(r."Количество")  AS "Количество"
+    FROM "Кормление" f
+    JOIN "Животное" j ON j."IDЖивотного" = f."IDЖивотного"
+    JOIN LATERAL (
+        SELECT "IDКорма", "Количество"
+        FROM "Рацион"
+        WHERE "ВидЖивотного" = j."Вид"
+        ORDER BY "IDРациона"
+        LIMIT 1
+    ) r ON TRUE
+    WHERE f."ДатаИВремя" >= %(since)s
+    GROUP BY 1, 2, 3, 4
+"""
+
+SERIES_SQL = """
+    WITH src AS (
+        SELECT "Дата", "Количество"
+        FROM {rollup}
+        WHERE "Дата" BETWEEN %(date_from)s AND LEAST(%(date_to)s, CURRENT_DATE - 1)
+          {filters}
+
+        UNION ALL
+
+        SELECT "Дата", "Количество"
+        FROM ({live}) AS today
+        WHERE "Дата" = CURRENT_DATE
+          AND CURRENT_DATE BETWEEN %(date_from)s AND %(date_to)s
+          {filters}
+    ),
+    agg AS (
+        SELECT date_trunc(%(grain)s, "Дата")::date AS bucket, SUM("Количество") AS total
+        FROM src
+        GROUP BY 1
+    )
+    SELECT b.bucket, COALESCE(a.total, 0) AS total
+    FROM generate_series(
+        date_trunc(%(grain)s, %(date_from)s::date),
+        date_trunc(%(grain)s, %(date_to)s::date),
+        %(step)s::interval
+    ) AS b(bucket)
+    LEFT JOIN agg a ON a.bucket = b.bucket::date
+    ORDER BY b.bucket
+"""
+
+# Списки для фильтров графика — одним запросом
+FILTERS_SQL = """
+    SELECT
+        (SELECT json_agg(json_build_object('id', "IDКорма", 'name', "Наименование")
+                         ORDER BY "Наименование")
+         FROM "Корм") AS feeds,
+        (SELECT json_agg(json_build_object('id', "IDСотрудника", 'name', "ФИО")
+                         ORDER BY "ФИО")
+         FROM "Сотрудник"
+         WHERE "Должность" = 'Зоотехник') AS employees,
+        (SELECT json_agg(DISTINCT "ВидЖивотного")
+         FROM "Рацион") AS species
+"""
+
+EXPENSES_TODAY = """
+    SELECT "Дата", "IDКорма", "IDСотрудника", "Количество"
+    FROM "Расход"
+    WHERE "Дата" = CURRENT_DATE
+"""
+
+SPECIES_TODAY = SPECIES_CONSUMPTION_SELECT.replace("%(since)s", "CURRENT_DATE")
+
+
+def _trunc(d: date, grain: str) -> date:
+    if grain == "week":
+        return d - timedelta(days=d.weekday())
+    if grain == "month":
+        return d.replace(day=1)
+    if grain == "year":
+        return d.replace(month=1, day=1)
+    return d
+
+
+def point_count(date_from: date, date_to: date, grain: str) -> int:
+    a, b = _trunc(date_from, grain), _trunc(date_to, grain)
+    if grain == "day":
+        return (b - a).days + 1
+    if grain == "week":
+        return (b - a).days // 7 + 1
+    if grain == "month":
+        return (b.year - a.year) * 12 + b.month - a.month + 1
+    return b.year - a.year + 1
+
+
+def choose_grain(date_from: date, date_to: date, grain: str) -> str:
+    """Запрошенный шаг или более крупный, если точек слишком много."""
+    for g in GRAINS[GRAINS.index(grain):]:
+        if point_count(date_from, date_to, g) <= MAX_POINTS:
+            return g
+    return GRAINS[-1]
+
+
+def label(d: date, grain: str) -> str:
+    if grain == "day":
+        return d.strftime("%d.%m.%Y")
+    if grain == "week":
+        return "нед. " + d.strftime("%d.%m.%Y")
+    if grain == "month":
+        return d.strftime("%m.%Y")
+    return str(d.year)
+
+
+def series_query(date_from: date, date_to: date, grain: str,
+                 feed_id: int | None = None, employee_id: int | None = None,
+                 species: str | None = None) -> tuple[str, dict]:
+    filters = []
+    params = {
+        "date_from": date_from,
+        "date_to": date_to,
+        "grain": grain,
+        "step": STEPS[grain],
+    }
+
+    if feed_id:
+        filters.append('AND "IDКорма" = %(feed_id)s')
+        params["feed_id"] = feed_id
+    if employee_id:
+        filters.append('AND "IDСотрудника" = %(employee_id)s')
+        params["employee_id"] = employee_id
+
+    if species:
+        filters.append('AND "ВидЖивотного" = %(species)s')
+        params["species"] = species
+        rollup, live = '"СводкаРасходаПоВидам"', SPECIES_TODAY
+    else:
+        rollup, live = '"СводкаРасходаПоДням"', EXPENSES_TODAY
+
+    sql = SERIES_SQL.format(rollup=rollup, live=live, filters="\n          ".join(filters))
+    return sql, params
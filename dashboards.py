@@ -0,0 +1,173 @@
+from dataclasses import dataclass
+
+import singleflight
+from cache import TableCache
+from db import primary_pinned
+
+# ==========================================================
+# ГЛАВНАЯ: ПАНЕЛИ ПОКАЗАТЕЛЕЙ ПО РОЛЯМ (/home)
+#
+# Каждый показатель — CTE + выражение в итоговом SELECT. Для роли
+# из её показателей собирается один запрос, результат лежит в кэше
+# роли с коротким TTL: в начале смены все входят почти одновременно,
+# и агрегаты считаются один раз на роль, а не на каждого.
+#
+# Промах кэша у нескольких пользователей сразу — тоже одно выполнение
+# (singleflight). Читаем с основного сервера: результат кэшируется
+# под текущими версиями таблиц (см. cache.py).
+# ==========================================================
+
+TTL_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class Kpi:
+    name: str
+    tables: tuple[str, ...]
+    ctes: str       # "имя AS (...)" через запятую
+    select: str     # выражение итогового SELECT
+
+
+KPIS = {k.name: k for k in [
+    Kpi(
+        "open_malfunctions",
+        ("Неисправность",),
+        """
+        open_faults AS (
+            SELECT
+                COUNT(*)                                   AS total,
+                COUNT(*) FILTER (WHERE "Место" = 'Вольер')  AS enclosure,
+                COUNT(*) FILTER (WHERE "Место" = 'Участок') AS site
+            FROM "Неисправность"
+            WHERE "СтатусУстранения" <> 'Устранено'
+        )""",
+        "(SELECT to_json(o) FROM open_faults o)",
+    ),
+    Kpi(
+        "low_feeds",
+        ("Корм", "Рацион"),
+        # Как "на исходе" в routers/feeds.py: остаток меньше средней нормы
+        """
+        low_feeds AS (
+            SELECT
+                k."Наименование"        AS name,
+                k."ОстатокНаСкладе"     AS stock,
+                ROUND(r.avg_qty, 2)     AS avg_qty
+            FROM "Корм" k
+            JOIN (
+                SELECT "IDКорма", AVG("Количество") AS avg_qty
+                FROM "Рацион"
+                GROUP BY "IDКорма"
+            ) r ON r."IDКорма" = k."IDКорма"
+            WHERE k."ОстатокНаСкладе" < r.avg_qty
+        )""",
+        "(SELECT COALESCE(json_agg(l ORDER BY l.stock), '[]') FROM low_feeds l)",
+    ),
+    Kpi(
+        "pending_purchases",
+        ("Закупка",),
+        """
+        pending AS (
+            SELECT
+                COUNT(*)                                                     AS total,
+                COUNT(*) FILTER (WHERE "СтатусПоставки" = 'Заявка отправлена') AS sent,
+                COUNT(*) FILTER (WHERE "СтатусПоставки" = 'Ожидание')          AS waiting
+            FROM "Закупка"
+            WHERE "СтатусПоставки" <> 'Доставлено'
+        )""",
+        "(SELECT to_json(p) FROM pending p)",
+    ),
+    Kpi(
+        "sick_animals",
+        ("Животное",),
+        """
+        sick AS (
+            SELECT COUNT(*) AS total
+            FROM "Животное"
+            WHERE "СостояниеЗдоровья" = 'Лечится'
+        )""",
+        "(SELECT total FROM sick)",
+    ),
+    Kpi(
+        "feedings_today",
+        ("Кормление", "СлотКормления", "Сотрудник"),
+        # Проведено кормлений и запланировано слотов на сегодня по зоотехникам
+        """
+        fed_today AS (
+            SELECT "IDСотрудника", COUNT(*) AS done
+            FROM "Кормление"
+            WHERE "ДатаИВремя" >= CURRENT_DATE AND "ДатаИВремя" < CURRENT_DATE + 1
+            GROUP BY "IDСотрудника"
+        ),
+        planned_today AS (
+            SELECT "IDСотрудника", COUNT(*) AS planned
+            FROM "СлотКормления"
+            WHERE "Дата" = CURRENT_DATE
+            GROUP BY "IDСотрудника"
+        ),
+        keepers AS (
+            SELECT
+                s."IDСотрудника"       AS id,
+                s."ФИО"                AS name,
+                COALESCE(f.done, 0)    AS done,
+                COALESCE(p.planned, 0) AS planned
+            FROM "Сотрудник" s
+            LEFT JOIN fed_today f     ON f."IDСотрудника" = s."IDСотрудника"
+            LEFT JOIN planned_today p ON p."IDСотрудника" = s."IDСотрудника"
+            WHERE s."Должность" = 'Зоотехник'
+        )""",
+        "(SELECT COALESCE(json_agg(k ORDER BY k.name), '[]') FROM keepers k)",
+    ),
+]}
+
+ROLE_KPIS = {
+    "admin": ["open_malfunctions", "low_feeds", "pending_purchases", "sick_animals", "feedings_today"],
+    "director": ["open_malfunctions", "pending_purchases", "sick_animals", "low_feeds", "feedings_today"],
+    "manager": ["sick_animals", "low_feeds", "pending_purchases", "open_malfunctions"],
+    "zootechnician": ["feedings_today", "low_feeds", "sick_animals", "open_malfunctions"],
+}
+
+TEMPLATES = {
+    "admin": "home_admin.html",
+    "director": "home_director.html",
+    "manager": "home_manager.html",
+    "zootechnician": "home_zootechnician.html",
+}
+
+
+def role_sql(role: str) -> str:
+    kpis = [KPIS[name] for name in ROLE_KPIS[role]]
+    ctes = ",".join(k.ctes for k in kpis)
+    columns = ",\n        ".join(f"{k.select} AS {k.name}" for k in kpis)
+    return f"WITH {ctes}\n    SELECT\n        {columns}"
+
+
+ROLE_SQL = {role: role_sql(role) for role in ROLE_KPIS}
+
+_caches = {
+    role: TableCache(
+        sorted({t for name in names for t in KPIS[name].tables}),
+        ttl=TTL_SECONDS,
+        max_entries=1,
+    )
+    for role, names in ROLE_KPIS.items()
+}
+
+
+async def load(role: str) -> dict:
+    """Показатели роли (из кэша или одним запросом)."""
+    cache = _caches[role]
+
+    kpis = cache.get(role)
+    if kpis is None:
+        versions = cache.versions()
+
+        token = primary_pinned.set(True)
+        try:
+            kpis = await singleflight.fetchone(ROLE_SQL[role])
+        finally:
+            primary_pinned.reset(token)
+
+        cache.set(role, kpis, versions)
+
+    return kpis
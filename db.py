@@ -1,28 +1,364 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
+
+log = logging.getLogger("zoo.db")
 
 # ================================
 # НАСТРОЙКИ ПОДКЛЮЧЕНИЯ К POSTGRES
+#
+# Берутся из окружения; значения по умолчанию — локальная БД разработчика.
+# Реплика необязательна: если DB_REPLICA_HOST не задан, все запросы
+# идут на основной сервер.
 # ================================
 
 DB_SETTINGS = {
-    "host": "localhost",        # или IP, если внешний сервер
-    "port": 5432,
-    "dbname": "Зоопарк",            # имя твоей БД в PostgreSQL
-    "user": "postgres",
-    "password": "killeu1501"        # твой пароль
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", "5432")),
+    "dbname": os.getenv("DB_NAME", "Зоопарк"),
+    "user": os.getenv("DB_USER", "postgres"),
+    "password": os.getenv("DB_PASSWORD", "killeu1501"),
 }
 
+REPLICA_SETTINGS = None
+if os.getenv("DB_REPLICA_HOST"):
+    REPLICA_SETTINGS = {
+        **DB_SETTINGS,
+        "host": os.environ["DB_REPLICA_HOST"],
+        "port": int(os.getenv("DB_REPLICA_PORT", str(DB_SETTINGS["port"]))),
+        "user": os.getenv("DB_REPLICA_USER", DB_SETTINGS["user"]),
+        "password": os.getenv("DB_REPLICA_PASSWORD", DB_SETTINGS["password"]),
+        # Недоступная реплика не должна держать запрос до таймаута ОС
+        "connect_timeout": int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2")),
+    }
+
+# psycopg2-пул держит открытыми не больше POOL_MIN свободных соединений,
+# остальные (до POOL_MAX одновременно) закрываются при возврате
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "5"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+
+# Реплика отстаёт сильнее — читаем с основного сервера
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+# Как часто фоновый поток перепроверяет отставание (и доступность) реплики
+REPLICA_CHECK_SECONDS = float(os.getenv("DB_REPLICA_CHECK_SECONDS", "2"))
+
+# Соединение простояло в пуле дольше — перед выдачей проверяем, живо ли оно.
+# Соединения реплики проверяются всегда: она может упасть или смениться
+# независимо от основного сервера, а обрыв должен стать переходом
+# на основной сервер, а не ошибкой в обработчике
+IDLE_PING_SECONDS = 30
+REPLICA_IDLE_PING_SECONDS = 0
+
+
+# ================================
+# ПУЛ СОЕДИНЕНИЙ
+# ================================
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    Соединение из пула: conn.close() возвращает его в пул,
+    поэтому существующий код (get_connection() ... conn.close()) не меняется.
+    """
+
+    pool = None
+    route = None
+    owner = None          # список соединений запроса (request_connections)
+    released_at = 0.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Подготовленные на этом соединении запросы (queries.py)
+        self.prepared: set[str] = set()
+        # None — значение сервера по умолчанию
+        self.statement_timeout: int | None = None
+
+    def close(self):
+        # Соединение реплики оборвалось посреди запроса — до следующей
+        # проверки читаем с основного сервера
+        if self.closed and self.pool is not None and self.pool is replica_pool:
+            replica_state.usable = False
+
+        owner, self.owner = self.owner, None
+        if owner is not None:
+            try:
+                owner.remove(self)
+            except ValueError:
+                pass
+
+        route, self.route = self.route, None
+        if route is not None:
+            route.give_connection()
+
+        pool, self.pool = self.pool, None
+        if pool is None or self.closed:
+            super().close()
+        else:
+            pool.release(self)
+
+
+class ConnectionPool:
+    def __init__(self, name: str, settings: dict, minconn: int = POOL_MIN, maxconn: int = POOL_MAX,
+                 ping_after: float = IDLE_PING_SECONDS):
+        self.name = name
+        self.settings = settings
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.ping_after = ping_after
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> psycopg2.pool.ThreadedConnectionPool:
+        # Создаётся при первом запросе: импорт модуля не ходит в БД
+        with self._lock:
+            if self._pool is None:
+                self._pool = psycopg2.pool.ThreadedConnectionPool(
+                    self.minconn, self.maxconn,
+                    connection_factory=PooledConnection, **self.settings
+                )
+            return self._pool
+
+    def acquire(self) -> PooledConnection:
+        pool = self._get_pool()
+        while True:
+            try:
+                conn = pool.getconn()
+            except psycopg2.pool.PoolError:
+                # Пул исчерпан — отдельное соединение, закроется по close()
+                log.warning("Пул %s исчерпан (%s), открываю соединение вне пула", self.name, self.maxconn)
+                return psycopg2.connect(connection_factory=PooledConnection, **self.settings)
+
+            if conn.released_at and time.monotonic() - conn.released_at >= self.ping_after:
+                try:
+                    conn.cursor().execute("SELECT 1")
+                    conn.rollback()
+                except psycopg2.Error:
+                    pool.putconn(conn, close=True)
+                    continue
+
+            conn.pool = self
+            return conn
+
+    def release(self, conn: PooledConnection):
+        try:
+            # Незавершённая транзакция (в т.ч. именованные курсоры) откатывается
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+            conn.released_at = time.monotonic()
+            self._pool.putconn(conn)
+        except (psycopg2.Error, psycopg2.pool.PoolError):
+            try:
+                self._pool.putconn(conn, close=True)
+            except psycopg2.pool.PoolError:
+                psycopg2.extensions.connection.close(conn)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+
+primary_pool = ConnectionPool("primary", DB_SETTINGS)
+replica_pool = (
+    ConnectionPool("replica", REPLICA_SETTINGS, ping_after=REPLICA_IDLE_PING_SECONDS)
+    if REPLICA_SETTINGS else None
+)
+
+
 # ================================
-# ФУНКЦИЯ ПОЛУЧЕНИЯ СОЕДИНЕНИЯ
+# ФУНКЦИИ ПОЛУЧЕНИЯ СОЕДИНЕНИЯ
 # ================================
 
+# Класс маршрута текущего запроса (bulkheads.BulkheadMiddleware):
+# бюджет соединений и statement_timeout. Вне запросов — None.
+current_route: contextvars.ContextVar = contextvars.ContextVar("current_route", default=None)
+
+# Соединения, выданные за время HTTP-запроса (тоже BulkheadMiddleware).
+# Если обработчик не дошёл до conn.close() — исключение, в том числе
+# отмена по statement_timeout, — соединение закрывается после ответа:
+# иначе не вернутся ни бюджет класса маршрута, ни место в пуле.
+request_connections: contextvars.ContextVar = contextvars.ContextVar("request_connections", default=None)
+
+
+def release_request_connections(conns: list):
+    """Закрывает соединения запроса, которые обработчик не закрыл сам."""
+    for conn in list(conns):
+        log.warning("Соединение не закрыто обработчиком — возвращаю в пул")
+        try:
+            conn.close()
+        except Exception:
+            log.exception("Не удалось вернуть соединение в пул")
+
+
+def detach_from_request():
+    """
+    Для потоков, которые сами закрывают своё соединение и могут пережить
+    запрос (singleflight, экспорт CSV): их соединения не закрываются
+    при завершении запроса. Вызывать внутри контекста потока.
+    """
+    request_connections.set(None)
+
+
+def _set_statement_timeout(conn: PooledConnection, timeout_ms: int | None):
+    if conn.statement_timeout == timeout_ms:
+        return
+    cursor = conn.cursor()
+    if timeout_ms is None:
+        cursor.execute("RESET statement_timeout")
+    else:
+        cursor.execute("SET statement_timeout = %s", (timeout_ms,))
+    # SET внутри отменённой транзакции откатился бы вместе с ней
+    conn.commit()
+    conn.statement_timeout = timeout_ms
+
+
+def _checkout(pool: "ConnectionPool") -> PooledConnection:
+    route = current_route.get()
+    if route is not None:
+        route.take_connection()
+
+    try:
+        conn = pool.acquire()
+    except BaseException:
+        if route is not None:
+            route.give_connection()
+        raise
+
+    conn.route = route
+    try:
+        _set_statement_timeout(conn, route.statement_timeout_ms if route else None)
+    except BaseException:
+        conn.close()
+        raise
+
+    owner = request_connections.get()
+    if owner is not None:
+        owner.append(conn)
+        conn.owner = owner
+    return conn
+
+
 def get_connection():
-    conn = psycopg2.connect(
-        host=DB_SETTINGS["host"],
-        port=DB_SETTINGS["port"],
-        dbname=DB_SETTINGS["dbname"],
-        user=DB_SETTINGS["user"],
-        password=DB_SETTINGS["password"]
-    )
-    return conn
\ No newline at end of file
+    """Соединение с основным сервером (запись и чтение после записи)."""
+    return _checkout(primary_pool)
+
+
+def get_dedicated_connection():
+    """
+    Отдельное соединение вне пула — для долгих сессий со своим состоянием
+    (LISTEN, сессионные advisory lock), которое нельзя возвращать в пул.
+    """
+    return psycopg2.connect(**DB_SETTINGS)
+
+
+# ----------------------------------------------------------
+# Чтение с реплики
+# ----------------------------------------------------------
+
+# Выставляется на время запроса (app.PrimaryPinMiddleware): клиент только
+# что писал — его чтения идут на основной сервер, чтобы он видел свои изменения
+primary_pinned: contextvars.ContextVar[bool] = contextvars.ContextVar("primary_pinned", default=False)
+
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class ReplicaState:
+    """
+    Результат последней проверки реплики (общий для процесса).
+
+    Проверяет фоновый поток (start() в lifespan app.py) через одно
+    собственное соединение, а не через пул: запросы только читают usable
+    и никогда не ждут недоступную реплику.
+    """
+
+    def __init__(self):
+        self.usable = False
+        self.lag = None
+        self.checked_at = 0.0
+        self._conn = None
+        self._thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def _lag(self) -> float:
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(**REPLICA_SETTINGS)
+            self._conn.autocommit = True
+        cursor = self._conn.cursor()
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+    def check(self):
+        try:
+            lag = self._lag()
+        except psycopg2.Error:
+            if self.usable:
+                log.exception("Реплика недоступна — чтение с основного сервера")
+            self._close()
+            self.lag, self.usable = None, False
+        else:
+            if self.usable and lag > REPLICA_MAX_LAG:
+                log.warning("Реплика отстаёт на %.1f с — чтение с основного сервера", lag)
+            self.lag, self.usable = lag, lag <= REPLICA_MAX_LAG
+        finally:
+            self.checked_at = time.monotonic()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self.check()
+            self._stopping.wait(REPLICA_CHECK_SECONDS)
+        self._close()
+
+    def start(self):
+        if replica_pool is None or (self._thread and self._thread.is_alive()):
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-check", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout=REPLICA_SETTINGS["connect_timeout"] + REPLICA_CHECK_SECONDS + 1)
+        self.usable = False
+
+
+replica_state = ReplicaState()
+
+
+def get_read_connection():
+    """
+    Соединение для чтения: реплика, если она настроена, доступна,
+    отстаёт не больше REPLICA_MAX_LAG и клиент не писал только что.
+    Иначе — основной сервер. Только для запросов без записи.
+    """
+    if replica_pool is None or primary_pinned.get() or not replica_state.usable:
+        return get_connection()
+
+    try:
+        return _checkout(replica_pool)
+    except psycopg2.OperationalError:
+        replica_state.usable = False
+        return get_connection()
@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import threading
+
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from psycopg2 import errors
+
+from db import detach_from_request, get_read_connection
+
+# ==========================================================
+# ЭКСПОРТ СПИСКОВ В CSV ЧЕРЕЗ COPY
+#
+# Запрос списка (с теми же фильтрами, что и HTML-страница) оборачивается
+# в COPY (SELECT ...) TO STDOUT WITH CSV: строки форматирует сам Postgres,
+# Python лишь пересылает готовые байты клиенту.
+#
+# copy_expert блокирующий, поэтому выполняется в отдельном потоке и
+# складывает куски в ограниченную очередь: медленный клиент тормозит
+# чтение из БД, а не копит весь файл в памяти.
+#
+# Ответ отдаётся только после первого куска (или конца выгрузки): ошибка
+# запроса — statement_timeout, кривой фильтр — успевает стать 503/400,
+# а не оборванным файлом с кодом 200.
+# ==========================================================
+
+CHUNK_SIZE = 64 * 1024
+QUEUE_CHUNKS = 16
+
+CSV_OPTIONS = "FORMAT csv, HEADER, DELIMITER ';', ENCODING 'UTF8'"
+
+
+class ExportCancelled(Exception):
+    """Клиент закрыл соединение — COPY прерывается."""
+
+
+class _QueueWriter:
+    """Файлоподобный приёмник для copy_expert: копит байты и отдаёт кусками."""
+
+    def __init__(self, loop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+        self.buffer = bytearray()
+        self.cancelled = threading.Event()
+
+    def _put(self, item):
+        if self.cancelled.is_set():
+            raise ExportCancelled()
+        asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+    def write(self, data):
+        # copy_expert пишет по одной строке — отправляем крупными кусками
+        self.buffer += data
+        if len(self.buffer) >= CHUNK_SIZE:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def flush(self):
+        if self.buffer:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+
+
+def export_sql(sql: str, columns: list[tuple[str, str]], order_by: str) -> str:
+    """
+    Обёртка над запросом списка: только нужные колонки
+    с русскими заголовками. ORDER BY подзапроса внешний запрос
+    сохранять не обязан, поэтому порядок задаётся снаружи — order_by
+    по колонкам списка (t.<псевдоним>), тот же, что в запросе списка:
+    тогда Postgres использует уже отсортированный подзапрос.
+    """
+    select = ", ".join(f't."{alias}" AS "{header}"' for alias, header in columns)
+    return f"SELECT {select} FROM ({sql}) AS t ORDER BY {order_by}"
+
+
+def _run_copy(sql: str, params, writer: _QueueWriter):
+    conn = get_read_connection()
+    try:
+        cursor = conn.cursor()
+        query = cursor.mogrify(sql, params).decode()
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH ({CSV_OPTIONS})", writer)
+        writer.flush()
+    finally:
+        conn.close()
+
+
+async def _start(sql: str, params):
+    """Запускает COPY и ждёт первый кусок; ошибка запроса поднимается здесь."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_CHUNKS)
+    writer = _QueueWriter(loop, queue)
+    done = object()
+
+    def worker():
+        # Поток закрывает соединение сам (_run_copy) и может ещё дописывать,
+        # когда ответ уже прерван
+        detach_from_request()
+        try:
+            _run_copy(sql, params, writer)
+        except ExportCancelled:
+            return
+        except Exception as exc:
+            if not writer.cancelled.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(exc), loop).result()
+            return
+        if not writer.cancelled.is_set():
+            asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+
+    def cancel():
+        # Клиент ушёл или ошибка: освобождаем поток, ждущий места в очереди
+        writer.cancelled.set()
+        while not queue.empty():
+            queue.get_nowait()
+
+    # Контекст запроса (класс маршрута, привязка к основному серверу) — в поток
+    ctx = contextvars.copy_context()
+    thread = threading.Thread(target=ctx.run, args=(worker,), name="csv-export", daemon=True)
+    thread.start()
+
+    try:
+        first = await queue.get()
+        if isinstance(first, Exception):
+            raise first
+    except BaseException:
+        cancel()
+        raise
+
+    async def body():
+        chunk = first
+        try:
+            while chunk is not done:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+                chunk = await queue.get()
+        finally:
+            cancel()
+
+    return body()
+
+
+async def csv_export_response(sql: str, params, columns: list[tuple[str, str]],
+                              order_by: str, filename: str):
+    try:
+        body = await _start(export_sql(sql, columns, order_by), params)
+    except errors.DataError:
+        # Значение фильтра, которое Postgres не смог привести к типу колонки
+        return PlainTextResponse("Некорректные параметры выгрузки", status_code=400)
+
+    return StreamingResponse(
+        body,
+        media_type="text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        }
+    )
@@ -0,0 +1,177 @@
+from datetime import date, timedelta
+
+import psycopg2.extras
+
+from cache import TableCache
+from db import get_connection
+
+# ==========================================================
+# СРОКИ УСТРАНЕНИЯ НЕИСПРАВНОСТЕЙ
+#
+# Для периода (по датам фиксации/решения) и для каждого "Место":
+#   • resolution — сколько устранено, среднее и перцентили срока (дни);
+#   • aging      — открытые сейчас неисправности по возрасту;
+#   • flow       — по месяцам: поступило, устранено и остаток
+#                  открытых на конец месяца (накопительная сумма
+#                  оконной функцией от остатка на начало периода).
+#
+# Всё считается одним запросом и кэшируется на период (TableCache,
+# сбрасывается при любом bump("Неисправность")).
+# ==========================================================
+
+PLACES = ("Вольер", "Участок")
+AGING_BUCKETS = [
+    # (подпись, до скольки дней включительно)
+    ("до 7 дн.", 7),
+    ("8–30 дн.", 30),
+    ("31–90 дн.", 90),
+    ("больше 90 дн.", None),
+]
+DEFAULT_DAYS = 365
+
+STATS_SQL = """
+    WITH places(place) AS (
+        SELECT unnest(%(places)s::text[])
+    ),
+    base AS (
+        SELECT
+            "Место"              AS place,
+            "ДатаФиксации"::date AS opened,
+            CASE WHEN "СтатусУстранения" = 'Устранено'
+                 THEN "ДатаРешения"::date END AS closed
+        FROM "Неисправность"
+        WHERE "Место" = ANY(%(places)s)
+    ),
+
+    -- Сроки устранения: закрытые в периоде
+    resolution AS (
+        SELECT
+            place,
+            COUNT(*)                                                    AS resolved,
+            ROUND(AVG(closed - opened), 1)                              AS mean_days,
+            percentile_cont(0.5)  WITHIN GROUP (ORDER BY closed - opened) AS p50_days,
+            percentile_cont(0.9)  WITHIN GROUP (ORDER BY closed - opened) AS p90_days,
+            percentile_cont(0.95) WITHIN GROUP (ORDER BY closed - opened) AS p95_days,
+            MAX(closed - opened)                                        AS max_days
+        FROM base
+        WHERE closed BETWEEN %(date_from)s AND %(date_to)s
+        GROUP BY place
+    ),
+
+    -- Возраст открытых на сегодня
+    buckets(label, max_days, sort) AS (
+        SELECT * FROM unnest(%(bucket_labels)s::text[], %(bucket_limits)s::int[])
+                      WITH ORDINALITY
+    ),
+    open_age AS (
+        SELECT
+            b.place,
+            (SELECT bk.sort FROM buckets bk
+             WHERE bk.max_days IS NULL OR CURRENT_DATE - b.opened <= bk.max_days
+             ORDER BY bk.sort LIMIT 1) AS sort
+        FROM base b
+        WHERE b.closed IS NULL
+    ),
+    aging AS (
+        SELECT p.place, bk.label, bk.sort, COUNT(o.place) AS open_count
+        FROM places p
+        CROSS JOIN buckets bk
+        LEFT JOIN open_age o ON o.place = p.place AND o.sort = bk.sort
+        GROUP BY p.place, bk.label, bk.sort
+    ),
+
+    -- Поступление и устранение по месяцам
+    months AS (
+        SELECT generate_series(
+            date_trunc('month', %(date_from)s::date),
+            date_trunc('month', %(date_to)s::date),
+            interval '1 month'
+        )::date AS month
+    ),
+    events AS (
+        SELECT place, date_trunc('month', opened)::date AS month, 1 AS intake, 0 AS closure
+        FROM base
+        WHERE opened BETWEEN %(date_from)s AND %(date_to)s
+        UNION ALL
+        SELECT place, date_trunc('month', closed)::date, 0, 1
+        FROM base
+        WHERE closed BETWEEN %(date_from)s AND %(date_to)s
+    ),
+    backlog_start AS (
+        SELECT p.place, COUNT(b.place) AS open_before
+        FROM places p
+        LEFT JOIN base b
+          ON b.place = p.place
+         AND b.opened < %(date_from)s
+         AND (b.closed IS NULL OR b.closed >= %(date_from)s)
+        GROUP BY p.place
+    ),
+    flow AS (
+        SELECT
+            p.place,
+            m.month,
+            COALESCE(SUM(e.intake), 0)  AS intake,
+            COALESCE(SUM(e.closure), 0) AS closure
+        FROM places p
+        CROSS JOIN months m
+        LEFT JOIN events e ON e.place = p.place AND e.month = m.month
+        GROUP BY p.place, m.month
+    ),
+    flow_backlog AS (
+        SELECT
+            f.place,
+            f.month,
+            f.intake,
+            f.closure,
+            bs.open_before + SUM(f.intake - f.closure)
+                OVER (PARTITION BY f.place ORDER BY f.month) AS backlog
+        FROM flow f
+        JOIN backlog_start bs ON bs.place = f.place
+    )
+
+    SELECT json_build_object(
+        'resolution', (SELECT json_object_agg(place, to_jsonb(r) - 'place') FROM resolution r),
+        'aging',      (SELECT json_agg(json_build_object('place', place, 'label', label, 'open', open_count)
+                                       ORDER BY place, sort) FROM aging),
+        'flow',       (SELECT json_agg(json_build_object('place', place, 'month', to_char(month, 'MM.YYYY'),
+                                                         'intake', intake, 'closure', closure,
+                                                         'backlog', backlog)
+                                       ORDER BY place, month) FROM flow_backlog)
+    ) AS stats
+"""
+
+# Аналитика не обязана быть секундной точности — TTL страхует
+# от устаревания возраста открытых неисправностей
+stats_cache = TableCache(["Неисправность"], ttl=300, max_entries=64)
+
+
+def default_period() -> tuple[date, date]:
+    today = date.today()
+    return today - timedelta(days=DEFAULT_DAYS), today
+
+
+def load_stats(date_from: date, date_to: date) -> dict:
+    key = (date_from, date_to, date.today())
+
+    stats = stats_cache.get(key)
+    if stats is None:
+        versions = stats_cache.versions()
+
+        # Основной сервер: результат кэшируется под текущей версией таблицы
+        conn = get_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute(STATS_SQL, {
+                "places": list(PLACES),
+                "date_from": date_from,
+                "date_to": date_to,
+                "bucket_labels": [label for label, _ in AGING_BUCKETS],
+                "bucket_limits": [limit for _, limit in AGING_BUCKETS],
+            })
+            stats = cursor.fetchone()["stats"]
+        finally:
+            conn.close()
+
+        stats_cache.set(key, stats, versions)
+
+    return stats
@@ -0,0 +1,259 @@
+import re
+from dataclasses import dataclass
+from datetime import date
+
+import table_versions
+
+# ==========================================================
+# ГРАФИК КОРМЛЕНИЙ
+#
+# 1. Текст "ЧастотаКормления" рациона ("2 раза в день", "каждые 6 часов",
+#    "через день"...) разбирается в структуру FeedingFrequency и хранится
+#    в "РасписаниеРациона" (patch_feeding_schedule.py).
+# 2. build_day() одним INSERT ... SELECT раскладывает кормления дня
+#    по слотам "СлотКормления" для каждого живого животного и его зоотехника.
+# 3. feedings.feeding_add отмечает ближайший невыполненный слот (mark_done).
+#
+# Слоты распределяются равномерно внутри рабочего окна
+# DAY_START–DAY_END: ночных кормлений персонал не проводит.
+# ==========================================================
+
+DAY_START = "08:00"
+DAY_END = "20:00"
+WORKING_HOURS = 12
+
+DEFAULT_FREQUENCY_TEXT = "2 раза в день"   # как в patch_rations_schedule.py
+
+
+@dataclass(frozen=True)
+class FeedingFrequency:
+    per_day: int = 2        # кормлений в день кормления
+    every_days: int = 1     # 1 — ежедневно, 2 — через день, ...
+
+
+_WORD_NUMBERS = {
+    "один": 1, "одна": 1, "одно": 1,
+    "два": 2, "две": 2, "дважды": 2, "двое": 2,
+    "три": 3, "трижды": 3, "трое": 3,
+    "четыре": 4, "пять": 5, "шесть": 6, "семь": 7,
+}
+
+
+def _number(token: str | None, default: int = 1) -> int:
+    if not token:
+        return default
+    if token.isdigit():
+        return int(token)
+    return _WORD_NUMBERS.get(token, default)
+
+
+def _per_period(times: int, days: int) -> FeedingFrequency:
+    """N кормлений за D дней → кормлений в день или раз в сколько дней."""
+    times, days = max(times, 1), max(days, 1)
+    if times >= days:
+        return FeedingFrequency(max(round(times / days), 1), 1)
+    return FeedingFrequency(1, max(round(days / times), 1))
+
+
+def parse_frequency(text: str | None) -> FeedingFrequency:
+    """
+    Разбор свободного текста частоты кормления.
+    Нераспознанный текст → значение по умолчанию (2 раза в день).
+    """
+    s = (text or DEFAULT_FREQUENCY_TEXT).lower().replace("ё", "е").strip()
+
+    # "через день"
+    if "через день" in s:
+        return FeedingFrequency(1, 2)
+
+    # "раз в 3 дня", "1 раз в 2 дня"
+    m = re.search(r"(\d+|\w+)?\s*раз\w*\s+в\s+(\d+|\w+)\s+дн", s)
+    if m:
+        return _per_period(_number(m.group(1)), _number(m.group(2)))
+
+    # "3 раза в неделю", "раз в неделю", "раз в 2 недели"
+    m = re.search(r"(\d+|\w+)?\s*раз\w*\s+в\s+(?:(\d+|\w+)\s+)?недел", s)
+    if m:
+        return _per_period(_number(m.group(1)), 7 * _number(m.group(2)))
+
+    if re.search(r"в\s+неделю|еженедельно", s):
+        return FeedingFrequency(1, 7)
+
+    # "каждые 3 дня", "каждые двое суток", "каждый день"
+    m = re.search(r"кажд\w*\s+(?:(\d+|\w+)\s+)?(?:дн|день|сут)", s)
+    if m:
+        return FeedingFrequency(1, max(_number(m.group(1)), 1))
+
+    # "каждые 6 часов", "каждые 8 ч", "каждый час"
+    m = re.search(r"кажд\w*\s+(\d+|\w+)?\s*ч", s)
+    if m:
+        hours = max(_number(m.group(1)), 1)
+        return FeedingFrequency(max(WORKING_HOURS // hours + 1, 1), 1)
+
+    # "2 раза в день", "три раза в сутки", "дважды в день", "раз в день"
+    m = re.search(r"(\d+|\w+)?\s*(?:раз\w*)?\s*в\s+(?:день|сутки)", s)
+    if m:
+        return FeedingFrequency(max(_number(m.group(1)), 1), 1)
+
+    # "утром и вечером", "утро, обед, вечер"
+    parts = [w for w in ("утр", "обед", "днем", "вечер") if w in s]
+    if parts:
+        return FeedingFrequency(len(parts), 1)
+
+    if "ежедневно" in s:
+        return FeedingFrequency(1, 1)
+
+    return FeedingFrequency()
+
+
+# ==========================================================
+# SQL
+# ==========================================================
+
+SYNC_RATION_SQL = """
+    INSERT INTO "РасписаниеРациона"
+        ("IDРациона", "КормленийВДень", "КаждыеДней", "ИсходныйТекст")
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT ("IDРациона") DO UPDATE SET
+        "КормленийВДень" = EXCLUDED."КормленийВДень",
+        "КаждыеДней"     = EXCLUDED."КаждыеДней",
+        "ИсходныйТекст"  = EXCLUDED."ИсходныйТекст"
+"""
+
+# Слоты дня для всех живых животных: рацион — по виду, как при кормлении.
+# Рацион «раз в N дней» отсчитывается от последнего кормления животного
+# до этого дня: если его не кормили N дней (или не кормили вовсе) —
+# кормление положено сегодня; пропущенное переносится на следующий день.
+BUILD_DAY_SQL = f"""
+    INSERT INTO "СлотКормления" ("Дата", "Время", "IDЖивотного", "IDСотрудника")
+    SELECT
+        %(day)s::date,
+        TIME '{DAY_START}' + i * ((TIME '{DAY_END}' - TIME '{DAY_START}')
+                                  / GREATEST(rr."КормленийВДень" - 1, 1)),
+        j."IDЖивотного",
+        j."IDСотрудника"
+    FROM "Животное" j
+    JOIN "Рацион" r             ON r."ВидЖивотного" = j."Вид"
+    JOIN "РасписаниеРациона" rr ON rr."IDРациона"   = r."IDРациона"
+    LEFT JOIN LATERAL (
+        SELECT MAX(f."ДатаИВремя")::date AS last_day
+        FROM "Кормление" f
+        WHERE f."IDЖивотного" = j."IDЖивотного"
+          AND f."ДатаИВремя" < %(day)s::date
+    ) lf ON rr."КаждыеДней" > 1
+    CROSS JOIN LATERAL generate_series(0, rr."КормленийВДень" - 1) AS i
+    WHERE j."СостояниеЗдоровья" IS DISTINCT FROM 'Умер'
+      AND (rr."КаждыеДней" = 1
+           OR lf.last_day IS NULL
+           OR %(day)s::date - lf.last_day >= rr."КаждыеДней")
+    ON CONFLICT ("Дата", "IDЖивотного", "Время") DO NOTHING
+"""
+
+# Невыполненные слоты умерших животных и переданных другому зоотехнику
+CLEANUP_DAY_SQL = """
+    DELETE FROM "СлотКормления" sl
+    USING "Животное" j
+    WHERE sl."IDЖивотного" = j."IDЖивотного"
+      AND sl."Дата" = %(day)s::date
+      AND sl."IDКормления" IS NULL
+      AND (j."СостояниеЗдоровья" = 'Умер'
+           OR sl."IDСотрудника" IS DISTINCT FROM j."IDСотрудника")
+"""
+
+MARK_DONE_SQL = """
+    UPDATE "СлотКормления"
+    SET "IDКормления" = %(feeding_id)s
+    WHERE "IDСлота" = (
+        SELECT "IDСлота"
+        FROM "СлотКормления"
+        WHERE "Дата" = CURRENT_DATE
+          AND "IDЖивотного" = %(animal_id)s
+          AND "IDКормления" IS NULL
+        ORDER BY "Время"
+        LIMIT 1
+    )
+"""
+
+DROP_PENDING_FOR_SPECIES_SQL = """
+    DELETE FROM "СлотКормления" sl
+    USING "Животное" j
+    WHERE sl."IDЖивотного" = j."IDЖивотного"
+      AND j."Вид" = %s
+      AND sl."Дата" >= CURRENT_DATE
+      AND sl."IDКормления" IS NULL
+"""
+
+DUE_SQL = """
+    SELECT
+        sl."IDСлота"       AS id,
+        sl."Время"         AS slot_time,
+        sl."Время" <= LOCALTIME AS is_due,
+        j."IDЖивотного"    AS animal_id,
+        j."Кличка"         AS animal_name,
+        j."Вид"            AS species
+    FROM "СлотКормления" sl
+    JOIN "Животное" j ON j."IDЖивотного" = sl."IDЖивотного"
+    WHERE sl."Дата" = CURRENT_DATE
+      AND sl."IDСотрудника" = %s
+      AND sl."IDКормления" IS NULL
+    ORDER BY sl."Время", j."Кличка"
+"""
+
+# Открытые оповещения о пропущенных кормлениях (jobs.detect_missed_feedings)
+ALERTS_SQL = """
+    SELECT
+        o."IDЖивотного"        AS animal_id,
+        j."Кличка"             AS animal_name,
+        j."Вид"                AS species,
+        o."ПоследнееКормление" AS last_feeding,
+        o."Создано"            AS created
+    FROM "ОповещениеОКормлении" o
+    JOIN "Животное" j ON j."IDЖивотного" = o."IDЖивотного"
+    WHERE o."Закрыто" IS NULL
+      AND j."IDСотрудника" = %s
+    ORDER BY o."ПоследнееКормление" NULLS FIRST
+"""
+
+
+# Версии таблиц, при которых день уже раскладывался (см. ensure_day)
+_built_days: dict[date, tuple] = {}
+_SOURCE_TABLES = ("Животное", "Рацион")
+
+
+def sync_ration(cursor, ration_id: int, frequency_text: str, species: str | None = None):
+    """Сохраняет разобранную частоту рациона; будущие невыполненные слоты вида сбрасываются."""
+    freq = parse_frequency(frequency_text)
+    cursor.execute(SYNC_RATION_SQL, (ration_id, freq.per_day, freq.every_days, frequency_text))
+
+    if species:
+        cursor.execute(DROP_PENDING_FOR_SPECIES_SQL, (species,))
+    _built_days.clear()
+
+
+def build_day(cursor, day: date) -> int:
+    """Раскладывает слоты дня. Повторный вызов добавляет только недостающие."""
+    cursor.execute(CLEANUP_DAY_SQL, {"day": day})
+    cursor.execute(BUILD_DAY_SQL, {"day": day})
+    return cursor.rowcount
+
+
+def ensure_day(conn, day: date | None = None):
+    """Строит слоты дня, если животные или рационы менялись с прошлой раскладки."""
+    day = day or date.today()
+    versions = table_versions.snapshot(_SOURCE_TABLES)
+
+    if _built_days.get(day) == versions:
+        return
+
+    cursor = conn.cursor()
+    build_day(cursor, day)
+    conn.commit()
+
+    # Старые дни больше не нужны в памяти
+    for d in [d for d in _built_days if d < day]:
+        del _built_days[d]
+    _built_days[day] = versions
+
+
+def mark_done(cursor, animal_id: int, feeding_id: int):
+    cursor.execute(MARK_DONE_SQL, {"animal_id": animal_id, "feeding_id": feeding_id})
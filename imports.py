@@ -0,0 +1,315 @@
+import io
+from dataclasses import dataclass
+
+from psycopg2 import errors
+
+# ==========================================================
+# ЗАГРУЗКА СПИСКОВ ИЗ CSV
+#
+#   1. файл целиком загружается COPY FROM во временную таблицу
+#      (все поля — text, чтобы ошибки типов ловить проверками, а не COPY);
+#      номер строки файла даёт serial-колонка: COPY вставляет по порядку;
+#   2. проверки — набор SQL-запросов над временной таблицей,
+#      каждый возвращает (строка, сообщение);
+#   3. если ошибок нет — одна вставка INSERT ... SELECT в той же
+#      транзакции. Любая ошибка — откат, в базу не попадает ничего.
+#
+# Разделитель — ";" (как в экспорте) или ",", определяется по заголовку.
+# ==========================================================
+
+MAX_ERRORS = 200
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    errors: list = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _prepare(data: bytes) -> tuple[io.BytesIO, str]:
+    text = data.decode("utf-8-sig")
+    header = text.split("\n", 1)[0]
+    delimiter = ";" if header.count(";") >= header.count(",") else ","
+    return io.BytesIO(text.encode("utf-8")), delimiter
+
+
+def _copy_error(exc) -> str:
+    # "... CONTEXT:  COPY ИмпортЖивотных, line 5: ..." → коротко
+    raw = str(exc)
+    message = raw.split("CONTEXT:")[0].strip()
+    context = raw.split("CONTEXT:", 1)[1].strip() if "CONTEXT:" in raw else ""
+    if ", line " in context:
+        line = context.split(", line ", 1)[1].split(":")[0].split(",")[0]
+        return f"Строка {line}: {message}"
+    return message
+
+
+def run_import(conn, data: bytes, staging_sql: str, columns: list[str],
+               checks: list[str], merge, params: dict | None = None) -> ImportResult:
+    """
+    Общий конвейер: staging_sql создаёт временную таблицу "Импорт"
+    (line SERIAL + текстовые колонки columns), checks — запросы проверок,
+    merge(cursor) выполняет вставку и возвращает число добавленных строк.
+    Коммит и откат — на вызывающей стороне.
+    """
+    try:
+        stream, delimiter = _prepare(data)
+    except UnicodeDecodeError:
+        return ImportResult(errors=["Файл должен быть в кодировке UTF-8"])
+
+    cursor = conn.cursor()
+    cursor.execute(staging_sql)
+    column_list = ", ".join(f'"{c}"' for c in columns)
+
+    try:
+        cursor.copy_expert(
+            f"""COPY "Импорт" ({column_list}) FROM STDIN
+                WITH (FORMAT csv, HEADER, DELIMITER '{delimiter}', ENCODING 'UTF8')""",
+            stream
+        )
+    except (errors.BadCopyFileFormat, errors.DataError) as exc:
+        conn.rollback()
+        return ImportResult(errors=[_copy_error(exc)])
+
+    cursor.execute('SELECT COUNT(*) FROM "Импорт"')
+    if cursor.fetchone()[0] == 0:
+        conn.rollback()
+        return ImportResult(errors=["Файл не содержит строк"])
+
+    # Первая строка файла — заголовок
+    cursor.execute('UPDATE "Импорт" SET line = line + 1')
+
+    found = []
+    for sql in checks:
+        cursor.execute(sql, params or {})
+        found.extend(cursor.fetchall())
+
+    if found:
+        conn.rollback()
+        found.sort()
+        messages = [f"Строка {line}: {msg}" for line, msg in found[:MAX_ERRORS]]
+        if len(found) > MAX_ERRORS:
+            messages.append(f"… и ещё {len(found) - MAX_ERRORS} ошибок")
+        return ImportResult(errors=messages)
+
+    return ImportResult(inserted=merge(cursor))
+
+
+# ==========================================================
+# ЖИВОТНЫЕ
+#   Вид;Кличка;Возраст;Пол;Зоотехник
+# ==========================================================
+
+ANIMAL_COLUMNS = ["Вид", "Кличка", "Возраст", "Пол", "Зоотехник"]
+
+ANIMALS_STAGING_SQL = """
+    CREATE TEMP TABLE "Импорт" (
+        line        SERIAL,
+        "Вид"       TEXT,
+        "Кличка"    TEXT,
+        "Возраст"   TEXT,
+        "Пол"       TEXT,
+        "Зоотехник" TEXT
+    ) ON COMMIT DROP
+"""
+
+ANIMAL_CHECKS = [
+    # Обязательные поля и форматы
+    """
+    SELECT line, 'не указан вид' FROM "Импорт" WHERE btrim(coalesce("Вид", '')) = ''
+    UNION ALL
+    SELECT line, 'не указана кличка' FROM "Импорт" WHERE btrim(coalesce("Кличка", '')) = ''
+    UNION ALL
+    SELECT line, 'возраст должен быть целым числом от 0 до 200'
+    FROM "Импорт"
+    WHERE CASE WHEN btrim(coalesce("Возраст", '')) ~ '^[0-9]{1,3}$'
+               THEN btrim("Возраст")::int > 200
+               ELSE TRUE
+          END
+    UNION ALL
+    SELECT line, 'пол должен быть «м» или «ж»'
+    FROM "Импорт" WHERE lower(btrim(coalesce("Пол", ''))) NOT IN ('м', 'ж')
+    """,
+
+    # Для вида должен быть рацион (кормление ищет рацион по виду)
+    """
+    SELECT i.line, format('для вида «%%s» нет рациона', btrim(i."Вид"))
+    FROM "Импорт" i
+    WHERE btrim(coalesce(i."Вид", '')) <> ''
+      AND NOT EXISTS (SELECT 1 FROM "Рацион" r WHERE r."ВидЖивотного" = btrim(i."Вид"))
+    """,
+
+    # Зоотехник: ровно один активный сотрудник с таким ФИО
+    """
+    SELECT i.line,
+           CASE WHEN COUNT(s."IDСотрудника") = 0
+                THEN format('зоотехник «%%s» не найден', btrim(i."Зоотехник"))
+                ELSE format('несколько зоотехников с ФИО «%%s»', btrim(i."Зоотехник"))
+           END
+    FROM "Импорт" i
+    LEFT JOIN "Сотрудник" s
+           ON s."ФИО" = btrim(i."Зоотехник")
+          AND s."Должность" = 'Зоотехник'
+          AND s."Статус" = 'Активен'
+    GROUP BY i.line, i."Зоотехник"
+    HAVING COUNT(s."IDСотрудника") <> 1
+    """,
+
+    # Повторы внутри файла и с уже живущими в зоопарке
+    """
+    SELECT line, 'повтор строки ' || first_line || ' (тот же вид и кличка)'
+    FROM (
+        SELECT line,
+               MIN(line) OVER (PARTITION BY lower(btrim("Вид")), lower(btrim("Кличка"))) AS first_line
+        FROM "Импорт"
+    ) d
+    WHERE line <> first_line
+    UNION ALL
+    SELECT i.line, 'такое животное уже есть (ID ' || j."IDЖивотного" || ')'
+    FROM "Импорт" i
+    JOIN "Животное" j
+      ON lower(j."Вид") = lower(btrim(i."Вид"))
+     AND lower(j."Кличка") = lower(btrim(i."Кличка"))
+     AND j."СостояниеЗдоровья" IS DISTINCT FROM 'Умер'
+    """,
+]
+
+# Новые животные + первичная медкарта от закреплённого зоотехника —
+# то же, что делает "ДобавитьЖивотноеИМедкарту" для одного животного.
+# Рацион — первый рацион вида (проверка выше гарантирует, что он есть)
+ANIMALS_MERGE_SQL = """
+    WITH src AS (
+        SELECT
+            i.line,
+            btrim(i."Вид")               AS species,
+            btrim(i."Кличка")            AS name,
+            btrim(i."Возраст")::int      AS age,
+            lower(btrim(i."Пол"))        AS gender,
+            s."IDСотрудника"             AS employee_id,
+            r."IDРациона"                AS ration_id
+        FROM "Импорт" i
+        JOIN "Сотрудник" s
+          ON s."ФИО" = btrim(i."Зоотехник")
+         AND s."Должность" = 'Зоотехник'
+         AND s."Статус" = 'Активен'
+        JOIN LATERAL (
+            SELECT r0."IDРациона"
+            FROM "Рацион" r0
+            WHERE r0."ВидЖивотного" = btrim(i."Вид")
+            ORDER BY r0."IDРациона"
+            LIMIT 1
+        ) r ON TRUE
+    ),
+    ins AS (
+        INSERT INTO "Животное"
+            ("IDЖивотного", "Вид", "Кличка", "Возраст", "Пол",
+             "ДатаПоступления", "СостояниеЗдоровья", "IDСотрудника", "IDРациона")
+        SELECT
+            {id_expr},
+            species, name, age, gender, CURRENT_DATE, 'Здоров', employee_id, ration_id
+        FROM src
+        RETURNING "IDЖивотного", "IDСотрудника"
+    )
+    INSERT INTO "Медкарта"
+        ("IDСотрудника", "IDЖивотного", "ДатаОсмотра",
+         "Диагноз", "НазначенноеЛечение", "Прививки", "РезультатПроцедуры")
+    SELECT "IDСотрудника", "IDЖивотного", CURRENT_DATE,
+           'Здоров', NULL, NULL, 'Первичный осмотр'
+    FROM ins
+"""
+
+
+def _id_expr(cursor, table: str, column: str) -> str:
+    """
+    nextval, если у колонки есть последовательность, иначе MAX + номер строки
+    (как в остальном коде). Таблица к этому моменту заблокирована.
+    """
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", (f'"{table}"', column))
+    seq = cursor.fetchone()[0]
+    if seq:
+        return f"nextval('{seq}')"
+    return (f'(SELECT COALESCE(MAX("{column}"), 0) FROM "{table}") '
+            f'+ ROW_NUMBER() OVER (ORDER BY line)')
+
+
+def merge_animals(cursor) -> int:
+    cursor.execute('LOCK TABLE "Животное" IN SHARE ROW EXCLUSIVE MODE')
+    cursor.execute(ANIMALS_MERGE_SQL.format(id_expr=_id_expr(cursor, "Животное", "IDЖивотного")))
+    return cursor.rowcount
+
+
+def import_animals(conn, data: bytes) -> ImportResult:
+    return run_import(conn, data, ANIMALS_STAGING_SQL, ANIMAL_COLUMNS, ANIMAL_CHECKS, merge_animals)
+
+
+# ==========================================================
+# КОРМА
+#   Наименование;Тип;ЕдиницаИзмерения;Остаток
+#   (единица по умолчанию — кг, остаток — 0, как в /feeds/add)
+# ==========================================================
+
+FEED_COLUMNS = ["Наименование", "Тип", "ЕдиницаИзмерения", "Остаток"]
+
+FEEDS_STAGING_SQL = """
+    CREATE TEMP TABLE "Импорт" (
+        line               SERIAL,
+        "Наименование"     TEXT,
+        "Тип"              TEXT,
+        "ЕдиницаИзмерения" TEXT,
+        "Остаток"          TEXT
+    ) ON COMMIT DROP
+"""
+
+FEED_CHECKS = [
+    """
+    SELECT line, 'не указано наименование'
+    FROM "Импорт" WHERE btrim(coalesce("Наименование", '')) = ''
+    UNION ALL
+    SELECT line, 'не указан тип'
+    FROM "Импорт" WHERE btrim(coalesce("Тип", '')) = ''
+    UNION ALL
+    SELECT line, 'остаток должен быть неотрицательным числом'
+    FROM "Импорт"
+    WHERE btrim(coalesce("Остаток", '')) <> ''
+      AND replace(btrim("Остаток"), ',', '.') !~ '^[0-9]+(\\.[0-9]+)?$'
+    """,
+    """
+    SELECT line, 'повтор строки ' || first_line || ' (то же наименование)'
+    FROM (
+        SELECT line,
+               MIN(line) OVER (PARTITION BY lower(btrim("Наименование"))) AS first_line
+        FROM "Импорт"
+    ) d
+    WHERE line <> first_line
+    UNION ALL
+    SELECT i.line, 'корм уже есть на складе (ID ' || k."IDКорма" || ')'
+    FROM "Импорт" i
+    JOIN "Корм" k ON lower(k."Наименование") = lower(btrim(i."Наименование"))
+    """,
+]
+
+FEEDS_MERGE_SQL = """
+    INSERT INTO "Корм"
+        ("IDКорма", "Наименование", "Тип", "ЕдиницаИзмерения", "ОстатокНаСкладе")
+    SELECT
+        {id_expr},
+        btrim("Наименование"),
+        btrim("Тип"),
+        COALESCE(NULLIF(btrim("ЕдиницаИзмерения"), ''), 'кг'),
+        COALESCE(NULLIF(replace(btrim("Остаток"), ',', '.'), ''), '0')::numeric
+    FROM "Импорт"
+"""
+
+
+def merge_feeds(cursor) -> int:
+    cursor.execute('LOCK TABLE "Корм" IN SHARE ROW EXCLUSIVE MODE')
+    cursor.execute(FEEDS_MERGE_SQL.format(id_expr=_id_expr(cursor, "Корм", "IDКорма")))
+    return cursor.rowcount
+
+
+def import_feeds(conn, data: bytes) -> ImportResult:
+    return run_import(conn, data, FEEDS_STAGING_SQL, FEED_COLUMNS, FEED_CHECKS, merge_feeds)
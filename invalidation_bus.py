@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+
+import table_versions
+from db import get_dedicated_connection
+from listener import listener
+
+log = logging.getLogger("zoo.invalidation")
+
+# ==========================================================
+# ШИНА ИНВАЛИДАЦИИ МЕЖДУ ПРОЦЕССАМИ
+#
+# Кэши (ETag страниц, TableCache, раскладка слотов кормления) живут
+# внутри процесса и опираются на счётчики table_versions. Чтобы при
+# нескольких воркерах uvicorn / хостах они не устаревали:
+#
+#   • каждый локальный bump() ставит имена таблиц/ключей в очередь;
+#     поток-публикатор объединяет накопившееся и отправляет
+#     pg_notify('zoo_invalidate', {"origin": ..., "tables": [...]});
+#   • общий LISTEN-поток (listener.py) получает сообщения других
+#     процессов и применяет их через table_versions.apply_remote();
+#   • если уведомления могли потеряться (переподключение LISTEN или
+#     сбой публикации) — полный сброс: table_versions.flush() у себя,
+#     сообщение {"flush": true} — остальным.
+# ==========================================================
+
+CHANNEL = "zoo_invalidate"
+
+# Уникален для процесса, даже если pid повторится после перезапуска
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+BACKOFF_START = 1
+BACKOFF_MAX = 30
+
+# NOTIFY ограничен 8000 байт — большие пачки режем
+MAX_TABLES_PER_MESSAGE = 200
+
+_pending: queue.SimpleQueue = queue.SimpleQueue()
+_FLUSH = object()
+_STOP = object()
+_thread: threading.Thread | None = None
+
+
+# ----------------------------------------------------------
+# Приём
+# ----------------------------------------------------------
+
+def _on_message(payload: str):
+    try:
+        msg = json.loads(payload)
+    except ValueError:
+        return
+
+    if msg.get("origin") == ORIGIN:
+        return
+
+    if msg.get("flush"):
+        table_versions.flush()
+    elif msg.get("tables"):
+        table_versions.apply_remote(msg["tables"])
+
+
+def _on_listener_reconnect():
+    # Пока LISTEN не работал, чужие изменения могли пройти мимо
+    table_versions.flush()
+
+
+# ----------------------------------------------------------
+# Отправка
+# ----------------------------------------------------------
+
+def _on_local_bump(tables):
+    _pending.put(tuple(tables))
+
+
+def request_flush():
+    """Сбросить кэши во всех процессах (например, после ручной правки БД)."""
+    table_versions.flush()
+    _pending.put(_FLUSH)
+
+
+def _drain(first) -> tuple[set, bool, bool]:
+    """Забирает всё накопившееся: (таблицы, нужен ли flush, пора ли остановиться)."""
+    tables, flush, stop = set(), False, False
+    item = first
+    while True:
+        if item is _STOP:
+            stop = True
+        elif item is _FLUSH:
+            flush = True
+        else:
+            tables.update(item)
+        try:
+            item = _pending.get_nowait()
+        except queue.Empty:
+            return tables, flush, stop
+
+
+def _messages(tables: set, flush: bool) -> list[dict]:
+    if flush:
+        return [{"origin": ORIGIN, "flush": True}]
+    names = sorted(tables)
+    return [
+        {"origin": ORIGIN, "tables": names[i:i + MAX_TABLES_PER_MESSAGE]}
+        for i in range(0, len(names), MAX_TABLES_PER_MESSAGE)
+    ]
+
+
+def _publisher():
+    conn = None
+    backoff = BACKOFF_START
+    lost = False          # были неотправленные сообщения → остальным нужен flush
+
+    while True:
+        tables, flush, stop = _drain(_pending.get())
+        flush = flush or lost
+
+        while tables or flush:
+            try:
+                if conn is None or conn.closed:
+                    conn = get_dedicated_connection()
+                    conn.autocommit = True
+
+                cursor = conn.cursor()
+                for msg in _messages(tables, flush):
+                    cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL, json.dumps(msg, ensure_ascii=False)))
+
+                tables, flush, lost = set(), False, False
+                backoff = BACKOFF_START
+
+            except Exception:
+                log.exception("Не удалось отправить инвалидацию, повтор через %s с", backoff)
+                if conn is not None:
+                    conn.close()
+                    conn = None
+
+                # Пока ждём — копятся новые; при повторе всем отправится flush
+                lost = True
+                if stop:
+                    break
+                time.sleep(backoff)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+                more, more_flush, stop = _drain(())
+                tables |= more
+                flush = True
+
+        if stop:
+            break
+
+    if conn is not None:
+        conn.close()
+
+
+def start():
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _thread = threading.Thread(target=_publisher, name="invalidation-publisher", daemon=True)
+    _thread.start()
+
+
+def stop():
+    if _thread and _thread.is_alive():
+        _pending.put(_STOP)
+        _thread.join(timeout=5)
+
+
+table_versions.on_bump(_on_local_bump)
+listener.on(CHANNEL, _on_message)
+listener.on_reconnect(_on_listener_reconnect)
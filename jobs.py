@@ -0,0 +1,422 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import psycopg2.extras
+
+import consumption
+import feeding_schedule
+from db import get_connection, get_dedicated_connection
+
+log = logging.getLogger("zoo.jobs")
+
+# ==========================================================
+# ФОНОВЫЕ ЗАДАНИЯ
+#
+# Планировщик работает внутри процесса приложения (asyncio-задача,
+# запускается в lifespan app.py). Состояние заданий — в таблице
+# "ФоновоеЗадание" (patch_jobs.py): расписание, следующий запуск,
+# результат последнего запуска.
+#
+# Задание — обычная синхронная функция fn(conn), выполняется в пуле
+# потоков (не больше MAX_WORKERS одновременно). Перед запуском берётся
+# pg_try_advisory_lock: при нескольких процессах (uvicorn --workers N)
+# одно задание выполняет только один из них, остальные пропускают.
+# ==========================================================
+
+TICK_SECONDS = 30
+MAX_WORKERS = 2
+
+# Первый ключ двухключевого advisory lock — "класс" блокировок заданий
+JOB_LOCK_CLASS = 35
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ==========================================================
+# CRON: "минута час день месяц день_недели"
+#   * , - /   (день недели 0–6, 0 и 7 — воскресенье)
+# ==========================================================
+
+_CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _cron_field(text: str, lo: int, hi: int) -> frozenset[int]:
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"Неверный шаг в cron: {text!r}")
+
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            a, b = part.split("-", 1)
+            start, end = int(a), int(b)
+        else:
+            start = int(part)
+            end = hi if step > 1 else start
+
+        if not (lo <= start <= end <= hi):
+            raise ValueError(f"Значение вне диапазона в cron: {text!r}")
+        values.update(range(start, end + 1, step))
+
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class Cron:
+    expr: str
+    minutes: frozenset
+    hours: frozenset
+    days: frozenset
+    months: frozenset
+    weekdays: frozenset
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, expr: str) -> "Cron":
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"В cron-выражении должно быть 5 полей: {expr!r}")
+
+        parsed = [_cron_field(f, lo, hi) for f, (lo, hi) in zip(fields, _CRON_RANGES)]
+        weekdays = frozenset(d % 7 for d in parsed[4])
+
+        return cls(expr, *parsed[:4], weekdays, fields[2] == "*", fields[4] == "*")
+
+    def _day_matches(self, dt: datetime) -> bool:
+        weekday = (dt.weekday() + 1) % 7          # Python: пн=0 → cron: вс=0
+        in_days = dt.day in self.days
+        in_weekdays = weekday in self.weekdays
+
+        # Как в cron: если заданы оба поля — достаточно совпадения любого
+        if not self.any_day and not self.any_weekday:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, dt: datetime) -> datetime:
+        """Ближайший момент строго после dt (с точностью до минуты)."""
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+                continue
+            if t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+                continue
+            return t
+
+        raise ValueError(f"Cron-выражение никогда не срабатывает: {self.expr!r}")
+
+
+# ==========================================================
+# РЕЕСТР ЗАДАНИЙ
+# ==========================================================
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    cron: Cron
+    func: object
+
+
+JOBS: dict[str, Job] = {}
+
+
+def job(name: str, schedule: str):
+    """Регистрирует функцию fn(conn) как фоновое задание с cron-расписанием."""
+    cron = Cron.parse(schedule)
+
+    def decorator(func):
+        JOBS[name] = Job(name, cron, func)
+        return func
+
+    return decorator
+
+
+# ==========================================================
+# ЗАДАНИЯ
+# ==========================================================
+
+# Запас сверх интервала рациона, прежде чем поднимать тревогу
+MISSED_FEEDING_GRACE = timedelta(hours=2)
+
+# Допустимый промежуток между кормлениями, часов:
+#   КаждыеДней * 24 / КормленийВДень, но не меньше ночного перерыва —
+#   ночью кормлений нет (feeding_schedule.DAY_START–DAY_END).
+MISSED_FEEDINGS_SQL = f"""
+    WITH last_feeding AS (
+        SELECT
+            j."IDЖивотного",
+            j."IDСотрудника",
+            j."ДатаПоступления",
+            (SELECT MAX(f."ДатаИВремя")
+             FROM "Кормление" f
+             WHERE f."IDЖивотного" = j."IDЖивотного") AS last_time,
+            make_interval(hours => GREATEST(
+                rr."КаждыеДней" * 24 / rr."КормленийВДень",
+                24 - {feeding_schedule.WORKING_HOURS}
+            )) AS allowed
+        FROM "Животное" j
+        JOIN "Рацион" r             ON r."ВидЖивотного" = j."Вид"
+        JOIN "РасписаниеРациона" rr ON rr."IDРациона"   = r."IDРациона"
+        WHERE j."СостояниеЗдоровья" IS DISTINCT FROM 'Умер'
+    )
+    INSERT INTO "ОповещениеОКормлении"
+        ("IDЖивотного", "IDСотрудника", "ПоследнееКормление", "ДопустимыйИнтервал")
+    SELECT "IDЖивотного", "IDСотрудника", last_time, allowed
+    FROM last_feeding
+    WHERE COALESCE(last_time, "ДатаПоступления"::timestamp)
+          < LOCALTIMESTAMP - allowed - %(grace)s
+    ON CONFLICT ("IDЖивотного") WHERE "Закрыто" IS NULL DO NOTHING
+"""
+
+# Оповещение закрывается, как только животное покормили (или оно умерло)
+CLOSE_FEEDING_ALERTS_SQL = """
+    UPDATE "ОповещениеОКормлении" o
+    SET "Закрыто" = LOCALTIMESTAMP
+    FROM "Животное" j
+    WHERE o."IDЖивотного" = j."IDЖивотного"
+      AND o."Закрыто" IS NULL
+      AND (j."СостояниеЗдоровья" = 'Умер'
+           OR EXISTS (
+               SELECT 1 FROM "Кормление" f
+               WHERE f."IDЖивотного" = o."IDЖивотного"
+                 AND f."ДатаИВремя" > COALESCE(o."ПоследнееКормление", '-infinity')
+           ))
+"""
+
+
+@job("missed_feedings", "*/15 * * * *")
+def detect_missed_feedings(conn):
+    cursor = conn.cursor()
+    cursor.execute(CLOSE_FEEDING_ALERTS_SQL)
+    closed = cursor.rowcount
+    cursor.execute(MISSED_FEEDINGS_SQL, {"grace": MISSED_FEEDING_GRACE})
+    return f"новых оповещений: {cursor.rowcount}, закрыто: {closed}"
+
+
+# Пересчитываются только последние дни: старый "Расход" не меняется.
+# Полная перестройка — patch_jobs.py.
+ROLLUP_DAYS = 7
+
+REFRESH_EXPENSE_ROLLUP_SQL = """
+    DELETE FROM "СводкаРасходаПоДням"
+    WHERE "Дата" >= CURRENT_DATE - %(days)s;
+
+    INSERT INTO "СводкаРасходаПоДням" ("Дата", "IDКорма", "IDСотрудника", "Количество")
+    SELECT "Дата", "IDКорма", "IDСотрудника", SUM("Количество")
+    FROM "Расход"
+    WHERE "Дата" >= CURRENT_DATE - %(days)s
+    GROUP BY "Дата", "IDКорма", "IDСотрудника";
+"""
+
+# Та же сводка с видом животного (consumption.py). Граница — по часам
+# базы, как и в DELETE: иначе на стыке суток в приложении и в базе
+# удалённый день мог не вставиться заново
+REFRESH_SPECIES_ROLLUP_SQL = f"""
+    DELETE FROM "СводкаРасходаПоВидам"
+    WHERE "Дата" >= CURRENT_DATE - %(days)s;
+
+    INSERT INTO "СводкаРасходаПоВидам"
+        ("Дата", "ВидЖивотного", "IDКорма", "IDСотрудника", "Количество")
+    {consumption.SPECIES_CONSUMPTION_SELECT.replace("%(since)s", "CURRENT_DATE - %(days)s")}
+"""
+
+
+@job("expense_rollup", "*/10 * * * *")
+def refresh_expense_rollup(conn):
+    cursor = conn.cursor()
+    cursor.execute(REFRESH_EXPENSE_ROLLUP_SQL, {"days": ROLLUP_DAYS})
+    by_feed = cursor.rowcount
+    cursor.execute(REFRESH_SPECIES_ROLLUP_SQL, {"days": ROLLUP_DAYS})
+    return f"строк за {ROLLUP_DAYS} дн.: {by_feed}, по видам: {cursor.rowcount}"
+
+
+@job("feeding_slots", "1 0 * * *")
+def build_feeding_slots(conn):
+    created = feeding_schedule.build_day(conn.cursor(), datetime.now().date())
+    return f"создано слотов: {created}"
+
+
+# ==========================================================
+# ВЫПОЛНЕНИЕ
+# ==========================================================
+
+REGISTER_SQL = """
+    INSERT INTO "ФоновоеЗадание" ("Имя", "Расписание", "СледующийЗапуск")
+    VALUES (%s, %s, %s)
+    ON CONFLICT ("Имя") DO UPDATE SET
+        "Расписание" = EXCLUDED."Расписание",
+        "СледующийЗапуск" = CASE
+            WHEN "ФоновоеЗадание"."Расписание" = EXCLUDED."Расписание"
+            THEN "ФоновоеЗадание"."СледующийЗапуск"
+            ELSE EXCLUDED."СледующийЗапуск"
+        END
+"""
+
+DUE_JOBS_SQL = """
+    SELECT "Имя" AS name
+    FROM "ФоновоеЗадание"
+    WHERE "Включено" AND "СледующийЗапуск" <= %s
+"""
+
+
+def register_jobs():
+    now = datetime.now()
+    conn = get_connection()
+    cursor = conn.cursor()
+    for j in JOBS.values():
+        cursor.execute(REGISTER_SQL, (j.name, j.cron.expr, j.cron.next_after(now)))
+    conn.commit()
+    conn.close()
+
+
+def due_jobs() -> list[str]:
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute(DUE_JOBS_SQL, (datetime.now(),))
+    names = [r["name"] for r in cursor.fetchall() if r["name"] in JOBS]
+    conn.close()
+    return names
+
+
+def run_job(name: str) -> bool:
+    """
+    Выполняет задание, если оно всё ещё ждёт запуска и никто
+    другой его не выполняет. Возвращает True, если задание запускалось.
+    """
+    j = JOBS[name]
+    # Вне пула: сессионная блокировка снимается закрытием соединения
+    conn = get_dedicated_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s))", (JOB_LOCK_CLASS, name))
+        if not cursor.fetchone()[0]:
+            return False
+
+        # Под блокировкой: другой процесс мог только что выполнить задание
+        started = datetime.now()
+        cursor.execute(
+            'SELECT 1 FROM "ФоновоеЗадание" WHERE "Имя" = %s AND "Включено" AND "СледующийЗапуск" <= %s',
+            (name, started)
+        )
+        if not cursor.fetchone():
+            return False
+
+        cursor.execute(
+            """
+            UPDATE "ФоновоеЗадание"
+            SET "ПоследнийЗапуск" = %s, "Статус" = 'running', "Исполнитель" = %s
+            WHERE "Имя" = %s
+            """,
+            (started, WORKER_ID, name)
+        )
+        conn.commit()
+
+        t0 = time.perf_counter()
+        try:
+            message = j.func(conn)
+            conn.commit()
+            status, error = "ok", None
+        except Exception as exc:
+            conn.rollback()
+            log.exception("Задание %s завершилось с ошибкой", name)
+            status, message, error = "error", None, str(exc)
+
+        cursor.execute(
+            """
+            UPDATE "ФоновоеЗадание"
+            SET "Статус" = %s,
+                "Результат" = %s,
+                "Ошибка" = %s,
+                "ДлительностьМс" = %s,
+                "СледующийЗапуск" = %s
+            WHERE "Имя" = %s
+            """,
+            (status, message, error, int((time.perf_counter() - t0) * 1000),
+             j.cron.next_after(datetime.now()), name)
+        )
+        conn.commit()
+        return True
+
+    finally:
+        # Сессионная блокировка снимается и при закрытии соединения
+        conn.close()
+
+
+class Scheduler:
+    def __init__(self, tick: float = TICK_SECONDS, workers: int = MAX_WORKERS):
+        self.tick = tick
+        self.semaphore = asyncio.Semaphore(workers)
+        self.running: set[str] = set()
+        self.tasks: set[asyncio.Task] = set()
+        self.registered = False
+
+    async def _run(self, name: str):
+        try:
+            async with self.semaphore:
+                await asyncio.to_thread(run_job, name)
+        except Exception:
+            log.exception("Не удалось выполнить задание %s", name)
+        finally:
+            self.running.discard(name)
+
+    async def tick_once(self):
+        if not self.registered:
+            await asyncio.to_thread(register_jobs)
+            self.registered = True
+
+        for name in await asyncio.to_thread(due_jobs):
+            if name in self.running:
+                continue
+            self.running.add(name)
+            task = asyncio.create_task(self._run(name))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def loop(self):
+        while True:
+            try:
+                await self.tick_once()
+            except Exception:
+                # БД недоступна, таблиц нет — пробуем на следующем такте
+                log.exception("Ошибка планировщика фоновых заданий")
+            await asyncio.sleep(self.tick)
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+@asynccontextmanager
+async def run_scheduler():
+    """Планировщик на время жизни приложения (см. lifespan в app.py)."""
+    scheduler = Scheduler()
+    main = asyncio.create_task(scheduler.loop())
+    try:
+        yield scheduler
+    finally:
+        main.cancel()
+        await asyncio.gather(main, return_exceptions=True)
+        await scheduler.stop()
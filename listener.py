@@ -0,0 +1,131 @@
+import logging
+import select
+import threading
+import time
+
+from db import get_dedicated_connection
+
+log = logging.getLogger("zoo.listener")
+
+# ==========================================================
+# ОДНО LISTEN-СОЕДИНЕНИЕ НА ПРОЦЕСС
+#
+# Фоновый поток держит соединение с Postgres, слушает каналы, на которые
+# подписались модули (on(channel, fn)), и вызывает обработчики прямо
+# в этом потоке — обработчик должен быть быстрым и сам передавать
+# данные в asyncio (loop.call_soon_threadsafe).
+#
+# При обрыве соединение восстанавливается с нарастающей паузой.
+# NOTIFY, отправленные пока соединения не было, потеряны — поэтому
+# после переподключения вызываются обработчики on_reconnect.
+# ==========================================================
+
+POLL_SECONDS = 5
+BACKOFF_START = 1
+BACKOFF_MAX = 30
+
+
+class PgListener:
+    def __init__(self):
+        self.handlers: dict[str, list] = {}
+        self.reconnect_handlers: list = []
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self.stopping = threading.Event()
+        self.connected = threading.Event()
+
+    def on(self, channel: str, handler):
+        """handler(payload: str) для каждого NOTIFY канала."""
+        with self.lock:
+            self.handlers.setdefault(channel, []).append(handler)
+
+    def on_reconnect(self, handler):
+        """handler() после восстановления соединения (уведомления могли потеряться)."""
+        with self.lock:
+            self.reconnect_handlers.append(handler)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="pg-listener", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(timeout=POLL_SECONDS + 1)
+
+    def _dispatch(self, channel: str, payload: str):
+        with self.lock:
+            handlers = list(self.handlers.get(channel, ()))
+        for handler in handlers:
+            try:
+                handler(payload)
+            except Exception:
+                log.exception("Ошибка обработчика канала %s", channel)
+
+    def _reconnected(self):
+        with self.lock:
+            handlers = list(self.reconnect_handlers)
+        for handler in handlers:
+            try:
+                handler()
+            except Exception:
+                log.exception("Ошибка обработчика переподключения")
+
+    def _listen_loop(self, conn):
+        cursor = conn.cursor()
+        listening = set()
+
+        while not self.stopping.is_set():
+            # Каналы могли добавиться после подключения
+            with self.lock:
+                channels = set(self.handlers) - listening
+            for channel in channels:
+                cursor.execute(f'LISTEN "{channel}"')
+                listening.add(channel)
+
+            if select.select([conn], [], [], POLL_SECONDS) == ([], [], []):
+                # Тишина: проверяем, что соединение живо
+                cursor.execute("SELECT 1")
+                continue
+
+            conn.poll()
+            while conn.notifies:
+                n = conn.notifies.pop(0)
+                self._dispatch(n.channel, n.payload)
+
+    def _run(self):
+        backoff = BACKOFF_START
+        first = True
+
+        while not self.stopping.is_set():
+            conn = None
+            try:
+                conn = get_dedicated_connection()
+                conn.autocommit = True
+                self.connected.set()
+                backoff = BACKOFF_START
+
+                if not first:
+                    log.warning("LISTEN-соединение восстановлено")
+                    self._reconnected()
+                first = False
+
+                self._listen_loop(conn)
+
+            except Exception:
+                self.connected.clear()
+                log.exception("LISTEN-соединение потеряно, повтор через %s с", backoff)
+                self.stopping.wait(backoff)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+
+            finally:
+                if conn is not None:
+                    conn.close()
+
+        self.connected.clear()
+
+
+listener = PgListener()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+from dataclasses import dataclass, field
+
+from listener import listener
+
+# ==========================================================
+# ЖИВЫЕ СОБЫТИЯ ДЛЯ СТРАНИЦ (Server-Sent Events)
+#
+# NOTIFY zoo_events (patch_live_events.py) приходит в общий LISTEN-поток
+# (listener.py) и раздаётся подписчикам — открытым вкладкам с /events.
+# У каждого подписчика своя ограниченная очередь: если вкладка не успевает
+# читать, события не копятся, а ей отправляется "reload".
+# ==========================================================
+
+CHANNEL = "zoo_events"
+QUEUE_SIZE = 100
+
+# Кто какие темы может получать — как доступ к соответствующим страницам
+TOPIC_ROLES = {
+    "malfunctions": {"admin", "director", "manager", "zootechnician"},
+    "feeds": {"admin", "director", "manager", "zootechnician"},
+    "animals": {"manager", "zootechnician"},
+}
+
+
+def allowed_topics(role: str, requested: set[str]) -> set[str]:
+    return {t for t in requested if role in TOPIC_ROLES.get(t, ())}
+
+
+def visible(role: str, event: dict) -> bool:
+    # Зоотехник видит неисправности только в вольерах (как в fetch_malfunctions)
+    if event.get("topic") == "malfunctions" and role == "zootechnician":
+        return event.get("place") == "Вольер"
+    return True
+
+
+@dataclass(eq=False)
+class Subscriber:
+    role: str
+    topics: set
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(QUEUE_SIZE))
+    overflow: bool = False
+
+    def deliver(self, event: dict):
+        # Вызывается в цикле событий (call_soon_threadsafe)
+        if self.overflow:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.mark_stale()
+
+    def mark_stale(self):
+        # Часть событий потеряна: страница должна перечитать таблицу целиком
+        self.overflow = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait({"topic": "reload"})
+
+
+class Hub:
+    def __init__(self):
+        self.subscribers: set[Subscriber] = set()
+
+    def subscribe(self, role: str, topics: set[str]) -> Subscriber:
+        sub = Subscriber(role, topics, asyncio.get_running_loop())
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self.subscribers.discard(sub)
+
+    def publish(self, payload: str):
+        """Обработчик NOTIFY — вызывается в LISTEN-потоке."""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+
+        for sub in list(self.subscribers):
+            if event.get("topic") in sub.topics and visible(sub.role, event):
+                sub.loop.call_soon_threadsafe(sub.deliver, event)
+
+    def resync(self):
+        """После переподключения LISTEN: события могли пропасть."""
+        for sub in list(self.subscribers):
+            sub.loop.call_soon_threadsafe(sub.mark_stale)
+
+
+hub = Hub()
+listener.on(CHANNEL, hub.publish)
+listener.on_reconnect(hub.resync)
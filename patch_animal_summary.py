@@ -0,0 +1,261 @@
+from db import get_connection
+
+# ==========================================================
+# Сводка по животным для страницы /animals
+#
+# "СводкаЖивотного" — денормализованная таблица, которую поддерживают
+# триггеры: одна строка на животное с готовым текстом рациона,
+# ФИО ответственного и последним осмотром из медкарты.
+#
+# Рацион определяется так же, как при кормлении (feedings.feeding_add) —
+# по виду животного; "IDРациона" из "Животное" используется, только
+# если для вида рациона нет.
+# ==========================================================
+
+SUMMARY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS "СводкаЖивотного" (
+    "IDЖивотного"           INTEGER PRIMARY KEY,
+    "Вид"                   TEXT,
+    "Кличка"                TEXT,
+    "Возраст"               INTEGER,
+    "Пол"                   TEXT,
+    "ДатаПоступления"       DATE,
+    "СостояниеЗдоровья"     TEXT,
+    "IDСотрудника"          INTEGER,
+    "ФИОСотрудника"         TEXT,
+    "IDРациона"             INTEGER,
+    "ТекстРациона"          TEXT NOT NULL DEFAULT '-',
+    "ПоследнийДиагноз"      TEXT,
+    "ДатаПоследнегоОсмотра" DATE
+);
+
+CREATE INDEX IF NOT EXISTS "СводкаЖивотного_Пол_idx"
+    ON "СводкаЖивотного" ("Пол");
+"""
+
+# Поиск по виду идёт через ILIKE '%...%' — ускоряется триграммным индексом
+TRGM_INDEX_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS "СводкаЖивотного_Вид_trgm_idx"
+    ON "СводкаЖивотного" USING GIN ("Вид" gin_trgm_ops);
+"""
+
+REFRESH_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION "ОбновитьСводкуЖивотных"(ids INTEGER[])
+RETURNS void AS $$
+BEGIN
+    -- ids = NULL → полная перестройка
+    DELETE FROM "СводкаЖивотного" sv
+    WHERE (ids IS NULL OR sv."IDЖивотного" = ANY(ids))
+      AND NOT EXISTS (
+          SELECT 1 FROM "Животное" j WHERE j."IDЖивотного" = sv."IDЖивотного"
+      );
+
+    INSERT INTO "СводкаЖивотного" AS sv (
+        "IDЖивотного", "Вид", "Кличка", "Возраст", "Пол", "ДатаПоступления",
+        "СостояниеЗдоровья", "IDСотрудника", "ФИОСотрудника", "IDРациона",
+        "ТекстРациона", "ПоследнийДиагноз", "ДатаПоследнегоОсмотра"
+    )
+    SELECT
+        j."IDЖивотного",
+        j."Вид",
+        j."Кличка",
+        j."Возраст",
+        j."Пол",
+        j."ДатаПоступления",
+        j."СостояниеЗдоровья",
+        j."IDСотрудника",
+        s."ФИО",
+        r."IDРациона",
+        CASE
+            WHEN r."IDРациона" IS NULL THEN '-'
+            ELSE COALESCE(
+                NULLIF(concat_ws(', ',
+                    NULLIF(k."Наименование", ''),
+                    CASE
+                        WHEN r."Количество" IS NOT NULL AND NULLIF(k."ЕдиницаИзмерения", '') IS NOT NULL
+                        THEN r."Количество" || ' ' || k."ЕдиницаИзмерения"
+                    END,
+                    NULLIF(r."ЧастотаКормления", '')
+                ), ''),
+                'Рацион #' || r."IDРациона"
+            )
+        END,
+        m."Диагноз",
+        m."ДатаОсмотра"
+    FROM "Животное" j
+    LEFT JOIN "Сотрудник" s ON s."IDСотрудника" = j."IDСотрудника"
+    LEFT JOIN LATERAL (
+        SELECT r0.*
+        FROM "Рацион" r0
+        WHERE r0."ВидЖивотного" = j."Вид"
+           OR r0."IDРациона" = j."IDРациона"
+        ORDER BY (r0."ВидЖивотного" = j."Вид") DESC, r0."IDРациона"
+        LIMIT 1
+    ) r ON TRUE
+    LEFT JOIN "Корм" k ON k."IDКорма" = r."IDКорма"
+    LEFT JOIN LATERAL (
+        SELECT m0."Диагноз", m0."ДатаОсмотра"
+        FROM "Медкарта" m0
+        WHERE m0."IDЖивотного" = j."IDЖивотного"
+        ORDER BY m0."ДатаОсмотра" DESC, m0."IDМедкарты" DESC
+        LIMIT 1
+    ) m ON TRUE
+    WHERE ids IS NULL OR j."IDЖивотного" = ANY(ids)
+    ON CONFLICT ("IDЖивотного") DO UPDATE SET
+        "Вид"                   = EXCLUDED."Вид",
+        "Кличка"                = EXCLUDED."Кличка",
+        "Возраст"               = EXCLUDED."Возраст",
+        "Пол"                   = EXCLUDED."Пол",
+        "ДатаПоступления"       = EXCLUDED."ДатаПоступления",
+        "СостояниеЗдоровья"     = EXCLUDED."СостояниеЗдоровья",
+        "IDСотрудника"          = EXCLUDED."IDСотрудника",
+        "ФИОСотрудника"         = EXCLUDED."ФИОСотрудника",
+        "IDРациона"             = EXCLUDED."IDРациона",
+        "ТекстРациона"          = EXCLUDED."ТекстРациона",
+        "ПоследнийДиагноз"      = EXCLUDED."ПоследнийДиагноз",
+        "ДатаПоследнегоОсмотра" = EXCLUDED."ДатаПоследнегоОсмотра";
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TRIGGERS_SQL = """
+-- Животное: сама строка
+CREATE OR REPLACE FUNCTION "trg_сводка_животное"() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM "ОбновитьСводкуЖивотных"(ARRAY[OLD."IDЖивотного"]);
+    ELSE
+        PERFORM "ОбновитьСводкуЖивотных"(ARRAY[NEW."IDЖивотного"]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "сводка_животное" ON "Животное";
+CREATE TRIGGER "сводка_животное"
+AFTER INSERT OR UPDATE OR DELETE ON "Животное"
+FOR EACH ROW EXECUTE FUNCTION "trg_сводка_животное"();
+
+
+-- Медкарта: последний осмотр
+CREATE OR REPLACE FUNCTION "trg_сводка_медкарта"() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM "ОбновитьСводкуЖивотных"(ARRAY[OLD."IDЖивотного"]);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM "ОбновитьСводкуЖивотных"(ARRAY[NEW."IDЖивотного"]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "сводка_медкарта" ON "Медкарта";
+CREATE TRIGGER "сводка_медкарта"
+AFTER INSERT OR UPDATE OR DELETE ON "Медкарта"
+FOR EACH ROW EXECUTE FUNCTION "trg_сводка_медкарта"();
+
+
+-- Сотрудник: смена ФИО
+CREATE OR REPLACE FUNCTION "trg_сводка_сотрудник"() RETURNS trigger AS $$
+BEGIN
+    PERFORM "ОбновитьСводкуЖивотных"(ARRAY(
+        SELECT "IDЖивотного" FROM "Животное" WHERE "IDСотрудника" = NEW."IDСотрудника"
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "сводка_сотрудник" ON "Сотрудник";
+CREATE TRIGGER "сводка_сотрудник"
+AFTER UPDATE OF "ФИО" ON "Сотрудник"
+FOR EACH ROW EXECUTE FUNCTION "trg_сводка_сотрудник"();
+
+
+-- Рацион: все животные вида (старого и нового) и ссылающиеся по IDРациона
+CREATE OR REPLACE FUNCTION "trg_сводка_рацион"() RETURNS trigger AS $$
+DECLARE
+    species TEXT[];
+    ration_ids INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        species := ARRAY[NEW."ВидЖивотного"];
+        ration_ids := ARRAY[NEW."IDРациона"];
+    ELSIF TG_OP = 'DELETE' THEN
+        species := ARRAY[OLD."ВидЖивотного"];
+        ration_ids := ARRAY[OLD."IDРациона"];
+    ELSE
+        species := ARRAY[OLD."ВидЖивотного", NEW."ВидЖивотного"];
+        ration_ids := ARRAY[OLD."IDРациона", NEW."IDРациона"];
+    END IF;
+
+    PERFORM "ОбновитьСводкуЖивотных"(ARRAY(
+        SELECT "IDЖивотного" FROM "Животное"
+        WHERE "Вид" = ANY(species) OR "IDРациона" = ANY(ration_ids)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "сводка_рацион" ON "Рацион";
+CREATE TRIGGER "сводка_рацион"
+AFTER INSERT OR UPDATE OR DELETE ON "Рацион"
+FOR EACH ROW EXECUTE FUNCTION "trg_сводка_рацион"();
+
+
+-- Корм: только название и единица (остаток меняется при каждом кормлении)
+CREATE OR REPLACE FUNCTION "trg_сводка_корм"() RETURNS trigger AS $$
+BEGIN
+    PERFORM "ОбновитьСводкуЖивотных"(ARRAY(
+        SELECT j."IDЖивотного"
+        FROM "Животное" j
+        JOIN "Рацион" r
+          ON r."ВидЖивотного" = j."Вид" OR r."IDРациона" = j."IDРациона"
+        WHERE r."IDКорма" = NEW."IDКорма"
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "сводка_корм" ON "Корм";
+CREATE TRIGGER "сводка_корм"
+AFTER UPDATE OF "Наименование", "ЕдиницаИзмерения" ON "Корм"
+FOR EACH ROW EXECUTE FUNCTION "trg_сводка_корм"();
+"""
+
+
+def patch_animal_summary():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    print("➕ Таблица \"СводкаЖивотного\"...")
+    cursor.execute(SUMMARY_TABLE_SQL)
+
+    print("➕ Функция \"ОбновитьСводкуЖивотных\"...")
+    cursor.execute(REFRESH_FUNCTION_SQL)
+
+    print("➕ Триггеры на Животное / Медкарта / Сотрудник / Рацион / Корм...")
+    cursor.execute(TRIGGERS_SQL)
+
+    print("🔄 Первичное заполнение сводки...")
+    cursor.execute('SELECT "ОбновитьСводкуЖивотных"(NULL)')
+    conn.commit()
+
+    # Триграммный индекс — необязателен (нужны права на CREATE EXTENSION)
+    try:
+        cursor.execute(TRGM_INDEX_SQL)
+        conn.commit()
+        print("✔ Триграммный индекс по виду создан.")
+    except Exception as e:
+        conn.rollback()
+        print("⚠ Триграммный индекс не создан:", str(e).strip())
+
+    conn.close()
+    print("✔ Сводка по животным готова.")
+
+
+if __name__ == "__main__":
+    print("=== Patch animal summary ===")
+    patch_animal_summary()
+    print("=== Done ===")
@@ -0,0 +1,56 @@
+from db import get_connection
+from consumption import SPECIES_CONSUMPTION_SELECT
+
+# ==========================================================
+# Динамика расхода корма (см. consumption.py)
+#
+# "СводкаРасходаПоВидам" — расход по дням, видам животных, кормам
+#                          и сотрудникам (задание expense_rollup).
+# Индексы по дате — для дочитывания сегодняшнего дня из живых таблиц.
+# ==========================================================
+
+TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS "СводкаРасходаПоВидам" (
+    "Дата"         DATE    NOT NULL,
+    "ВидЖивотного" TEXT    NOT NULL,
+    "IDКорма"      INTEGER NOT NULL,
+    "IDСотрудника" INTEGER NOT NULL,
+    "Количество"   NUMERIC NOT NULL,
+    PRIMARY KEY ("Дата", "ВидЖивотного", "IDКорма", "IDСотрудника")
+);
+
+CREATE INDEX IF NOT EXISTS "Расход_Дата_idx"
+    ON "Расход" ("Дата");
+
+CREATE INDEX IF NOT EXISTS "Кормление_ДатаИВремя_idx"
+    ON "Кормление" ("ДатаИВремя");
+"""
+
+BACKFILL_SQL = f"""
+TRUNCATE "СводкаРасходаПоВидам";
+
+INSERT INTO "СводкаРасходаПоВидам"
+    ("Дата", "ВидЖивотного", "IDКорма", "IDСотрудника", "Количество")
+{SPECIES_CONSUMPTION_SELECT}
+"""
+
+
+def patch_consumption():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    print("➕ Сводка расхода по видам животных и индексы по дате...")
+    cursor.execute(TABLES_SQL)
+
+    print("🔄 Сводка расхода по видам за всю историю...")
+    cursor.execute(BACKFILL_SQL, {"since": "-infinity"})
+    print(f"✔ Строк в сводке: {cursor.rowcount}")
+
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Patch consumption time series ===")
+    patch_consumption()
+    print("=== Done ===")
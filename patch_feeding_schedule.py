@@ -0,0 +1,63 @@
+from datetime import date
+
+from db import get_connection
+from feeding_schedule import build_day, parse_frequency, SYNC_RATION_SQL
+
+# ==========================================================
+# График кормлений (см. feeding_schedule.py)
+#
+# "РасписаниеРациона" — разобранная "ЧастотаКормления" рациона.
+# "СлотКормления"     — кормления на конкретный день: кого, когда, кто;
+#                       "IDКормления" заполняется при проведении кормления.
+# ==========================================================
+
+TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS "РасписаниеРациона" (
+    "IDРациона"      INTEGER PRIMARY KEY,
+    "КормленийВДень" INTEGER NOT NULL CHECK ("КормленийВДень" > 0),
+    "КаждыеДней"     INTEGER NOT NULL DEFAULT 1 CHECK ("КаждыеДней" > 0),
+    "ИсходныйТекст"  TEXT
+);
+
+CREATE TABLE IF NOT EXISTS "СлотКормления" (
+    "IDСлота"      SERIAL PRIMARY KEY,
+    "Дата"         DATE    NOT NULL,
+    "Время"        TIME    NOT NULL,
+    "IDЖивотного"  INTEGER NOT NULL,
+    "IDСотрудника" INTEGER,
+    "IDКормления"  INTEGER,
+    UNIQUE ("Дата", "IDЖивотного", "Время")
+);
+
+CREATE INDEX IF NOT EXISTS "СлотКормления_дата_сотрудник_idx"
+    ON "СлотКормления" ("Дата", "IDСотрудника")
+    WHERE "IDКормления" IS NULL;
+"""
+
+
+def patch_feeding_schedule():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    print("➕ Таблицы \"РасписаниеРациона\" и \"СлотКормления\"...")
+    cursor.execute(TABLES_SQL)
+
+    print("🔄 Разбор частоты кормления всех рационов...")
+    cursor.execute('SELECT "IDРациона", "ЧастотаКормления" FROM "Рацион"')
+    for ration_id, frequency in cursor.fetchall():
+        freq = parse_frequency(frequency)
+        cursor.execute(SYNC_RATION_SQL, (ration_id, freq.per_day, freq.every_days, frequency))
+        print(f"   • рацион #{ration_id}: «{frequency}» → {freq.per_day} в день, раз в {freq.every_days} дн.")
+
+    print("🔄 Слоты на сегодня...")
+    created = build_day(cursor, date.today())
+    print(f"✔ Создано слотов: {created}")
+
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Patch feeding schedule ===")
+    patch_feeding_schedule()
+    print("=== Done ===")
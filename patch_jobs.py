@@ -0,0 +1,82 @@
+from db import get_connection
+
+# ==========================================================
+# Фоновые задания (jobs.py)
+#
+# "ФоновоеЗадание"        — расписание и результат последнего запуска.
+# "ОповещениеОКормлении"  — животные, которых не кормили дольше
+#                           интервала рациона (задание missed_feedings).
+#                           Открытое оповещение на животное — одно.
+# "СводкаРасходаПоДням"   — расход корма по дням, кормам и сотрудникам
+#                           (задание expense_rollup).
+# ==========================================================
+
+TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS "ФоновоеЗадание" (
+    "Имя"             TEXT PRIMARY KEY,
+    "Расписание"      TEXT      NOT NULL,
+    "Включено"        BOOLEAN   NOT NULL DEFAULT TRUE,
+    "СледующийЗапуск" TIMESTAMP NOT NULL,
+    "ПоследнийЗапуск" TIMESTAMP,
+    "Статус"          TEXT,
+    "Результат"       TEXT,
+    "Ошибка"          TEXT,
+    "ДлительностьМс"  INTEGER,
+    "Исполнитель"     TEXT
+);
+
+CREATE TABLE IF NOT EXISTS "ОповещениеОКормлении" (
+    "IDОповещения"       SERIAL PRIMARY KEY,
+    "IDЖивотного"        INTEGER   NOT NULL,
+    "IDСотрудника"       INTEGER,
+    "ПоследнееКормление" TIMESTAMP,
+    "ДопустимыйИнтервал" INTERVAL  NOT NULL,
+    "Создано"            TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+    "Закрыто"            TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS "ОповещениеОКормлении_открытое_uq"
+    ON "ОповещениеОКормлении" ("IDЖивотного")
+    WHERE "Закрыто" IS NULL;
+
+CREATE INDEX IF NOT EXISTS "Кормление_животное_время_idx"
+    ON "Кормление" ("IDЖивотного", "ДатаИВремя" DESC);
+
+CREATE TABLE IF NOT EXISTS "СводкаРасходаПоДням" (
+    "Дата"         DATE    NOT NULL,
+    "IDКорма"      INTEGER NOT NULL,
+    "IDСотрудника" INTEGER NOT NULL,
+    "Количество"   NUMERIC NOT NULL,
+    PRIMARY KEY ("Дата", "IDКорма", "IDСотрудника")
+);
+"""
+
+ROLLUP_BACKFILL_SQL = """
+TRUNCATE "СводкаРасходаПоДням";
+
+INSERT INTO "СводкаРасходаПоДням" ("Дата", "IDКорма", "IDСотрудника", "Количество")
+SELECT "Дата", "IDКорма", "IDСотрудника", SUM("Количество")
+FROM "Расход"
+GROUP BY "Дата", "IDКорма", "IDСотрудника";
+"""
+
+
+def patch_jobs():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    print("➕ Таблицы фоновых заданий, оповещений и сводки расхода...")
+    cursor.execute(TABLES_SQL)
+
+    print("🔄 Сводка расхода по дням за всю историю...")
+    cursor.execute(ROLLUP_BACKFILL_SQL)
+    print(f"✔ Строк в сводке: {cursor.rowcount}")
+
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Patch background jobs ===")
+    patch_jobs()
+    print("=== Done ===")
@@ -0,0 +1,96 @@
+from db import get_connection
+
+# ==========================================================
+# NOTIFY об изменениях для живого обновления страниц
+# (listener.py → live_events.py → GET /events)
+#
+# Канал zoo_events, полезная нагрузка — JSON:
+#   {"topic": "malfunctions" | "feeds" | "animals", "op": INSERT/UPDATE/DELETE,
+#    "id": ..., поля строки, нужные странице}
+# NOTIFY доставляется только после COMMIT, откаченные изменения не видны.
+# Полезная нагрузка ограничена 8000 байт — длинные тексты обрезаются.
+# ==========================================================
+
+CHANNEL = "zoo_events"
+
+TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION "trg_zoo_events"() RETURNS trigger AS $$
+DECLARE
+    r       RECORD;
+    payload JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        r := OLD;
+    ELSE
+        r := NEW;
+    END IF;
+
+    IF TG_TABLE_NAME = 'Неисправность' THEN
+        payload := jsonb_build_object(
+            'topic',       'malfunctions',
+            'id',          r."IDНеисправности",
+            'place',       r."Место",
+            'status',      r."СтатусУстранения",
+            'description', left(r."ОписаниеПроблемы", 1000),
+            'solved_at',   to_char(r."ДатаРешения", 'DD.MM.YYYY')
+        );
+
+    ELSIF TG_TABLE_NAME = 'Корм' THEN
+        payload := jsonb_build_object(
+            'topic',  'feeds',
+            'id',     r."IDКорма",
+            'name',   r."Наименование",
+            'stock',  r."ОстатокНаСкладе",
+            'is_low', COALESCE(r."ОстатокНаСкладе" < (
+                          SELECT AVG("Количество") FROM "Рацион" WHERE "IDКорма" = r."IDКорма"
+                      ), FALSE)
+        );
+
+    ELSE
+        payload := jsonb_build_object(
+            'topic',         'animals',
+            'id',            r."IDЖивотного",
+            'health_status', r."СостояниеЗдоровья",
+            'employee_id',   r."IDСотрудника"
+        );
+    END IF;
+
+    PERFORM pg_notify('{CHANNEL}', (payload || jsonb_build_object('op', TG_OP))::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "zoo_events" ON "Неисправность";
+CREATE TRIGGER "zoo_events"
+AFTER INSERT OR UPDATE OR DELETE ON "Неисправность"
+FOR EACH ROW EXECUTE FUNCTION "trg_zoo_events"();
+
+-- Остаток меняется при кормлениях и поставках — именно его и ждёт страница
+DROP TRIGGER IF EXISTS "zoo_events" ON "Корм";
+CREATE TRIGGER "zoo_events"
+AFTER INSERT OR UPDATE OF "ОстатокНаСкладе", "Наименование" OR DELETE ON "Корм"
+FOR EACH ROW EXECUTE FUNCTION "trg_zoo_events"();
+
+DROP TRIGGER IF EXISTS "zoo_events" ON "Животное";
+CREATE TRIGGER "zoo_events"
+AFTER INSERT OR UPDATE OF "СостояниеЗдоровья", "IDСотрудника" OR DELETE ON "Животное"
+FOR EACH ROW EXECUTE FUNCTION "trg_zoo_events"();
+"""
+
+
+def patch_live_events():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    print(f"➕ Триггеры NOTIFY {CHANNEL} на \"Неисправность\", \"Корм\", \"Животное\"...")
+    cursor.execute(TRIGGER_SQL)
+    print("✔ Готово")
+
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Patch live events ===")
+    patch_live_events()
+    print("=== Done ===")
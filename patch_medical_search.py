@@ -0,0 +1,50 @@
+from db import get_connection
+
+# ==========================================================
+# Полнотекстовый поиск по медкартам
+#
+# "ПоисковыйВектор" — генерируемая колонка (russian), пересчитывается
+# самим PostgreSQL при INSERT/UPDATE. Диагноз весит больше всего,
+# лечение — меньше, прививки и результат — меньше всего.
+# GIN-индекс по вектору + B-tree по дате для фильтра периода.
+# ==========================================================
+
+SEARCH_VECTOR_SQL = """
+ALTER TABLE "Медкарта"
+ADD COLUMN IF NOT EXISTS "ПоисковыйВектор" tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', coalesce("Диагноз", '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce("НазначенноеЛечение", '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce("Прививки", '')), 'C') ||
+    setweight(to_tsvector('russian', coalesce("РезультатПроцедуры", '')), 'C')
+) STORED;
+"""
+
+INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS "Медкарта_ПоисковыйВектор_gin"
+    ON "Медкарта" USING GIN ("ПоисковыйВектор");
+
+CREATE INDEX IF NOT EXISTS "Медкарта_ДатаОсмотра_idx"
+    ON "Медкарта" ("ДатаОсмотра");
+"""
+
+
+def patch_medical_search():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    print("➕ Колонка \"ПоисковыйВектор\" (может занять время на большой медкарте)...")
+    cursor.execute(SEARCH_VECTOR_SQL)
+
+    print("➕ Индексы GIN и по дате осмотра...")
+    cursor.execute(INDEXES_SQL)
+
+    conn.commit()
+    conn.close()
+    print("✔ Полнотекстовый поиск по медкартам готов.")
+
+
+if __name__ == "__main__":
+    print("=== Patch medical search ===")
+    patch_medical_search()
+    print("=== Done ===")
@@ -0,0 +1,58 @@
+from db import get_connection
+
+# ==========================================================
+# Очередь фоновых отчётов (reports.py)
+#
+# "Статус": queued → running → done | error
+# Файл отчёта лежит в reports/<ИмяФайла>, удаляется вместе
+# с записью через REPORT_RETENTION (задание report_cleanup).
+# ==========================================================
+
+TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS "ОтчётнаяЗадача" (
+    "IDЗадачи"     SERIAL PRIMARY KEY,
+    "Тип"          TEXT      NOT NULL,
+    "Параметры"    JSONB     NOT NULL DEFAULT '{}',
+    "IDСотрудника" INTEGER   NOT NULL,
+    "Статус"       TEXT      NOT NULL DEFAULT 'queued'
+                   CHECK ("Статус" IN ('queued', 'running', 'done', 'error')),
+    "Прогресс"     INTEGER   NOT NULL DEFAULT 0,
+    "СтрокГотово"  INTEGER   NOT NULL DEFAULT 0,
+    "СтрокВсего"   INTEGER,
+    "ИмяФайла"     TEXT,
+    "РазмерБайт"   BIGINT,
+    "Ошибка"       TEXT,
+    "Создано"      TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+    "Начато"       TIMESTAMP,
+    "Пульс"        TIMESTAMP,
+    "Завершено"    TIMESTAMP
+);
+
+-- Последняя отметка обработчика (reports._set_progress)
+ALTER TABLE "ОтчётнаяЗадача" ADD COLUMN IF NOT EXISTS "Пульс" TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS "ОтчётнаяЗадача_очередь_idx"
+    ON "ОтчётнаяЗадача" ("IDЗадачи")
+    WHERE "Статус" = 'queued';
+
+CREATE INDEX IF NOT EXISTS "ОтчётнаяЗадача_сотрудник_idx"
+    ON "ОтчётнаяЗадача" ("IDСотрудника", "IDЗадачи" DESC);
+"""
+
+
+def patch_reports():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    print("➕ Таблица \"ОтчётнаяЗадача\"...")
+    cursor.execute(TABLES_SQL)
+    print("✔ Готово")
+
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Patch report queue ===")
+    patch_reports()
+    print("=== Done ===")
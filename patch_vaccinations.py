@@ -0,0 +1,111 @@
+from db import get_connection
+
+# ==========================================================
+# Структурированные прививки и интервалы ревакцинации
+#
+# "Вакцинация" — разобранный текст "Прививки" из "Медкарта":
+# одна строка на вакцину в осмотре. Поддерживается триггером,
+# поэтому medical.medical_add менять не нужно.
+#
+# "ИнтервалРевакцинации" — через сколько дней повторять вакцину
+# для вида. '*' в виде или вакцине — значение по умолчанию.
+# NULL в "ИнтервалДней" — вакцина однократная.
+# ==========================================================
+
+TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS "Вакцинация" (
+    "IDВакцинации"   SERIAL PRIMARY KEY,
+    "IDМедкарты"     INTEGER NOT NULL,
+    "IDЖивотного"    INTEGER NOT NULL,
+    "Вакцина"        TEXT    NOT NULL,
+    "ДатаВакцинации" DATE    NOT NULL,
+    UNIQUE ("IDМедкарты", "Вакцина")
+);
+
+CREATE INDEX IF NOT EXISTS "Вакцинация_животное_вакцина_idx"
+    ON "Вакцинация" ("IDЖивотного", "Вакцина", "ДатаВакцинации" DESC);
+
+CREATE TABLE IF NOT EXISTS "ИнтервалРевакцинации" (
+    "ВидЖивотного"  TEXT NOT NULL DEFAULT '*',
+    "Вакцина"       TEXT NOT NULL DEFAULT '*',
+    "ИнтервалДней"  INTEGER CHECK ("ИнтервалДней" IS NULL OR "ИнтервалДней" > 0),
+    PRIMARY KEY ("ВидЖивотного", "Вакцина")
+);
+
+-- По умолчанию — ежегодная ревакцинация
+INSERT INTO "ИнтервалРевакцинации" ("ВидЖивотного", "Вакцина", "ИнтервалДней")
+VALUES ('*', '*', 365)
+ON CONFLICT DO NOTHING;
+"""
+
+# Разбор свободного текста: "Бешенство, чумка; лептоспироз." →
+# {"бешенство", "чумка", "лептоспироз"}
+PARSE_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION "РазобратьПрививки"(txt TEXT)
+RETURNS SETOF TEXT AS $$
+    SELECT DISTINCT v
+    FROM (
+        SELECT lower(btrim(part, E' \t\r\n.-')) AS v
+        FROM regexp_split_to_table(coalesce(txt, ''), E'[,;\n]+|\\s+и\\s+') AS part
+    ) p
+    WHERE v <> '' AND v NOT IN ('нет', 'не проводились', '-')
+$$ LANGUAGE sql IMMUTABLE;
+"""
+
+TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION "trg_вакцинация_медкарта"() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM "Вакцинация" WHERE "IDМедкарты" = OLD."IDМедкарты";
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO "Вакцинация" ("IDМедкарты", "IDЖивотного", "Вакцина", "ДатаВакцинации")
+        SELECT NEW."IDМедкарты", NEW."IDЖивотного", v, NEW."ДатаОсмотра"
+        FROM "РазобратьПрививки"(NEW."Прививки") AS v
+        ON CONFLICT DO NOTHING;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "вакцинация_медкарта" ON "Медкарта";
+CREATE TRIGGER "вакцинация_медкарта"
+AFTER INSERT OR UPDATE OF "Прививки", "ДатаОсмотра", "IDЖивотного" OR DELETE ON "Медкарта"
+FOR EACH ROW EXECUTE FUNCTION "trg_вакцинация_медкарта"();
+"""
+
+BACKFILL_SQL = """
+INSERT INTO "Вакцинация" ("IDМедкарты", "IDЖивотного", "Вакцина", "ДатаВакцинации")
+SELECT m."IDМедкарты", m."IDЖивотного", v, m."ДатаОсмотра"
+FROM "Медкарта" m
+CROSS JOIN LATERAL "РазобратьПрививки"(m."Прививки") AS v
+WHERE m."Прививки" IS NOT NULL
+ON CONFLICT DO NOTHING;
+"""
+
+
+def patch_vaccinations():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    print("➕ Таблицы \"Вакцинация\" и \"ИнтервалРевакцинации\"...")
+    cursor.execute(TABLES_SQL)
+
+    print("➕ Функция разбора и триггер на \"Медкарта\"...")
+    cursor.execute(PARSE_FUNCTION_SQL)
+    cursor.execute(TRIGGER_SQL)
+
+    print("🔄 Разбор уже записанных прививок...")
+    cursor.execute(BACKFILL_SQL)
+    print(f"✔ Добавлено записей о вакцинации: {cursor.rowcount}")
+
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Patch vaccinations ===")
+    patch_vaccinations()
+    print("=== Done ===")
@@ -2,10 +2,7 @@ from fastapi import Request
 from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse
 from functools import wraps
 
-import psycopg2.extras
-
 from session import session_data
-from db import get_connection
 
 
 def role_required(allowed_roles: list, ajax: bool = False):
@@ -44,24 +41,9 @@ def role_required(allowed_roles: list, ajax: bool = False):
                 return RedirectResponse("/login", status_code=303)
 
             # ---- получить роль ----
-            conn = get_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-            cursor.execute("""
-                SELECT
-                    "IDСотрудника" AS id,
-                    CASE
-                        WHEN "Должность" = 'Администратор' THEN 'admin'
-                        WHEN "Должность" = 'Руководитель'  THEN 'director'
-                        WHEN "Должность" = 'Менеджер'      THEN 'manager'
-                        WHEN "Должность" = 'Зоотехник'     THEN 'zootechnician'
-                        ELSE 'zootechnician'
-                    END AS role
-                FROM "Сотрудник"
-                WHERE "IDСотрудника" = %s
-            """, (user_id,))
-            user = cursor.fetchone()
-            conn.close()
+            # Тот же пользователь, что и в шаблонах: загружается
+            # один раз за запрос (app.LazyRequestState)
+            user = request.state.user
 
             if not user:
                 if ajax:
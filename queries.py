@@ -0,0 +1,237 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from psycopg2 import errors
+
+from db import PooledConnection
+
+# ==========================================================
+# РЕПОЗИТОРИЙ ЗАПРОСОВ
+#
+# Общие запросы лежат здесь под именами, а роутеры вызывают их через
+# execute(cursor, "имя", params) — у каждого запроса одно место для правки.
+#
+# Частые запросы (prepare=True) готовятся на сервере один раз на каждое
+# соединение пула (PREPARE), дальше выполняются через EXECUTE без
+# повторного разбора и планирования. На соединениях вне пула запрос
+# выполняется как обычно.
+#
+# Для каждого имени считаются вызовы и суммарное время — stats().
+# ==========================================================
+
+# Роль приложения по должности сотрудника
+ROLE_SQL = """
+    CASE
+        WHEN "Должность" = 'Администратор' THEN 'admin'
+        WHEN "Должность" = 'Руководитель'  THEN 'director'
+        WHEN "Должность" = 'Менеджер'      THEN 'manager'
+        WHEN "Должность" = 'Зоотехник'     THEN 'zootechnician'
+        ELSE 'zootechnician'
+    END
+"""
+
+EMPLOYEE_COLUMNS = f"""
+    "IDСотрудника"     AS id,
+    "ФИО"              AS full_name,
+    "Должность"        AS position,
+    "КонтактныеДанные" AS phone,
+    "Пароль"           AS password,
+    "Статус"           AS status,
+    {ROLE_SQL}         AS role
+"""
+
+
+@dataclass
+class Query:
+    name: str
+    sql: str                  # параметры — %s по порядку
+    prepare: bool = False
+
+    @property
+    def statement(self) -> str:
+        return f"q_{self.name}"
+
+    def prepare_sql(self) -> str:
+        # %s → $1, $2, ... (%% остаётся литералом %)
+        n = 0
+
+        def number(_):
+            nonlocal n
+            n += 1
+            return f"${n}"
+
+        return f"PREPARE {self.statement} AS " + re.sub(r"(?<!%)%s", number, self.sql).replace("%%", "%")
+
+
+QUERIES: dict[str, Query] = {}
+
+
+def query(name: str, sql: str, prepare: bool = False) -> Query:
+    q = Query(name, sql, prepare)
+    QUERIES[name] = q
+    return q
+
+
+# ----------------------------------------------------------
+# Сотрудники
+# ----------------------------------------------------------
+
+query("employee_by_id", f"""
+    SELECT {EMPLOYEE_COLUMNS}
+    FROM "Сотрудник"
+    WHERE "IDСотрудника" = %s
+""", prepare=True)
+
+query("employee_login", f"""
+    SELECT {EMPLOYEE_COLUMNS}
+    FROM "Сотрудник"
+    WHERE "ФИО" = %s
+      AND "Пароль" = %s
+      AND "Статус" = 'Активен'
+""")
+
+query("zootechnicians", """
+    SELECT "IDСотрудника" AS id, "ФИО" AS full_name
+    FROM "Сотрудник"
+    WHERE "Должность" = 'Зоотехник'
+    ORDER BY "ФИО"
+""")
+
+# ----------------------------------------------------------
+# Рационы
+# ----------------------------------------------------------
+
+query("rations_with_feeds", """
+    SELECT
+        r."IDРациона"        AS id,
+        r."ВидЖивотного"     AS species,
+        r."Количество"       AS amount,
+        r."ЧастотаКормления" AS frequency,
+        k."Наименование"     AS feed_name,
+        k."ЕдиницаИзмерения" AS feed_unit
+    FROM "Рацион" r
+    JOIN "Корм" k ON r."IDКорма" = k."IDКорма"
+    ORDER BY r."ВидЖивотного", r."IDРациона"
+""")
+
+# ----------------------------------------------------------
+# Кормление (самый частый путь записи)
+# ----------------------------------------------------------
+
+query("animals_of_employee", """
+    SELECT
+        "IDЖивотного" AS id,
+        "Кличка"      AS name,
+        "Вид"         AS species
+    FROM "Животное"
+    WHERE "IDСотрудника" = %s
+    ORDER BY "Кличка"
+""", prepare=True)
+
+query("ration_for_animal", """
+    SELECT
+        r."IDКорма"    AS feed_id,
+        r."Количество" AS ration_quantity
+    FROM "Рацион" r
+    JOIN "Животное" j
+      ON r."ВидЖивотного" = j."Вид"
+    WHERE j."IDЖивотного" = %s
+""", prepare=True)
+
+query("feed_stock", """
+    SELECT "ОстатокНаСкладе" AS stock
+    FROM "Корм"
+    WHERE "IDКорма" = %s
+""", prepare=True)
+
+query("feeding_insert", """
+    INSERT INTO "Кормление"
+        ("IDЖивотного", "IDСотрудника", "ДатаИВремя")
+    VALUES (%s, %s, NOW())
+    RETURNING "IDКормления"
+""", prepare=True)
+
+query("feed_stock_decrease", """
+    UPDATE "Корм"
+    SET "ОстатокНаСкладе" = "ОстатокНаСкладе" - %s
+    WHERE "IDКорма" = %s
+""", prepare=True)
+
+query("expense_next_id", """
+    SELECT COALESCE(MAX("IDРасхода"), 0) + 1 AS new_id FROM "Расход"
+""", prepare=True)
+
+query("expense_insert", """
+    INSERT INTO "Расход"
+        ("IDРасхода", "IDКорма", "IDСотрудника", "Дата", "Количество")
+    VALUES (%s, %s, %s, CURRENT_DATE, %s)
+""", prepare=True)
+
+
+# ==========================================================
+# ВЫПОЛНЕНИЕ
+# ==========================================================
+
+_stats_lock = threading.Lock()
+_calls: dict[str, int] = {}
+_total_ms: dict[str, float] = {}
+
+
+def execute(cursor, name: str, params: tuple = ()):
+    """Выполняет запрос по имени; результат читается из cursor как обычно."""
+    q = QUERIES[name]
+    conn = cursor.connection
+    t0 = time.perf_counter()
+
+    try:
+        if q.prepare and isinstance(conn, PooledConnection):
+            if q.statement not in conn.prepared:
+                cursor.execute(q.prepare_sql())
+                conn.prepared.add(q.statement)
+
+            if params:
+                cursor.execute(f"EXECUTE {q.statement}({', '.join(['%s'] * len(params))})", params)
+            else:
+                cursor.execute(f"EXECUTE {q.statement}")
+        else:
+            cursor.execute(q.sql, params)
+
+    except errors.InvalidSqlStatementName:
+        # Сервер не знает подготовленного запроса (например, его сбросили
+        # DISCARD ALL) — подготовим заново при следующем вызове
+        conn.prepared.discard(q.statement)
+        raise
+
+    finally:
+        elapsed = (time.perf_counter() - t0) * 1000
+        with _stats_lock:
+            _calls[name] = _calls.get(name, 0) + 1
+            _total_ms[name] = _total_ms.get(name, 0.0) + elapsed
+
+    return cursor
+
+
+def fetchone(cursor, name: str, params: tuple = ()):
+    return execute(cursor, name, params).fetchone()
+
+
+def fetchall(cursor, name: str, params: tuple = ()):
+    return execute(cursor, name, params).fetchall()
+
+
+def stats() -> list[dict]:
+    """Вызовы и время по каждому запросу, самые «дорогие» первыми."""
+    with _stats_lock:
+        rows = [
+            {
+                "name": name,
+                "prepared": QUERIES[name].prepare,
+                "calls": calls,
+                "total_ms": round(_total_ms[name], 1),
+                "avg_ms": round(_total_ms[name] / calls, 3),
+            }
+            for name, calls in _calls.items()
+        ]
+    return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
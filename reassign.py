@@ -0,0 +1,250 @@
+import heapq
+from dataclasses import dataclass, field
+
+# ==========================================================
+# ПЕРЕРАСПРЕДЕЛЕНИЕ ЖИВОТНЫХ МЕЖДУ ЗООТЕХНИКАМИ
+#
+# Нагрузка зоотехника — сумма «весов» его животных. Животное «весит»
+# 1 + его кормления в день за последние RECENT_DAYS дней × FEEDING_WEIGHT:
+# кого кормят чаще, тот и занимает больше времени.
+#
+# Распределение — жадное по куче (min-heap): самое «тяжёлое» животное
+# достаётся наименее загруженному. Если кто-то почти так же свободен
+# (в пределах AFFINITY_SLACK) и уже ведёт этот вид — животное уходит
+# к нему: один вид удобнее держать у одного человека.
+#
+#   plan_fire      — животные увольняемого уходят остальным;
+#   plan_rebalance — с перегруженных снимается лишнее сверх средней
+#                    нагрузки, плюс животные без активного зоотехника.
+#
+# apply() — одним UPDATE ... FROM unnest(...). Если за время между
+# планом и записью у животного сменился зоотехник, строка не обновится
+# и apply() сообщит об этом (план нужно пересчитать).
+# ==========================================================
+
+RECENT_DAYS = 14
+FEEDING_WEIGHT = 0.25
+AFFINITY_SLACK = 1.0
+
+KEEPERS_SQL = """
+    WITH fed AS (
+        SELECT "IDСотрудника", COUNT(*) AS feedings
+        FROM "Кормление"
+        WHERE "ДатаИВремя" >= CURRENT_DATE - %(days)s
+        GROUP BY "IDСотрудника"
+    )
+    SELECT
+        s."IDСотрудника"       AS id,
+        s."ФИО"                AS full_name,
+        COALESCE(f.feedings, 0) AS feedings
+    FROM "Сотрудник" s
+    LEFT JOIN fed f ON f."IDСотрудника" = s."IDСотрудника"
+    WHERE s."Должность" = 'Зоотехник'
+      AND s."Статус" = 'Активен'
+    ORDER BY s."IDСотрудника"
+"""
+
+# Живые животные с текущим зоотехником. Перед записью (lock=True)
+# строки блокируются до конца транзакции (FOR UPDATE OF j), чтобы план
+# применялся к тому, что видели; просмотр плана ничего не блокирует
+ANIMALS_SQL = """
+    WITH fed AS (
+        SELECT "IDЖивотного", COUNT(*) AS feedings
+        FROM "Кормление"
+        WHERE "ДатаИВремя" >= CURRENT_DATE - %(days)s
+        GROUP BY "IDЖивотного"
+    )
+    SELECT
+        j."IDЖивотного"         AS id,
+        j."Кличка"              AS name,
+        j."Вид"                 AS species,
+        j."IDСотрудника"        AS keeper_id,
+        COALESCE(f.feedings, 0) AS feedings
+    FROM "Животное" j
+    LEFT JOIN fed f ON f."IDЖивотного" = j."IDЖивотного"
+    WHERE j."СостояниеЗдоровья" IS DISTINCT FROM 'Умер'
+    ORDER BY j."IDЖивотного"
+"""
+
+APPLY_SQL = """
+    UPDATE "Животное" j
+    SET "IDСотрудника" = m.new_keeper
+    FROM unnest(%s::int[], %s::int[], %s::int[]) AS m(animal_id, old_keeper, new_keeper)
+    WHERE j."IDЖивотного" = m.animal_id
+      AND j."IDСотрудника" IS NOT DISTINCT FROM m.old_keeper
+"""
+
+
+class ReassignError(Exception):
+    """План нельзя составить или применить."""
+
+
+@dataclass
+class Animal:
+    id: int
+    name: str
+    species: str
+    keeper_id: int | None
+    feedings: int
+
+    @property
+    def cost(self) -> float:
+        return 1 + self.feedings / RECENT_DAYS * FEEDING_WEIGHT
+
+
+@dataclass
+class Keeper:
+    id: int
+    full_name: str
+    feedings: int             # проведено за RECENT_DAYS (для просмотра)
+    animals: int = 0
+    species: dict = field(default_factory=dict)   # вид → сколько животных
+
+    load: float = 0.0
+
+    def add(self, animal: Animal):
+        self.animals += 1
+        self.species[animal.species] = self.species.get(animal.species, 0) + 1
+        self.load += animal.cost
+
+    def remove(self, animal: Animal):
+        self.animals -= 1
+        self.species[animal.species] -= 1
+        self.load -= animal.cost
+
+
+@dataclass
+class Move:
+    animal: Animal
+    old_keeper: str | None
+    new_keeper_id: int
+    new_keeper: str
+
+
+@dataclass
+class Plan:
+    moves: list[Move]
+    keepers: list[Keeper]     # нагрузка — уже после перестановок
+
+
+def load_state(cursor, lock: bool = False) -> tuple[dict[int, Keeper], list[Animal]]:
+    """
+    Активные зоотехники с текущей нагрузкой и все живые животные.
+    lock=True — только перед apply(): строки животных блокируются.
+    """
+    cursor.execute(KEEPERS_SQL, {"days": RECENT_DAYS})
+    keepers = {r["id"]: Keeper(r["id"], r["full_name"], r["feedings"]) for r in cursor.fetchall()}
+
+    sql = ANIMALS_SQL + "    FOR UPDATE OF j\n" if lock else ANIMALS_SQL
+    cursor.execute(sql, {"days": RECENT_DAYS})
+    animals = [Animal(**r) for r in cursor.fetchall()]
+
+    for animal in animals:
+        if animal.keeper_id in keepers:
+            keepers[animal.keeper_id].add(animal)
+
+    return keepers, animals
+
+
+def distribute(pool: list[Animal], keepers: list[Keeper], affinity: bool = True) -> list[tuple[Animal, Keeper]]:
+    """Жадно раздаёт животных: тяжёлые первыми, наименее загруженному."""
+    if pool and not keepers:
+        raise ReassignError("Нет активных зоотехников, которым можно передать животных.")
+
+    heap = [(k.load, k.id, k) for k in keepers]
+    heapq.heapify(heap)
+
+    assigned = []
+    for animal in sorted(pool, key=lambda a: (-a.cost, a.species, a.id)):
+        lightest = heap[0][0]
+
+        # Кандидаты в пределах AFFINITY_SLACK от самого свободного
+        candidates = [heapq.heappop(heap)]
+        while affinity and heap and heap[0][0] <= lightest + AFFINITY_SLACK:
+            candidates.append(heapq.heappop(heap))
+
+        chosen = next(
+            (c for c in candidates if c[2].species.get(animal.species)),
+            candidates[0],
+        )
+        for c in candidates:
+            if c is not chosen:
+                heapq.heappush(heap, c)
+
+        keeper = chosen[2]
+        keeper.add(animal)
+        heapq.heappush(heap, (keeper.load, keeper.id, keeper))
+        assigned.append((animal, keeper))
+
+    return assigned
+
+
+def _plan(keepers: dict[int, Keeper], pool: list[Animal], names: dict, affinity: bool) -> Plan:
+    moves = [
+        Move(animal, names.get(animal.keeper_id), keeper.id, keeper.full_name)
+        for animal, keeper in distribute(pool, list(keepers.values()), affinity)
+        if keeper.id != animal.keeper_id
+    ]
+    moves.sort(key=lambda m: (m.new_keeper, m.animal.species, m.animal.name))
+    return Plan(moves, sorted(keepers.values(), key=lambda k: k.full_name))
+
+
+def _keeper_names(cursor) -> dict[int, str]:
+    cursor.execute('SELECT "IDСотрудника" AS id, "ФИО" AS full_name FROM "Сотрудник"')
+    return {r["id"]: r["full_name"] for r in cursor.fetchall()}
+
+
+def plan_fire(cursor, employee_id: int, affinity: bool = True, lock: bool = False) -> Plan:
+    """Животные сотрудника — остальным активным зоотехникам."""
+    keepers, animals = load_state(cursor, lock)
+    keepers.pop(employee_id, None)
+
+    pool = [a for a in animals if a.keeper_id == employee_id]
+    return _plan(keepers, pool, _keeper_names(cursor), affinity)
+
+
+def plan_rebalance(cursor, affinity: bool = True, lock: bool = False) -> Plan:
+    """Выравнивание нагрузки с минимумом перестановок."""
+    keepers, animals = load_state(cursor, lock)
+
+    # Без активного зоотехника (уволен, не назначен) — в общий пул
+    pool = [a for a in animals if a.keeper_id not in keepers]
+
+    if keepers:
+        target = (sum(k.load for k in keepers.values()) + sum(a.cost for a in pool)) / len(keepers)
+
+        by_keeper: dict[int, list[Animal]] = {}
+        for a in animals:
+            if a.keeper_id in keepers:
+                by_keeper.setdefault(a.keeper_id, []).append(a)
+
+        # С перегруженного снимаем тяжёлых, пока он не опустится к среднему;
+        # сначала — виды, которых у него меньше всего (остальные остаются вместе)
+        for keeper_id, own in by_keeper.items():
+            keeper = keepers[keeper_id]
+            if keeper.load <= target + AFFINITY_SLACK:
+                continue
+            for a in sorted(own, key=lambda a: (keeper.species[a.species], -a.cost, a.id)):
+                if keeper.load - a.cost < target:
+                    continue
+                keeper.remove(a)
+                pool.append(a)
+
+    return _plan(keepers, pool, _keeper_names(cursor), affinity)
+
+
+def apply(cursor, plan: Plan) -> int:
+    """Один UPDATE на все перестановки плана. Не коммитит."""
+    if not plan.moves:
+        return 0
+
+    cursor.execute(APPLY_SQL, (
+        [m.animal.id for m in plan.moves],
+        [m.animal.keeper_id for m in plan.moves],
+        [m.new_keeper_id for m in plan.moves],
+    ))
+
+    if cursor.rowcount != len(plan.moves):
+        raise ReassignError("Закрепление животных изменилось во время перераспределения, повторите.")
+
+    return cursor.rowcount
@@ -0,0 +1,406 @@
+import asyncio
+import csv
+import gzip
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import psycopg2.extras
+
+import jobs
+from db import get_connection, get_read_connection
+
+log = logging.getLogger("zoo.reports")
+
+# ==========================================================
+# ФОНОВЫЕ ОТЧЁТЫ
+#
+# Большие выгрузки не строятся внутри запроса:
+#   1. POST /reports ставит задачу в "ОтчётнаяЗадача" (patch_reports.py)
+#      и сразу возвращает её номер;
+#   2. обработчик (run_worker, запускается в lifespan app.py) забирает
+#      задачу через FOR UPDATE SKIP LOCKED — при нескольких процессах
+#      каждую задачу выполняет ровно один — и пишет CSV, сжатый gzip,
+#      в REPORTS_DIR, отмечая прогресс;
+#   3. готовый файл отдаётся FileResponse: он поддерживает Range,
+#      поэтому прерванную загрузку можно докачать.
+#
+# Файлы и записи старше REPORT_RETENTION удаляет задание report_cleanup.
+# ==========================================================
+
+REPORTS_DIR = "reports"
+REPORT_RETENTION = timedelta(days=7)
+
+POLL_SECONDS = 5
+MAX_WORKERS = 1
+BATCH_SIZE = 2000
+
+# Обработчик отмечается в "Пульс" при каждом обновлении прогресса.
+# Задача "в работе" без отметок дольше этого — обработчик, скорее всего,
+# упал; долгий, но живой отчёт обратно в очередь не попадает
+STALE_AFTER = timedelta(hours=1)
+
+
+# ==========================================================
+# ТИПЫ ОТЧЁТОВ
+#   build(params) → (sql FROM/WHERE-часть, параметры)
+# ==========================================================
+
+@dataclass(frozen=True)
+class ReportType:
+    title: str
+    roles: tuple
+    columns: str
+    headers: tuple
+    build: object
+    order_by: str
+
+
+def _expenses_where(params: dict):
+    where, args = [], []
+
+    period = params.get("period", "month")
+    if period == "day":
+        where.append('r."Дата" = CURRENT_DATE')
+    elif period == "month":
+        where.append('DATE_TRUNC(\'month\', r."Дата") = DATE_TRUNC(\'month\', CURRENT_DATE)')
+    elif period == "year":
+        where.append('r."Дата" > CURRENT_DATE - INTERVAL \'1 year\'')
+
+    if params.get("date_from"):
+        where.append('r."Дата" >= %s')
+        args.append(params["date_from"])
+    if params.get("date_to"):
+        where.append('r."Дата" <= %s')
+        args.append(params["date_to"])
+
+    sql = """
+        FROM "Расход" r
+        JOIN "Сотрудник" s ON s."IDСотрудника" = r."IDСотрудника"
+        JOIN "Корм" k      ON k."IDКорма" = r."IDКорма"
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql, args
+
+
+def _faults_where(params: dict):
+    where, args = [], []
+
+    if params.get("place"):
+        where.append('n."Место" = %s')
+        args.append(params["place"])
+    if params.get("date_from"):
+        where.append('n."ДатаФиксации" >= %s')
+        args.append(params["date_from"])
+    if params.get("date_to"):
+        where.append('n."ДатаФиксации" <= %s')
+        args.append(params["date_to"])
+
+    sql = """
+        FROM "Неисправность" n
+        LEFT JOIN "Сотрудник" s ON n."IDСотрудника" = s."IDСотрудника"
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql, args
+
+
+REPORT_TYPES = {
+    "expenses": ReportType(
+        title="Расход корма",
+        roles=("director",),
+        columns="""
+            r."IDРасхода", to_char(r."Дата", 'DD.MM.YYYY'),
+            s."ФИО", k."Наименование", r."Количество"
+        """,
+        headers=("ID", "Дата", "Сотрудник", "Корм", "Количество (кг)"),
+        build=_expenses_where,
+        order_by='r."Дата" DESC, r."IDРасхода" DESC',
+    ),
+    "faults": ReportType(
+        title="Неисправности",
+        roles=("admin", "director"),
+        columns="""
+            n."IDНеисправности", n."Место", n."ОписаниеПроблемы", n."СтатусУстранения",
+            to_char(n."ДатаФиксации", 'DD.MM.YYYY'), to_char(n."ДатаРешения", 'DD.MM.YYYY'),
+            s."ФИО"
+        """,
+        headers=("ID", "Место", "ОписаниеПроблемы", "СтатусУстранения",
+                 "Дата фиксации", "Дата решения", "Сотрудник"),
+        build=_faults_where,
+        order_by='n."IDНеисправности" DESC',
+    ),
+}
+
+
+# ==========================================================
+# ОЧЕРЕДЬ
+# ==========================================================
+
+ENQUEUE_SQL = """
+    INSERT INTO "ОтчётнаяЗадача" ("Тип", "Параметры", "IDСотрудника")
+    VALUES (%s, %s, %s)
+    RETURNING "IDЗадачи"
+"""
+
+CLAIM_SQL = """
+    UPDATE "ОтчётнаяЗадача"
+    SET "Статус" = 'running', "Начато" = LOCALTIMESTAMP, "Пульс" = LOCALTIMESTAMP, "Прогресс" = 0
+    WHERE "IDЗадачи" = (
+        SELECT "IDЗадачи"
+        FROM "ОтчётнаяЗадача"
+        WHERE "Статус" = 'queued'
+        ORDER BY "IDЗадачи"
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING "IDЗадачи" AS id, "Тип" AS type, "Параметры" AS params
+"""
+
+STATUS_SQL = """
+    SELECT
+        "IDЗадачи"      AS id,
+        "Тип"           AS type,
+        "Параметры"     AS params,
+        "IDСотрудника"  AS employee_id,
+        "Статус"        AS status,
+        "Прогресс"      AS progress,
+        "СтрокГотово"   AS rows_done,
+        "СтрокВсего"    AS rows_total,
+        "ИмяФайла"      AS file_name,
+        "РазмерБайт"    AS file_size,
+        "Ошибка"        AS error,
+        "Создано"       AS created,
+        "Завершено"     AS finished
+    FROM "ОтчётнаяЗадача"
+"""
+
+_wakeup: asyncio.Event | None = None
+
+
+def enqueue(report_type: str, params: dict, employee_id: int) -> int:
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(ENQUEUE_SQL, (report_type, psycopg2.extras.Json(params), employee_id))
+    task_id = cursor.fetchone()[0]
+    conn.commit()
+    conn.close()
+
+    # Обработчик этого процесса не ждёт следующего опроса
+    if _wakeup is not None:
+        _wakeup.set()
+
+    return task_id
+
+
+def get_task(task_id: int) -> dict | None:
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute(STATUS_SQL + ' WHERE "IDЗадачи" = %s', (task_id,))
+    task = cursor.fetchone()
+    conn.close()
+    return task
+
+
+def list_tasks(employee_id: int, limit: int = 50) -> list[dict]:
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute(
+        STATUS_SQL + ' WHERE "IDСотрудника" = %s ORDER BY "IDЗадачи" DESC LIMIT %s',
+        (employee_id, limit)
+    )
+    tasks = cursor.fetchall()
+    conn.close()
+    return tasks
+
+
+def file_path(file_name: str) -> str:
+    return os.path.join(REPORTS_DIR, file_name)
+
+
+# ==========================================================
+# ПОСТРОЕНИЕ ФАЙЛА
+# ==========================================================
+
+def _set_progress(conn, task_id: int, done: int, total: int):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE "ОтчётнаяЗадача"
+        SET "СтрокГотово" = %s, "СтрокВсего" = %s, "Прогресс" = %s,
+            "Пульс" = LOCALTIMESTAMP
+        WHERE "IDЗадачи" = %s
+        """,
+        (done, total, min(100, done * 100 // total) if total else 100, task_id)
+    )
+    conn.commit()
+
+
+def build_report(task_id: int, report_type: str, params: dict):
+    rt = REPORT_TYPES[report_type]
+    from_sql, args = rt.build(params)
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    file_name = f"{report_type}_{task_id}.csv.gz"
+    tmp_path = file_path(file_name + ".part")
+
+    # Прогресс пишется отдельным соединением: данные читаются
+    # именованным курсором внутри своей транзакции (с реплики, если есть)
+    progress_conn = get_connection()
+    conn = get_read_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) " + from_sql, args)
+        total = cursor.fetchone()[0]
+        _set_progress(progress_conn, task_id, 0, total)
+
+        rows = conn.cursor(name=f"report_{task_id}")
+        rows.itersize = BATCH_SIZE
+        rows.execute(f"SELECT {rt.columns} {from_sql} ORDER BY {rt.order_by}", args)
+
+        done = 0
+        with gzip.open(tmp_path, "wt", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(rt.headers)
+
+            while True:
+                batch = rows.fetchmany(BATCH_SIZE)
+                if not batch:
+                    break
+                writer.writerows(batch)
+                done += len(batch)
+                _set_progress(progress_conn, task_id, done, total)
+
+        rows.close()
+        conn.rollback()
+
+        os.replace(tmp_path, file_path(file_name))
+
+        cursor = progress_conn.cursor()
+        cursor.execute(
+            """
+            UPDATE "ОтчётнаяЗадача"
+            SET "Статус" = 'done', "Прогресс" = 100, "СтрокГотово" = %s,
+                "ИмяФайла" = %s, "РазмерБайт" = %s, "Завершено" = LOCALTIMESTAMP
+            WHERE "IDЗадачи" = %s
+            """,
+            (done, file_name, os.path.getsize(file_path(file_name)), task_id)
+        )
+        progress_conn.commit()
+
+    except Exception as exc:
+        log.exception("Отчёт #%s не построен", task_id)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        progress_conn.rollback()
+        cursor = progress_conn.cursor()
+        cursor.execute(
+            """
+            UPDATE "ОтчётнаяЗадача"
+            SET "Статус" = 'error', "Ошибка" = %s, "Завершено" = LOCALTIMESTAMP
+            WHERE "IDЗадачи" = %s
+            """,
+            (str(exc), task_id)
+        )
+        progress_conn.commit()
+
+    finally:
+        conn.close()
+        progress_conn.close()
+
+
+def claim_and_build() -> bool:
+    """Берёт одну задачу из очереди и строит отчёт. False — очередь пуста."""
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute(CLAIM_SQL)
+    task = cursor.fetchone()
+    conn.commit()
+    conn.close()
+
+    if not task:
+        return False
+
+    build_report(task["id"], task["type"], task["params"] or {})
+    return True
+
+
+async def _worker_loop():
+    while True:
+        try:
+            while await asyncio.to_thread(claim_and_build):
+                pass
+        except Exception:
+            log.exception("Ошибка обработчика отчётов")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+@asynccontextmanager
+async def run_worker():
+    """Обработчик очереди отчётов на время жизни приложения (см. lifespan в app.py)."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+
+    tasks = [asyncio.create_task(_worker_loop()) for _ in range(MAX_WORKERS)]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        _wakeup = None
+
+
+# ==========================================================
+# ХРАНЕНИЕ
+# ==========================================================
+
+@jobs.job("report_cleanup", "30 3 * * *")
+def cleanup_reports(conn):
+    cursor = conn.cursor()
+
+    # Упавшие на середине задачи (давно нет отметок обработчика) — обратно в очередь
+    cursor.execute(
+        """
+        UPDATE "ОтчётнаяЗадача"
+        SET "Статус" = 'queued'
+        WHERE "Статус" = 'running'
+          AND COALESCE("Пульс", "Начато") < LOCALTIMESTAMP - %s
+        """,
+        (STALE_AFTER,)
+    )
+    requeued = cursor.rowcount
+
+    cursor.execute(
+        """
+        DELETE FROM "ОтчётнаяЗадача"
+        WHERE "Создано" < LOCALTIMESTAMP - %s AND "Статус" <> 'running'
+        """,
+        (REPORT_RETENTION,)
+    )
+    deleted = cursor.rowcount
+
+    # Файлы, на которые больше не ссылается ни одна задача
+    cursor.execute('SELECT "ИмяФайла" FROM "ОтчётнаяЗадача" WHERE "ИмяФайла" IS NOT NULL')
+    keep = {r[0] for r in cursor.fetchall()}
+
+    removed = 0
+    if os.path.isdir(REPORTS_DIR):
+        border = (datetime.now() - STALE_AFTER).timestamp()
+        for name in os.listdir(REPORTS_DIR):
+            path = file_path(name)
+            if name in keep or os.path.getmtime(path) > border:
+                continue
+            os.remove(path)
+            removed += 1
+
+    return f"удалено задач: {deleted}, файлов: {removed}, перезапущено: {requeued}"
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import HTMLResponse, JSONResponse
 import psycopg2.extras
 import io
 import csv
+from datetime import date, timedelta
 from fastapi.responses import StreamingResponse
-from db import get_connection
+import consumption
+import singleflight
+from db import get_read_connection
 from permissions import role_required
 from app import templates
+from streaming import ServerCursor, stream_template
 
 router = APIRouter(
     prefix="/analytics",
@@ -36,13 +40,12 @@ async def analytics_expenses(request: Request):
     else:
         period = "all"  # на всякий случай, если пришло что-то другое
 
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
+    # Сводки — через singleflight: одновременные открытия страницы
+    # с тем же периодом выполняют запрос один раз
     # --------------------------------------------------------
     # 1. Расход по сотрудникам (для таблицы)
     # --------------------------------------------------------
-    cursor.execute(
+    by_employees = await singleflight.fetchall(
         f'''
         SELECT
             s."ФИО"                         AS employee_name,
@@ -55,12 +58,11 @@ async def analytics_expenses(request: Request):
         ORDER BY total_amount DESC
         '''
     )
-    by_employees = cursor.fetchall()
 
     # --------------------------------------------------------
     # 2. Расход по видам корма (для таблицы + Pie chart)
     # --------------------------------------------------------
-    cursor.execute(
+    by_feeds = await singleflight.fetchall(
         f'''
         SELECT
             k."Наименование"                AS feed_name,
@@ -73,16 +75,19 @@ async def analytics_expenses(request: Request):
         ORDER BY total_amount DESC
         '''
     )
-    by_feeds = cursor.fetchall()
 
     # данные для графика
     chart_labels = [row["feed_name"] for row in by_feeds]
     chart_data = [int(row["total_amount"]) for row in by_feeds]
 
+    # Списки для фильтров графика динамики (/analytics/consumption)
+    filters = await singleflight.fetchone(consumption.FILTERS_SQL)
+
     # --------------------------------------------------------
-    # 3. Детальная таблица расходов
+    # 3. Детальная таблица расходов — читается потоком при рендере,
+    #    период "all" не держит в памяти всю историю
     # --------------------------------------------------------
-    cursor.execute(
+    details = ServerCursor(
         f'''
         SELECT
             r."IDРасхода"                   AS id,
@@ -99,14 +104,12 @@ async def analytics_expenses(request: Request):
         ORDER BY r."Дата" DESC, r."IDРасхода" DESC
         '''
     )
-    details = cursor.fetchall()
-
-    conn.close()
 
-    return templates.TemplateResponse(
+    return stream_template(
+        templates,
+        request,
         "analytics_expenses.html",
         {
-            "request": request,
             "user": request.state.user,
             "period": period,
             "by_employees": by_employees,
@@ -114,9 +117,57 @@ async def analytics_expenses(request: Request):
             "details": details,
             "chart_labels": chart_labels,
             "chart_data": chart_data,
+            "filter_feeds": filters["feeds"] or [],
+            "filter_employees": filters["employees"] or [],
+            "filter_species": filters["species"] or [],
         },
+        cursors=(details,),
     )
 
+
+# ============================================================
+# API: ДИНАМИКА РАСХОДА (временной ряд для графика)
+#   ?grain=day|week|month|year&date_from=&date_to=
+#   &feed_id=&employee_id=&species=
+#   Читается из сводок (consumption.py); при слишком большом
+#   диапазоне шаг укрупняется — в ответе фактический grain.
+# ============================================================
+@router.get("/consumption")
+@role_required(["director"], ajax=True)
+async def consumption_series(
+        request: Request,
+        grain: str = Query(default="day"),
+        date_from: str | None = Query(default=None),
+        date_to: str | None = Query(default=None),
+        feed_id: int | None = Query(default=None),
+        employee_id: int | None = Query(default=None),
+        species: str | None = Query(default=None),
+):
+    if grain not in consumption.GRAINS:
+        return JSONResponse({"error": "Некорректный шаг графика."}, status_code=400)
+
+    try:
+        end = date.fromisoformat(date_to) if date_to else date.today()
+        start = date.fromisoformat(date_from) if date_from else end - timedelta(days=consumption.DEFAULT_DAYS)
+    except ValueError:
+        return JSONResponse({"error": "Некорректная дата."}, status_code=400)
+
+    if start > end:
+        return JSONResponse({"error": "Начало периода позже конца."}, status_code=400)
+
+    effective = consumption.choose_grain(start, end, grain)
+    sql, params = consumption.series_query(start, end, effective, feed_id, employee_id, species or None)
+    rows = await singleflight.fetchall(sql, params)
+
+    return JSONResponse({
+        "grain": effective,
+        "downsampled": effective != grain,
+        "date_from": start.isoformat(),
+        "date_to": end.isoformat(),
+        "labels": [consumption.label(r["bucket"], effective) for r in rows],
+        "data": [float(r["total"]) for r in rows],
+    })
+
 @router.get("/export/csv")
 @role_required(["director"])
 async def export_expenses_csv(
@@ -136,7 +187,7 @@ async def export_expenses_csv(
     else:
         period = "all"
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
     # --- запрос детальной таблицы (как в интерфейсе) ---
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Request, Query
 from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from datetime import date
 import psycopg2.extras
 import io
 import csv
 
-from db import get_connection
+import fault_stats
+import singleflight
+from db import get_read_connection
 from permissions import role_required
 from app import templates
 
@@ -51,9 +54,6 @@ async def faults_chart_data(
     if place not in ("Вольер", "Участок"):
         return JSONResponse({"error": "Некорректное значение поля 'place'."}, status_code=400)
 
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
     sql = """
         SELECT
             n."СтатусУстранения"      AS status,
@@ -73,9 +73,8 @@ async def faults_chart_data(
 
     sql += ' GROUP BY n."СтатусУстранения" ORDER BY n."СтатусУстранения"'
 
-    cursor.execute(sql, params)
-    rows = cursor.fetchall()
-    conn.close()
+    # Одинаковые одновременные запросы (несколько вкладок) — одно выполнение
+    rows = await singleflight.fetchall(sql, params)
 
     # Приводим к фиксированному набору статусов
     statuses_order = ["Зафиксировано", "В процессе", "Устранено"]
@@ -87,6 +86,32 @@ async def faults_chart_data(
     return JSONResponse({"labels": labels, "data": data})
 
 
+# ============================================================
+# API: СРОКИ УСТРАНЕНИЯ (fault_stats.py)
+#   Перцентили срока, возраст открытых, поступление/устранение
+#   по месяцам — для обоих мест сразу
+# ============================================================
+@router.get("/faults/resolution")
+@role_required(["admin", "director"], ajax=True)
+async def faults_resolution_data(
+        request: Request,
+        date_from: str | None = Query(default=None),
+        date_to: str | None = Query(default=None),
+):
+    default_from, default_to = fault_stats.default_period()
+    try:
+        start = date.fromisoformat(date_from) if date_from else default_from
+        end = date.fromisoformat(date_to) if date_to else default_to
+    except ValueError:
+        return JSONResponse({"error": "Некорректная дата."}, status_code=400)
+
+    if start > end:
+        return JSONResponse({"error": "Начало периода позже конца."}, status_code=400)
+
+    stats = fault_stats.load_stats(start, end)
+    return JSONResponse(dict(stats, date_from=start.isoformat(), date_to=end.isoformat()))
+
+
 # ============================================================
 # API: ТАБЛИЦА НЕИСПРАВНОСТЕЙ
 # ============================================================
@@ -105,9 +130,6 @@ async def faults_table_data(
     if place not in ("Вольер", "Участок"):
         return JSONResponse({"error": "Некорректное значение поля 'place'."}, status_code=400)
 
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
     sql = """
         SELECT
             n."IDНеисправности" AS id,
@@ -134,25 +156,113 @@ async def faults_table_data(
 
     sql += ' ORDER BY n."IDНеисправности" DESC'
 
-    cursor.execute(sql, params)
-    rows = cursor.fetchall()
-    conn.close()
+    rows = await singleflight.fetchall(sql, params)
 
-    # Приводим данные к удобному JSON
-    data = [
-        {
-            "id": r["id"],
-            "place": r["place"],
-            "description": r["description"],
-            "status": r["status"],
-            "created_at": r["created_at"].strftime("%d.%m.%Y"),
-            "resolved_at": r["resolved_at"].strftime("%d.%m.%Y") if r["resolved_at"] else "—",
-            "employee": r["employee_name"] or "—",
-        }
-        for r in rows
+    return JSONResponse({"rows": [_row_json(r) for r in rows]})
+
+
+def _row_json(r) -> dict:
+    """Строка таблицы неисправностей в удобном для JS виде."""
+    return {
+        "id": r["id"],
+        "place": r["place"],
+        "description": r["description"],
+        "status": r["status"],
+        "created_at": r["created_at"].strftime("%d.%m.%Y"),
+        "resolved_at": r["resolved_at"].strftime("%d.%m.%Y") if r["resolved_at"] else "—",
+        "employee": r["employee_name"] or "—",
+    }
+
+
+# ============================================================
+# API: ГИСТОГРАММА + СТРАНИЦА ТАБЛИЦЫ ОДНИМ ЗАПРОСОМ
+#   Один проход по "Неисправность": счётчики по статусам — оконные
+#   COUNT(*) FILTER (...) OVER () по всей выборке, строки — только
+#   текущая страница. Строка rn = 1 возвращается всегда, чтобы
+#   счётчики пришли и для страницы за пределами выборки.
+# ============================================================
+STATUSES_ORDER = ["Зафиксировано", "В процессе", "Устранено"]
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+FAULTS_DATA_SQL = """
+    WITH scan AS (
+        SELECT
+            n."IDНеисправности"  AS id,
+            n."Место"            AS place,
+            n."ОписаниеПроблемы" AS description,
+            n."СтатусУстранения" AS status,
+            n."ДатаФиксации"     AS created_at,
+            n."ДатаРешения"      AS resolved_at,
+            n."IDСотрудника"     AS employee_id,
+            COUNT(*) FILTER (WHERE n."СтатусУстранения" = 'Зафиксировано') OVER () AS cnt_registered,
+            COUNT(*) FILTER (WHERE n."СтатусУстранения" = 'В процессе')    OVER () AS cnt_in_progress,
+            COUNT(*) FILTER (WHERE n."СтатусУстранения" = 'Устранено')     OVER () AS cnt_resolved,
+            COUNT(*) OVER ()                                                        AS total,
+            ROW_NUMBER() OVER (ORDER BY n."IDНеисправности" DESC)                   AS rn
+        FROM "Неисправность" n
+        WHERE n."Место" = %(place)s
+          AND (%(date_from)s::date IS NULL OR n."ДатаФиксации" >= %(date_from)s)
+          AND (%(date_to)s::date IS NULL OR n."ДатаФиксации" <= %(date_to)s)
+    )
+    SELECT sc.*, s."ФИО" AS employee_name
+    FROM scan sc
+    LEFT JOIN "Сотрудник" s ON s."IDСотрудника" = sc.employee_id
+    WHERE sc.rn > %(offset)s AND sc.rn <= %(offset)s + %(limit)s
+       OR sc.rn = 1
+    ORDER BY sc.rn
+"""
+
+
+@router.get("/faults/data")
+@role_required(["admin", "director"], ajax=True)
+async def faults_data(
+        request: Request,
+        place: str = Query(..., description="Вольер или Участок"),
+        date_from: str | None = Query(default=None),
+        date_to: str | None = Query(default=None),
+        page: int = Query(default=1, ge=1),
+        page_size: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Счётчики по статусам (для гистограммы) и страница детальной таблицы
+    для выбранного места и периода.
+    """
+
+    if place not in ("Вольер", "Участок"):
+        return JSONResponse({"error": "Некорректное значение поля 'place'."}, status_code=400)
+
+    try:
+        start = date.fromisoformat(date_from) if date_from else None
+        end = date.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        return JSONResponse({"error": "Некорректная дата."}, status_code=400)
+
+    offset = (page - 1) * page_size
+    rows = await singleflight.fetchall(FAULTS_DATA_SQL, {
+        "place": place,
+        "date_from": start,
+        "date_to": end,
+        "offset": offset,
+        "limit": page_size,
+    })
+
+    first = rows[0] if rows else {}
+    counts = [
+        first.get("cnt_registered", 0),
+        first.get("cnt_in_progress", 0),
+        first.get("cnt_resolved", 0),
     ]
+    total = first.get("total", 0)
 
-    return JSONResponse({"rows": data})
+    return JSONResponse({
+        "chart": {"labels": STATUSES_ORDER, "data": counts},
+        "rows": [_row_json(r) for r in rows if r["rn"] > offset],
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "pages": max(1, -(-total // page_size)),
+    })
 
 
 # ============================================================
@@ -173,7 +283,7 @@ async def faults_export_csv(
     if place not in ("Вольер", "Участок"):
         return HTMLResponse("Некорректное значение поля 'place'.", status_code=400)
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
     # SQL-запрос с правильными именами колонок
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Request, Form, Query
+from fastapi import APIRouter, Request, Form, Query, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 
 import psycopg2.extras
 from psycopg2 import errors
 
-from db import get_connection
+import imports
+import queries
+from db import get_connection, get_read_connection
+from exports import csv_export_response
 from permissions import role_required
+from table_versions import bump
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -14,39 +18,25 @@ templates = Jinja2Templates(directory="templates")
 
 
 # ======================================================
-# 📌 СПИСОК ЖИВОТНЫХ — менеджер + зоотехник
-#   Фильтр по виду + фильтр по полу
+# 📌 ВЫБОРКА ЖИВОТНЫХ ПО ФИЛЬТРАМ (общая для страницы, фрагмента и экспорта)
+#   Читаем готовую сводку "СводкаЖивотного" (patch_animal_summary.py):
+#   текст рациона, ФИО и последний осмотр поддерживают триггеры
 # ======================================================
-@router.get("/animals", response_class=HTMLResponse)
-@role_required(["manager", "zootechnician"])
-async def animals_list(
-    request: Request,
-    species: str | None = Query(default=None),
-    gender: str | None = Query(default=None)   # << новый параметр
-):
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
+def animals_query(species: str | None, gender: str | None) -> tuple[str, list]:
     base_sql = """
         SELECT
-            j."IDЖивотного"       AS id,
-            j."Вид"               AS species,
-            j."Кличка"            AS name,
-            j."Возраст"           AS age,
-            j."Пол"               AS gender,
-            j."ДатаПоступления"   AS admission_date,
-            j."СостояниеЗдоровья" AS health_status,
-            s."ФИО"               AS employee_name,
-            r."IDРациона"         AS ration_id,
-            r."ВидЖивотного"      AS ration_species,
-            r."Количество"        AS ration_amount,
-            r."ЧастотаКормления"  AS ration_frequency,
-            k."Наименование"      AS feed_name,
-            k."ЕдиницаИзмерения"  AS feed_unit
-        FROM "Животное" j
-        LEFT JOIN "Сотрудник" s ON j."IDСотрудника" = s."IDСотрудника"
-        LEFT JOIN "Рацион"   r ON j."IDРациона"     = r."IDРациона"
-        LEFT JOIN "Корм"     k ON r."IDКорма"       = k."IDКорма"
+            sv."IDЖивотного"           AS id,
+            sv."Вид"                   AS species,
+            sv."Кличка"                AS name,
+            sv."Возраст"               AS age,
+            sv."Пол"                   AS gender,
+            sv."ДатаПоступления"       AS admission_date,
+            sv."СостояниеЗдоровья"     AS health_status,
+            sv."ФИОСотрудника"         AS employee_name,
+            sv."ТекстРациона"          AS ration,
+            sv."ПоследнийДиагноз"      AS last_diagnosis,
+            sv."ДатаПоследнегоОсмотра" AS last_checkup
+        FROM "СводкаЖивотного" sv
     """
 
     conditions = []
@@ -54,50 +44,46 @@ async def animals_list(
 
     # Фильтр по виду
     if species:
-        conditions.append('j."Вид" ILIKE %s')
+        conditions.append('sv."Вид" ILIKE %s')
         params.append(f"%{species}%")
 
     # Фильтр по полу (м / ж)
     if gender in ["м", "ж"]:
-        conditions.append('j."Пол" = %s')
+        conditions.append('sv."Пол" = %s')
         params.append(gender)
 
     # Применяем WHERE, если есть условия
     if conditions:
         base_sql += " WHERE " + " AND ".join(conditions)
 
-    base_sql += ' ORDER BY j."IDЖивотного" ASC'
+    base_sql += ' ORDER BY sv."IDЖивотного" ASC'
+
+    return base_sql, params
+
+
+def fetch_animals(species: str | None, gender: str | None) -> list[dict]:
+    conn = get_read_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-    cursor.execute(base_sql, params)
-    rows = cursor.fetchall()
+    cursor.execute(*animals_query(species, gender))
+    animals = cursor.fetchall()
     conn.close()
 
-    animals = []
-    for row in rows:
-        ration_text = "-"
-        if row["ration_id"] is not None:
-            parts = []
-            if row["feed_name"]:
-                parts.append(row["feed_name"])
-            if row["ration_amount"] is not None and row["feed_unit"]:
-                parts.append(f'{row["ration_amount"]} {row["feed_unit"]}')
-            if row["ration_frequency"]:
-                parts.append(row["ration_frequency"])
-            ration_text = ", ".join(parts) if parts else f'Рацион #{row["ration_id"]}'
-
-        animals.append(
-            {
-                "id": row["id"],
-                "species": row["species"],
-                "name": row["name"],
-                "age": row["age"],
-                "gender": row["gender"],
-                "admission_date": row["admission_date"],
-                "health_status": row["health_status"],
-                "employee_name": row["employee_name"],
-                "ration": ration_text,
-            }
-        )
+    return animals
+
+
+# ======================================================
+# 📌 СПИСОК ЖИВОТНЫХ — менеджер + зоотехник
+#   Фильтр по виду + фильтр по полу
+# ======================================================
+@router.get("/animals", response_class=HTMLResponse)
+@role_required(["manager", "zootechnician"])
+async def animals_list(
+    request: Request,
+    species: str | None = Query(default=None),
+    gender: str | None = Query(default=None)   # << новый параметр
+):
+    animals = fetch_animals(species, gender)
 
     return templates.TemplateResponse(
         "animals.html",
@@ -110,6 +96,109 @@ async def animals_list(
     )
 
 
+# ======================================================
+# 📌 ФРАГМЕНТ ТАБЛИЦЫ — только строки для текущего фильтра
+# ======================================================
+@router.get("/animals/rows", response_class=HTMLResponse)
+@role_required(["manager", "zootechnician"])
+async def animals_rows(
+    request: Request,
+    species: str | None = Query(default=None),
+    gender: str | None = Query(default=None)
+):
+    animals = fetch_animals(species, gender)
+
+    return templates.TemplateResponse(
+        "animals_rows.html",
+        {
+            "request": request,
+            "animals": animals,
+        },
+    )
+
+
+# ======================================================
+# 📌 ЭКСПОРТ CSV — с теми же фильтрами, что и список
+# ======================================================
+ANIMALS_EXPORT_COLUMNS = [
+    ("id", "ID"),
+    ("species", "Вид"),
+    ("name", "Кличка"),
+    ("age", "Возраст"),
+    ("gender", "Пол"),
+    ("admission_date", "Дата поступления"),
+    ("health_status", "Состояние здоровья"),
+    ("employee_name", "Зоотехник"),
+    ("ration", "Рацион"),
+    ("last_diagnosis", "Последний диагноз"),
+    ("last_checkup", "Последний осмотр"),
+]
+
+
+@router.get("/animals/export/csv")
+@role_required(["manager", "zootechnician"])
+async def animals_export_csv(
+    request: Request,
+    species: str | None = Query(default=None),
+    gender: str | None = Query(default=None)
+):
+    sql, params = animals_query(species, gender)
+    return await csv_export_response(sql, params, ANIMALS_EXPORT_COLUMNS, "t.id", "animals.csv")
+
+
+# ======================================================
+# 📌 ЗАГРУЗКА ИЗ CSV — только менеджер
+#   Все строки проверяются разом, добавляются одной транзакцией
+#   вместе с первичными медкартами (imports.py)
+# ======================================================
+def animals_import_page(request: Request, inserted: int = 0, errors: list | None = None):
+    return templates.TemplateResponse(
+        "import_csv.html",
+        {
+            "request": request,
+            "title": "Загрузка животных из CSV",
+            "columns": imports.ANIMAL_COLUMNS,
+            "hint": "Зоотехник — ФИО активного сотрудника, пол — «м» или «ж»; "
+                    "для вида должен быть заведён рацион.",
+            "action": "/animals/import",
+            "back_url": "/animals",
+            "inserted": inserted,
+            "errors": errors,
+        },
+    )
+
+
+@router.get("/animals/import", response_class=HTMLResponse)
+@role_required(["manager"])
+async def animals_import_form(request: Request):
+    return animals_import_page(request)
+
+
+@router.post("/animals/import", response_class=HTMLResponse)
+@role_required(["manager"])
+async def animals_import(request: Request, file: UploadFile = File(...)):
+    data = await file.read()
+
+    conn = get_connection()
+    try:
+        result = imports.import_animals(conn, data)
+        if result.ok:
+            conn.commit()
+    except psycopg2.Error as e:
+        # Ограничения и триггеры базы, которые проверки не покрыли
+        conn.rollback()
+        msg = str(e).split("CONTEXT:")[0].strip()
+        result = imports.ImportResult(errors=[msg])
+    finally:
+        conn.close()
+
+    if not result.ok:
+        return animals_import_page(request, errors=result.errors)
+
+    bump("Животное", "Медкарта")
+    return animals_import_page(request, inserted=result.inserted)
+
+
 # ======================================================
 # 📌 ФОРМА ДОБАВЛЕНИЯ — только менеджер
 #   Менеджер выбирает:
@@ -125,35 +214,9 @@ async def add_animal_form(request: Request):
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-    # Только зоотехники
-    cursor.execute(
-        """
-        SELECT
-            "IDСотрудника" AS id,
-            "ФИО"          AS full_name
-        FROM "Сотрудник"
-        WHERE "Должность" = 'Зоотехник'
-        ORDER BY "ФИО"
-        """
-    )
-    employees = cursor.fetchall()
-
-    # Все рационы
-    cursor.execute(
-        """
-        SELECT
-            r."IDРациона"        AS id,
-            r."ВидЖивотного"     AS species,
-            r."Количество"       AS amount,
-            r."ЧастотаКормления" AS frequency,
-            k."Наименование"     AS feed_name,
-            k."ЕдиницаИзмерения" AS feed_unit
-        FROM "Рацион" r
-        JOIN "Корм" k ON r."IDКорма" = k."IDКорма"
-        ORDER BY r."ВидЖивотного", r."IDРациона"
-        """
-    )
-    rations = cursor.fetchall()
+    # Только зоотехники и все рационы
+    employees = queries.fetchall(cursor, "zootechnicians")
+    rations = queries.fetchall(cursor, "rations_with_feeds")
 
     conn.close()
 
@@ -225,27 +288,8 @@ async def add_animal(
         raw = str(e)
         msg = raw.split("CONTEXT:")[0].split("ERROR:", 1)[-1].strip()
 
-        cursor.execute(
-            """
-            SELECT "IDСотрудника" AS id, "ФИО" AS full_name
-            FROM "Сотрудник"
-            WHERE "Должность" = 'Зоотехник'
-            ORDER BY "ФИО"
-            """
-        )
-        employees = cursor.fetchall()
-
-        cursor.execute(
-            """
-            SELECT r."IDРациона" AS id, r."ВидЖивотного" AS species,
-                   r."Количество" AS amount, r."ЧастотаКормления" AS frequency,
-                   k."Наименование" AS feed_name, k."ЕдиницаИзмерения" AS feed_unit
-            FROM "Рацион" r
-            JOIN "Корм" k ON r."IDКорма" = k."IDКорма"
-            ORDER BY r."ВидЖивотного"
-            """
-        )
-        rations = cursor.fetchall()
+        employees = queries.fetchall(cursor, "zootechnicians")
+        rations = queries.fetchall(cursor, "rations_with_feeds")
 
         conn.close()
         return templates.TemplateResponse(
@@ -262,27 +306,8 @@ async def add_animal(
         conn.rollback()
         print("Ошибка:", e)
 
-        cursor.execute(
-            """
-            SELECT "IDСотрудника" AS id, "ФИО" AS full_name
-            FROM "Сотрудник"
-            WHERE "Должность" = 'Зоотехник'
-            ORDER BY "ФИО"
-            """
-        )
-        employees = cursor.fetchall()
-
-        cursor.execute(
-            """
-            SELECT r."IDРациона" AS id, r."ВидЖивотного" AS species,
-                   r."Количество" AS amount, r."ЧастотаКормления" AS frequency,
-                   k."Наименование" AS feed_name, k."ЕдиницаИзмерения" AS feed_unit
-            FROM "Рацион" r
-            JOIN "Корм" k ON r."IDКорма" = k."IDКорма"
-            ORDER BY r."ВидЖивотного"
-            """
-        )
-        rations = cursor.fetchall()
+        employees = queries.fetchall(cursor, "zootechnicians")
+        rations = queries.fetchall(cursor, "rations_with_feeds")
 
         conn.close()
         return templates.TemplateResponse(
@@ -296,6 +321,7 @@ async def add_animal(
         )
 
     conn.close()
+    bump("Животное", "Медкарта")
     return RedirectResponse(url="/animals", status_code=303)
 
 
@@ -351,12 +377,119 @@ async def update_health_ajax(request: Request, animal_id: int, status: str = For
         )
 
     conn.close()
+    bump("Животное")
     return JSONResponse(
         status_code=200,
         content={"success": True, "new_status": status}
     )
 
 
+# ======================================================
+# 📌 МАССОВОЕ ИЗМЕНЕНИЕ СОСТОЯНИЯ ЗДОРОВЬЯ — менеджер
+#   Все выбранные животные — одним UPDATE. Проверка переходов —
+#   в том же запросе: умершего менять нельзя, несуществующий ID
+#   и «уже в этом состоянии» возвращаются как отдельный итог.
+# ======================================================
+
+HEALTH_STATUSES = ["Здоров", "Лечится", "Выздоровел", "Умер"]
+
+HEALTH_OUTCOMES = {
+    "updated": "Состояние изменено",
+    "unchanged": "Уже в этом состоянии",
+    "dead": "Нельзя изменять состояние умершего животного",
+    "not_found": "Животное не найдено",
+    "conflict": "Изменено другим пользователем, повторите",
+}
+
+BULK_HEALTH_SQL = """
+    WITH req AS (
+        SELECT DISTINCT unnest(%(ids)s::int[]) AS id
+    ),
+    cur AS (
+        SELECT "IDЖивотного" AS id, "СостояниеЗдоровья" AS status
+        FROM "Животное"
+        WHERE "IDЖивотного" = ANY(%(ids)s)
+        FOR UPDATE
+    ),
+    checked AS (
+        SELECT
+            r.id,
+            CASE
+                WHEN c.id IS NULL                        THEN 'not_found'
+                WHEN c.status = 'Умер'                   THEN 'dead'
+                WHEN c.status IS NOT DISTINCT FROM %(status)s THEN 'unchanged'
+                ELSE 'ok'
+            END AS outcome
+        FROM req r
+        LEFT JOIN cur c ON c.id = r.id
+    ),
+    upd AS (
+        UPDATE "Животное" j
+        SET "СостояниеЗдоровья" = %(status)s
+        FROM checked ch
+        WHERE j."IDЖивотного" = ch.id
+          AND ch.outcome = 'ok'
+          AND j."СостояниеЗдоровья" IS DISTINCT FROM 'Умер'
+        RETURNING j."IDЖивотного" AS id
+    )
+    SELECT
+        ch.id,
+        CASE
+            WHEN u.id IS NOT NULL   THEN 'updated'
+            WHEN ch.outcome = 'ok'  THEN 'conflict'
+            ELSE ch.outcome
+        END AS outcome
+    FROM checked ch
+    LEFT JOIN upd u ON u.id = ch.id
+    ORDER BY ch.id
+"""
+
+
+@router.post("/animals/health/bulk")
+@role_required(["manager"], ajax=True)
+async def update_health_bulk(
+    request: Request,
+    ids: list[int] = Form(...),
+    status: str = Form(...),
+):
+    if status not in HEALTH_STATUSES:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "Некорректное состояние здоровья"}
+        )
+
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    try:
+        cursor.execute(BULK_HEALTH_SQL, {"ids": ids, "status": status})
+        rows = cursor.fetchall()
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        conn.close()
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": str(e)}
+        )
+
+    conn.close()
+
+    updated = sum(1 for r in rows if r["outcome"] == "updated")
+    if updated:
+        bump("Животное")
+
+    return JSONResponse({
+        "success": True,
+        "status": status,
+        "updated": updated,
+        "results": [
+            {"id": r["id"], "outcome": r["outcome"], "message": HEALTH_OUTCOMES[r["outcome"]]}
+            for r in rows
+        ],
+    })
+
+
 # ======================================================
 # 📌 ОТМЕТИТЬ «УМЕР» — только зоотехник
 # ======================================================
@@ -377,6 +510,7 @@ async def mark_animal_dead(request: Request, animal_id: int):
 
     conn.commit()
     conn.close()
+    bump("Животное")
 
     return RedirectResponse(url="/animals", status_code=303)
 
@@ -0,0 +1,187 @@
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import HTMLResponse, JSONResponse
+import psycopg2.extras
+
+from db import get_read_connection
+from permissions import role_required
+from app import templates
+
+router = APIRouter()
+
+# Сколько записей каждого раздела отдаём за раз (первая загрузка и «Ещё»)
+DOSSIER_PAGE_SIZE = 10
+
+
+# ======================================================
+# Разделы досье с постраничной подгрузкой.
+# Берём на одну запись больше страницы — по ней узнаём has_more.
+# ======================================================
+SECTION_SQL = {
+    "medical": """
+        SELECT
+            m."IDМедкарты"                         AS id,
+            to_char(m."ДатаОсмотра", 'DD.MM.YYYY') AS date,
+            s."ФИО"                                AS employee,
+            m."Диагноз"                            AS diagnosis,
+            m."НазначенноеЛечение"                 AS treatment,
+            m."Прививки"                           AS vaccines,
+            m."РезультатПроцедуры"                 AS result
+        FROM "Медкарта" m
+        LEFT JOIN "Сотрудник" s ON s."IDСотрудника" = m."IDСотрудника"
+        WHERE m."IDЖивотного" = %(animal_id)s
+        ORDER BY m."ДатаОсмотра" DESC, m."IDМедкарты" DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    """,
+    "feedings": """
+        SELECT
+            f."IDКормления"                                 AS id,
+            to_char(f."ДатаИВремя", 'DD.MM.YYYY HH24:MI')   AS feeding_time,
+            s."ФИО"                                         AS employee
+        FROM "Кормление" f
+        LEFT JOIN "Сотрудник" s ON s."IDСотрудника" = f."IDСотрудника"
+        WHERE f."IDЖивотного" = %(animal_id)s
+        ORDER BY f."ДатаИВремя" DESC, f."IDКормления" DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    """,
+}
+
+
+# ======================================================
+# Всё досье одним запросом: животное, рацион, первые страницы
+# медкарты и кормлений, расход корма — собираются в один JSON.
+# Рацион определяем по виду, как при кормлении.
+# ======================================================
+DOSSIER_SQL = f"""
+    WITH a AS (
+        SELECT
+            j."IDЖивотного"       AS id,
+            j."Вид"               AS species,
+            j."Кличка"            AS name,
+            j."Возраст"           AS age,
+            j."Пол"               AS gender,
+            to_char(j."ДатаПоступления", 'DD.MM.YYYY') AS admission_date,
+            j."СостояниеЗдоровья" AS health_status,
+            j."IDРациона"         AS own_ration_id,
+            s."ФИО"               AS employee_name
+        FROM "Животное" j
+        LEFT JOIN "Сотрудник" s ON s."IDСотрудника" = j."IDСотрудника"
+        WHERE j."IDЖивотного" = %(animal_id)s
+    ),
+    r AS (
+        SELECT
+            r0."IDРациона"        AS id,
+            r0."Количество"       AS amount,
+            r0."ЧастотаКормления" AS frequency,
+            k."Наименование"      AS feed_name,
+            k."ЕдиницаИзмерения"  AS feed_unit
+        FROM a
+        JOIN "Рацион" r0
+          ON r0."ВидЖивотного" = a.species OR r0."IDРациона" = a.own_ration_id
+        LEFT JOIN "Корм" k ON k."IDКорма" = r0."IDКорма"
+        ORDER BY (r0."ВидЖивотного" = a.species) DESC, r0."IDРациона"
+        LIMIT 1
+    ),
+    fc AS (
+        SELECT
+            COUNT(*)                                                   AS feedings_total,
+            COUNT(*) FILTER (WHERE f."ДатаИВремя" >= NOW() - INTERVAL '30 days') AS feedings_30d
+        FROM "Кормление" f
+        WHERE f."IDЖивотного" = %(animal_id)s
+    )
+    SELECT json_build_object(
+        'animal', (SELECT row_to_json(a) FROM a),
+        'ration', (SELECT row_to_json(r) FROM r),
+        'medical', COALESCE(
+            (SELECT json_agg(x) FROM ({SECTION_SQL["medical"]}) x), '[]'::json),
+        'feedings', COALESCE(
+            (SELECT json_agg(x) FROM ({SECTION_SQL["feedings"]}) x), '[]'::json),
+        'consumption', (
+            SELECT json_build_object(
+                'feed_name',      r.feed_name,
+                'feed_unit',      r.feed_unit,
+                'per_feeding',    r.amount,
+                'feedings_30d',   fc.feedings_30d,
+                'feedings_total', fc.feedings_total,
+                'consumed_30d',   fc.feedings_30d * r.amount,
+                'consumed_total', fc.feedings_total * r.amount
+            )
+            FROM fc LEFT JOIN r ON TRUE
+        )
+    ) AS dossier
+    FROM a
+"""
+
+
+def _cut_page(rows: list) -> tuple[list, bool]:
+    """Отрезает «лишнюю» запись, по которой определяется наличие продолжения."""
+    return rows[:DOSSIER_PAGE_SIZE], len(rows) > DOSSIER_PAGE_SIZE
+
+
+# ======================================================
+# 📌 ДОСЬЕ ЖИВОТНОГО — менеджер + зоотехник
+# ======================================================
+@router.get("/animals/{animal_id}/dossier", response_class=HTMLResponse)
+@role_required(["manager", "zootechnician"])
+async def animal_dossier(request: Request, animal_id: int):
+
+    conn = get_read_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    cursor.execute(
+        DOSSIER_SQL,
+        {"animal_id": animal_id, "limit": DOSSIER_PAGE_SIZE + 1, "offset": 0},
+    )
+    row = cursor.fetchone()
+    conn.close()
+
+    if not row:
+        return HTMLResponse("Животное не найдено", status_code=404)
+
+    dossier = row["dossier"]
+    medical, medical_more = _cut_page(dossier["medical"])
+    feedings, feedings_more = _cut_page(dossier["feedings"])
+
+    return templates.TemplateResponse(
+        "animal_dossier.html",
+        {
+            "request": request,
+            "animal": dossier["animal"],
+            "ration": dossier["ration"],
+            "consumption": dossier["consumption"],
+            "medical": medical,
+            "medical_more": medical_more,
+            "feedings": feedings,
+            "feedings_more": feedings_more,
+            "page_size": DOSSIER_PAGE_SIZE,
+        },
+    )
+
+
+# ======================================================
+# 📌 AJAX: следующая порция раздела досье («Ещё»)
+# ======================================================
+@router.get("/animals/{animal_id}/dossier/{section}")
+@role_required(["manager", "zootechnician"], ajax=True)
+async def animal_dossier_section(
+    request: Request,
+    animal_id: int,
+    section: str,
+    offset: int = Query(default=0, ge=0),
+):
+    if section not in SECTION_SQL:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "error": "Неизвестный раздел досье"}
+        )
+
+    conn = get_read_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    cursor.execute(
+        SECTION_SQL[section],
+        {"animal_id": animal_id, "limit": DOSSIER_PAGE_SIZE + 1, "offset": offset},
+    )
+    rows, has_more = _cut_page(cursor.fetchall())
+    conn.close()
+
+    return JSONResponse({"success": True, "rows": rows, "has_more": has_more})
@@ -3,27 +3,21 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse
 import psycopg2.extras
 
+import reassign
 from db import get_connection
+from exports import csv_export_response
 from permissions import role_required
+from table_versions import etag_cached, bump
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 
 # ============================================================
-# 👥 СПИСОК СОТРУДНИКОВ — Директор (+ при желании Админ)
+# 👥 ВЫБОРКА СОТРУДНИКОВ (общая для списка и экспорта)
 # ============================================================
 
-@router.get("/employees", response_class=HTMLResponse)
-@role_required(["director", "admin"])
-async def employees_list(
-    request: Request,
-    search: str | None = None,
-    role: str | None = None
-):
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
+def employees_query(search: str | None, role: str | None) -> tuple[str, list]:
     sql = """
         SELECT 
             "IDСотрудника"   AS id,
@@ -48,7 +42,25 @@ async def employees_list(
 
     sql += ' ORDER BY "IDСотрудника"'
 
-    cursor.execute(sql, params)
+    return sql, params
+
+
+# ============================================================
+# 👥 СПИСОК СОТРУДНИКОВ — Директор (+ при желании Админ)
+# ============================================================
+
+@router.get("/employees", response_class=HTMLResponse)
+@role_required(["director", "admin"])
+@etag_cached("Сотрудник")
+async def employees_list(
+    request: Request,
+    search: str | None = None,
+    role: str | None = None
+):
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    cursor.execute(*employees_query(search, role))
     employees = cursor.fetchall()
     conn.close()
 
@@ -63,6 +75,31 @@ async def employees_list(
     )
 
 
+# ============================================================
+# 📤 ЭКСПОРТ CSV — те же фильтры, без паролей
+# ============================================================
+
+EMPLOYEES_EXPORT_COLUMNS = [
+    ("id", "ID"),
+    ("full_name", "ФИО"),
+    ("role", "Должность"),
+    ("phone", "Контактные данные"),
+    ("schedule", "График работы"),
+    ("status", "Статус"),
+]
+
+
+@router.get("/employees/export/csv")
+@role_required(["director", "admin"])
+async def employees_export_csv(
+    request: Request,
+    search: str | None = None,
+    role: str | None = None
+):
+    sql, params = employees_query(search, role)
+    return await csv_export_response(sql, params, EMPLOYEES_EXPORT_COLUMNS, "t.id", "employees.csv")
+
+
 # ============================================================
 # ➕ ФОРМА ДОБАВЛЕНИЯ СОТРУДНИКА
 # ============================================================
@@ -136,6 +173,7 @@ async def add_employee(
         )
 
     conn.close()
+    bump("Сотрудник")
     return RedirectResponse(url="/employees", status_code=303)
 
 # ============================================================
@@ -239,6 +277,7 @@ async def edit_employee(
         )
 
     conn.close()
+    bump("Сотрудник")
     return RedirectResponse(url="/employees", status_code=303)
 
 
@@ -263,18 +302,28 @@ async def fire_confirm(request: Request, employee_id: int):
         (employee_id,)
     )
     employee = cursor.fetchone()
-    conn.close()
 
     if not employee:
+        conn.close()
         return HTMLResponse("Сотрудник не найден", status_code=404)
 
     # Руководителя увольнять нельзя
     if employee["role"] == "Руководитель":
+        conn.close()
         return HTMLResponse("Руководителя нельзя уволить", status_code=400)
 
+    # Кому уйдут животные — тот же план, что применится при увольнении
+    plan, error = None, None
+    try:
+        plan = reassign.plan_fire(cursor, employee_id)
+    except reassign.ReassignError as e:
+        error = str(e)
+    conn.rollback()
+    conn.close()
+
     return templates.TemplateResponse(
         "employee_confirm_fire.html",
-        {"request": request, "employee": employee}
+        {"request": request, "employee": employee, "plan": plan, "error": error}
     )
 
 
@@ -283,7 +332,7 @@ async def fire_confirm(request: Request, employee_id: int):
 async def fire_employee(request: Request, employee_id: int):
 
     conn = get_connection()
-    cursor = conn.cursor()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
     try:
         # 1. Увольняем сотрудника
@@ -296,13 +345,9 @@ async def fire_employee(request: Request, employee_id: int):
             (employee_id,)
         )
 
-        # 2. Переназначаем животных другому зоотехнику
-        cursor.execute(
-            '''
-            SELECT "ПереназначитьЖивотныхПриУвольнении_fn"(%s)
-            ''',
-            (employee_id,)
-        )
+        # 2. Распределяем его животных по остальным зоотехникам
+        #    (reassign.py) — одним UPDATE в той же транзакции
+        reassign.apply(cursor, reassign.plan_fire(cursor, employee_id, lock=True))
 
         conn.commit()
 
@@ -332,4 +377,71 @@ async def fire_employee(request: Request, employee_id: int):
         )
 
     conn.close()
-    return RedirectResponse(url="/employees", status_code=303)
\ No newline at end of file
+    bump("Сотрудник", "Животное")
+    return RedirectResponse(url="/employees", status_code=303)
+
+
+# ============================================================
+# ⚖ ПЕРЕРАСПРЕДЕЛЕНИЕ ЖИВОТНЫХ МЕЖДУ ЗООТЕХНИКАМИ (reassign.py)
+#   GET — план без изменений, POST — тот же план, пересчитанный
+#   и применённый в одной транзакции
+# ============================================================
+
+@router.get("/employees/rebalance", response_class=HTMLResponse)
+@role_required(["director", "admin"])
+async def rebalance_preview(request: Request, affinity: str | None = "1"):
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    plan, error = None, None
+    try:
+        plan = reassign.plan_rebalance(cursor, affinity=affinity == "1")
+    except reassign.ReassignError as e:
+        error = str(e)
+    conn.rollback()
+    conn.close()
+
+    return templates.TemplateResponse(
+        "employees_rebalance.html",
+        {
+            "request": request,
+            "plan": plan,
+            "affinity": affinity == "1",
+            "error": error,
+            "message": None,
+        }
+    )
+
+
+@router.post("/employees/rebalance", response_class=HTMLResponse)
+@role_required(["director", "admin"])
+async def rebalance_apply(request: Request, affinity: str = Form("")):
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    try:
+        plan = reassign.plan_rebalance(cursor, affinity=affinity == "1", lock=True)
+        moved = reassign.apply(cursor, plan)
+        conn.commit()
+    except reassign.ReassignError as e:
+        conn.rollback()
+        conn.close()
+        return templates.TemplateResponse(
+            "employees_rebalance.html",
+            {"request": request, "plan": None, "affinity": affinity == "1", "error": str(e), "message": None}
+        )
+
+    conn.close()
+    if moved:
+        bump("Животное")
+
+    return templates.TemplateResponse(
+        "employees_rebalance.html",
+        {
+            "request": request,
+            "plan": plan,
+            "affinity": affinity == "1",
+            "error": None,
+            "message": f"Перераспределено животных: {moved}",
+        }
+    )
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+
+from live_events import hub, allowed_topics
+from permissions import role_required
+
+router = APIRouter()
+
+# Комментарий-пинг, чтобы прокси не закрывали молчащее соединение
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 5000
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+# ============================================================
+# 📡 ПОТОК СОБЫТИЙ ДЛЯ ЖИВОГО ОБНОВЛЕНИЯ СТРАНИЦ
+#   /events?topics=malfunctions,feeds
+#   Роль ограничивает темы (live_events.TOPIC_ROLES)
+# ============================================================
+@router.get("/events")
+@role_required(["admin", "director", "manager", "zootechnician"], ajax=True)
+async def events_stream(
+        request: Request,
+        topics: str = Query(default=""),
+):
+    role = request.state.user["role"]
+    requested = {t.strip() for t in topics.split(",") if t.strip()}
+    sub = hub.subscribe(role, allowed_topics(role, requested))
+
+    async def stream():
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+
+                if event["topic"] == "reload":
+                    sub.overflow = False
+                yield sse(event["topic"], event)
+
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -2,9 +2,10 @@ from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 import psycopg2.extras
 
-from db import get_connection
+from db import get_read_connection
 from permissions import role_required
 from app import templates
+from streaming import ServerCursor, stream_template
 
 router = APIRouter()
 
@@ -18,7 +19,7 @@ async def my_expenses(request: Request):
     user = request.state.user
     employee_id = user["id"]
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
     cursor.execute(
@@ -52,17 +53,15 @@ async def my_expenses(request: Request):
 
 # ============================================================
 # ВСЕ РАСХОДЫ — для менеджера / директора / админа
-# (простая версия, без аналитики, сделаем потом умнее)
+# Таблица растёт без ограничений, поэтому страница рендерится
+# потоком по серверному курсору (см. streaming.py)
 # ============================================================
 @router.get("/expenses", response_class=HTMLResponse)
 @role_required(["manager", "director", "admin"])
 async def all_expenses(request: Request):
     user = request.state.user
 
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    cursor.execute(
+    expenses = ServerCursor(
         """
         SELECT
             r."IDРасхода"     AS id,
@@ -78,14 +77,13 @@ async def all_expenses(request: Request):
         """
     )
 
-    expenses = cursor.fetchall()
-    conn.close()
-
-    return templates.TemplateResponse(
+    return stream_template(
+        templates,
+        request,
         "expenses_all.html",
         {
-            "request": request,
             "user": user,
             "expenses": expenses,
-        }
+        },
+        cursors=(expenses,),
     )
\ No newline at end of file
@@ -2,28 +2,21 @@ from fastapi import APIRouter, Request, Form, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 import psycopg2.extras
 
-from db import get_connection
+import feeding_schedule
+import queries
+from db import get_connection, get_read_connection
+from exports import csv_export_response
 from permissions import role_required
+from table_versions import bump
 from app import templates
 
 router = APIRouter()
 
 
 # ======================================================
-# 📌 СПИСОК КОРМЛЕНИЙ — только для зоотехника
+# 📌 ВЫБОРКА КОРМЛЕНИЙ ЗООТЕХНИКА (общая для списка и экспорта)
 # ======================================================
-@router.get("/feedings", response_class=HTMLResponse)
-@role_required(["zootechnician"])
-async def feedings_list(
-   request: Request,
-   search: str | None = Query(default=None)   # <-- поиск по виду
-):
-   user = request.state.user
-   employee_id = user["id"]
-
-   conn = get_connection()
-   cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
+def feedings_query(employee_id: int, search: str | None) -> tuple[str, list]:
    base_sql = """
        SELECT
            f."IDКормления" AS id,
@@ -46,7 +39,25 @@ async def feedings_list(
 
    base_sql += ' ORDER BY f."IDКормления" DESC'
 
-   cursor.execute(base_sql, params)
+   return base_sql, params
+
+
+# ======================================================
+# 📌 СПИСОК КОРМЛЕНИЙ — только для зоотехника
+# ======================================================
+@router.get("/feedings", response_class=HTMLResponse)
+@role_required(["zootechnician"])
+async def feedings_list(
+   request: Request,
+   search: str | None = Query(default=None)   # <-- поиск по виду
+):
+   user = request.state.user
+   employee_id = user["id"]
+
+   conn = get_read_connection()
+   cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+   cursor.execute(*feedings_query(employee_id, search))
    feedings = cursor.fetchall()
    conn.close()
 
@@ -61,6 +72,28 @@ async def feedings_list(
    )
 
 
+# ======================================================
+# 📌 ЭКСПОРТ CSV — только свои кормления
+# ======================================================
+FEEDINGS_EXPORT_COLUMNS = [
+    ("id", "ID"),
+    ("feeding_time", "Дата и время"),
+    ("animal_name", "Кличка"),
+    ("animal_species", "Вид"),
+    ("employee_name", "Сотрудник"),
+]
+
+
+@router.get("/feedings/export/csv")
+@role_required(["zootechnician"])
+async def feedings_export_csv(
+    request: Request,
+    search: str | None = Query(default=None)
+):
+    sql, params = feedings_query(request.state.user["id"], search)
+    return await csv_export_response(sql, params, FEEDINGS_EXPORT_COLUMNS, "t.id DESC", "feedings.csv")
+
+
 # ======================================================
 # 📌 ФОРМА ДОБАВЛЕНИЯ — зоотехник
 # ======================================================
@@ -73,20 +106,7 @@ async def feeding_add_form(request: Request, error: str | None = None):
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-    cursor.execute(
-        """
-        SELECT
-            "IDЖивотного" AS id,
-            "Кличка"      AS name,
-            "Вид"        AS species
-        FROM "Животное"
-        WHERE "IDСотрудника" = %s
-        ORDER BY "Кличка"
-        """,
-        (employee_id,)
-    )
-
-    animals = cursor.fetchall()
+    animals = queries.fetchall(cursor, "animals_of_employee", (employee_id,))
     conn.close()
 
     return templates.TemplateResponse(
@@ -116,19 +136,7 @@ async def feeding_add(
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
     # 1. Находим рацион
-    cursor.execute(
-        """
-        SELECT
-            r."IDКорма"    AS feed_id,
-            r."Количество" AS ration_quantity
-        FROM "Рацион" r
-        JOIN "Животное" j
-          ON r."ВидЖивотного" = j."Вид"
-        WHERE j."IDЖивотного" = %s
-        """,
-        (animal_id,)
-    )
-    ration = cursor.fetchone()
+    ration = queries.fetchone(cursor, "ration_for_animal", (animal_id,))
 
     if not ration:
         conn.close()
@@ -141,15 +149,7 @@ async def feeding_add(
     need_qty = ration["ration_quantity"]
 
     # 2. Проверяем остаток
-    cursor.execute(
-        """
-        SELECT "ОстатокНаСкладе" AS stock
-        FROM "Корм"
-        WHERE "IDКорма" = %s
-        """,
-        (feed_id,)
-    )
-    stock = cursor.fetchone()["stock"]
+    stock = queries.fetchone(cursor, "feed_stock", (feed_id,))["stock"]
 
     if stock < need_qty:
         conn.close()
@@ -159,39 +159,50 @@ async def feeding_add(
         )
 
     # 3. Проводим кормление
-    cursor.execute(
-        """
-        INSERT INTO "Кормление"
-            ("IDЖивотного", "IDСотрудника", "ДатаИВремя")
-        VALUES (%s, %s, NOW())
-        RETURNING "IDКормления"
-        """,
-        (animal_id, employee_id)
-    )
-    feeding_id = cursor.fetchone()["IDКормления"]
-
-    cursor.execute(
-        """
-        UPDATE "Корм"
-        SET "ОстатокНаСкладе" = "ОстатокНаСкладе" - %s
-        WHERE "IDКорма" = %s
-        """,
-        (need_qty, feed_id)
-    )
+    feeding_id = queries.fetchone(cursor, "feeding_insert", (animal_id, employee_id))["IDКормления"]
 
-    cursor.execute('SELECT COALESCE(MAX("IDРасхода"), 0) + 1 AS new_id FROM "Расход"')
-    exp_id = cursor.fetchone()["new_id"]
+    queries.execute(cursor, "feed_stock_decrease", (need_qty, feed_id))
 
-    cursor.execute(
-        """
-        INSERT INTO "Расход"
-            ("IDРасхода", "IDКорма", "IDСотрудника", "Дата", "Количество")
-        VALUES (%s, %s, %s, CURRENT_DATE, %s)
-        """,
-        (exp_id, feed_id, employee_id, need_qty)
-    )
+    exp_id = queries.fetchone(cursor, "expense_next_id")["new_id"]
+    queries.execute(cursor, "expense_insert", (exp_id, feed_id, employee_id, need_qty))
+
+    # 4. Закрываем ближайший слот графика
+    feeding_schedule.mark_done(cursor, animal_id, feeding_id)
 
     conn.commit()
     conn.close()
+    bump("Кормление", "Корм", "Расход", "СлотКормления")
 
-    return RedirectResponse("/feedings", status_code=303)
\ No newline at end of file
+    return RedirectResponse("/feedings", status_code=303)
+
+
+# ======================================================
+# 📌 ГРАФИК НА СЕГОДНЯ — зоотехник
+#   Слоты строятся из "РасписаниеРациона" (feeding_schedule.py)
+# ======================================================
+@router.get("/feedings/due", response_class=HTMLResponse)
+@role_required(["zootechnician"])
+async def feedings_due(request: Request):
+    user = request.state.user
+
+    conn = get_connection()
+    feeding_schedule.ensure_day(conn)
+
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute(feeding_schedule.DUE_SQL, (user["id"],))
+    slots = cursor.fetchall()
+
+    cursor.execute(feeding_schedule.ALERTS_SQL, (user["id"],))
+    alerts = cursor.fetchall()
+    conn.close()
+
+    return templates.TemplateResponse(
+        "feedings_due.html",
+        {
+            "request": request,
+            "user": user,
+            "due_now": [s for s in slots if s["is_due"]],
+            "later": [s for s in slots if not s["is_due"]],
+            "alerts": alerts,
+        }
+    )
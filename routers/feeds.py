@@ -1,33 +1,25 @@
-from fastapi import APIRouter, Request, Query, Form
+from fastapi import APIRouter, Request, Query, Form, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse
 import psycopg2.extras
 
+import imports
 from db import get_connection
 from permissions import role_required
+from table_versions import etag_cached, bump
 from app import templates
 
 router = APIRouter()
 
 
 # ============================================================
-# 📋 СПИСОК КОРМОВ (с фильтрами)
+# 📋 ВЫБОРКА КОРМОВ ПО ФИЛЬТРАМ (общая для страницы и фрагмента)
 # ============================================================
-@router.get("/feeds", response_class=HTMLResponse)
-@role_required(["admin", "director", "manager", "zootechnician"])
-async def feeds_list(
-    request: Request,
-    feed_type: str | None = Query(default=None),      # фильтр по типу
-    low_only: str | None = Query(default=None)        # фильтр "только на исходе"
-):
+def fetch_feeds(cursor, feed_type: str | None, low_only: str | None) -> list[dict]:
     """
-    Раздел «Корм» с фильтрами:
     - feed_type = "Сухой" / "Влажный" / "Комбикорм" / None (все)
     - low_only = "1" → показывать только те, что на исходе
     """
 
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
     sql = """
         SELECT
             k."IDКорма"          AS id,
@@ -71,7 +63,28 @@ async def feeds_list(
     sql += ' ORDER BY k."Наименование"'
 
     cursor.execute(sql, params)
-    feeds = cursor.fetchall()
+    return cursor.fetchall()
+
+
+# ============================================================
+# 📋 СПИСОК КОРМОВ (с фильтрами)
+# ============================================================
+@router.get("/feeds", response_class=HTMLResponse)
+@role_required(["admin", "director", "manager", "zootechnician"])
+@etag_cached("Корм", "Рацион")
+async def feeds_list(
+    request: Request,
+    feed_type: str | None = Query(default=None),      # фильтр по типу
+    low_only: str | None = Query(default=None)        # фильтр "только на исходе"
+):
+    """
+    Раздел «Корм» с фильтрами (см. fetch_feeds).
+    """
+
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    feeds = fetch_feeds(cursor, feed_type, low_only)
 
     # Получаем список всех типов корма
     cursor.execute('SELECT DISTINCT "Тип" AS type FROM "Корм" ORDER BY "Тип"')
@@ -92,6 +105,33 @@ async def feeds_list(
     )
 
 
+# ============================================================
+# 📋 ФРАГМЕНТ ТАБЛИЦЫ КОРМОВ (без справочника типов)
+# ============================================================
+@router.get("/feeds/rows", response_class=HTMLResponse)
+@role_required(["admin", "director", "manager", "zootechnician"])
+@etag_cached("Корм", "Рацион")
+async def feeds_rows(
+    request: Request,
+    feed_type: str | None = Query(default=None),
+    low_only: str | None = Query(default=None)
+):
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    feeds = fetch_feeds(cursor, feed_type, low_only)
+
+    conn.close()
+
+    return templates.TemplateResponse(
+        "feeds_rows.html",
+        {
+            "request": request,
+            "feeds": feeds,
+        },
+    )
+
+
 # ============================================================
 # ➕ ДОБАВЛЕНИЕ
 # ============================================================
@@ -138,5 +178,56 @@ async def feed_add(
 
     conn.commit()
     conn.close()
+    bump("Корм")
+
+    return RedirectResponse("/feeds", status_code=303)
 
-    return RedirectResponse("/feeds", status_code=303)
\ No newline at end of file
+
+# ============================================================
+# 📥 ЗАГРУЗКА КОРМОВ ИЗ CSV (склад целиком, одной транзакцией)
+# ============================================================
+def feeds_import_page(request: Request, inserted: int = 0, errors: list | None = None):
+    return templates.TemplateResponse(
+        "import_csv.html",
+        {
+            "request": request,
+            "title": "Загрузка кормов из CSV",
+            "columns": imports.FEED_COLUMNS,
+            "hint": "Единица измерения по умолчанию — кг, остаток — 0.",
+            "action": "/feeds/import",
+            "back_url": "/feeds",
+            "inserted": inserted,
+            "errors": errors,
+        },
+    )
+
+
+@router.get("/feeds/import", response_class=HTMLResponse)
+@role_required(["admin", "director", "manager"])
+async def feeds_import_form(request: Request):
+    return feeds_import_page(request)
+
+
+@router.post("/feeds/import", response_class=HTMLResponse)
+@role_required(["admin", "director", "manager"])
+async def feeds_import(request: Request, file: UploadFile = File(...)):
+    data = await file.read()
+
+    conn = get_connection()
+    try:
+        result = imports.import_feeds(conn, data)
+        if result.ok:
+            conn.commit()
+    except psycopg2.Error as e:
+        # Ограничения и триггеры базы, которые проверки не покрыли
+        conn.rollback()
+        msg = str(e).split("CONTEXT:")[0].strip()
+        result = imports.ImportResult(errors=[msg])
+    finally:
+        conn.close()
+
+    if not result.ok:
+        return feeds_import_page(request, errors=result.errors)
+
+    bump("Корм")
+    return feeds_import_page(request, inserted=result.inserted)
@@ -1,30 +1,24 @@
 from fastapi import APIRouter, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 import psycopg2.extras
 from datetime import datetime
 
-from db import get_connection
+from db import get_connection, get_read_connection
 from permissions import role_required
 from session import session_data
+from table_versions import bump
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 
 # ============================================================
-# 📌 СПИСОК НЕИСПРАВНОСТЕЙ + ФИЛЬТРЫ
+# 📌 ВЫБОРКА НЕИСПРАВНОСТЕЙ ПО ФИЛЬТРАМ (общая для страницы и фрагмента)
 # ============================================================
-@router.get("/malfunctions", response_class=HTMLResponse)
-async def malfunctions_list(request: Request):
-
-    role = session_data.get("current_user_role")
+def fetch_malfunctions(role: str | None, place: str, status: str) -> list[dict]:
 
-    # Параметры фильтра
-    place = request.query_params.get("place", "all")
-    status = request.query_params.get("status", "all")
-
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
     sql = """
@@ -67,6 +61,23 @@ async def malfunctions_list(request: Request):
 
     conn.close()
 
+    return malfunctions
+
+
+# ============================================================
+# 📌 СПИСОК НЕИСПРАВНОСТЕЙ + ФИЛЬТРЫ
+# ============================================================
+@router.get("/malfunctions", response_class=HTMLResponse)
+async def malfunctions_list(request: Request):
+
+    role = session_data.get("current_user_role")
+
+    # Параметры фильтра
+    place = request.query_params.get("place", "all")
+    status = request.query_params.get("status", "all")
+
+    malfunctions = fetch_malfunctions(role, place, status)
+
     return templates.TemplateResponse(
         "malfunctions.html",
         {
@@ -79,6 +90,29 @@ async def malfunctions_list(request: Request):
     )
 
 
+# ============================================================
+# 📌 ФРАГМЕНТ ТАБЛИЦЫ НЕИСПРАВНОСТЕЙ
+# ============================================================
+@router.get("/malfunctions/rows", response_class=HTMLResponse)
+async def malfunctions_rows(request: Request):
+
+    role = session_data.get("current_user_role")
+
+    place = request.query_params.get("place", "all")
+    status = request.query_params.get("status", "all")
+
+    malfunctions = fetch_malfunctions(role, place, status)
+
+    return templates.TemplateResponse(
+        "malfunctions_rows.html",
+        {
+            "request": request,
+            "malfunctions": malfunctions,
+            "role": role,
+        }
+    )
+
+
 # ============================================================
 # ➕ ФОРМА ДОБАВЛЕНИЯ
 # ============================================================
@@ -126,6 +160,7 @@ async def add_malfunction(request: Request, description: str = Form(...), place:
 
     conn.commit()
     conn.close()
+    bump("Неисправность")
 
     return RedirectResponse("/malfunctions", status_code=303)
 
@@ -178,9 +213,136 @@ async def edit_malfunction(request: Request, mal_id: int):
 
     conn.commit()
     conn.close()
+    bump("Неисправность")
 
     return RedirectResponse("/malfunctions", status_code=303)
 
+
+# ============================================================
+# ⚙ МАССОВАЯ СМЕНА СТАТУСА — Только director
+#   Переходы только вперёд и на один шаг (MALFUNCTION_TRANSITIONS) —
+#   как у edit_malfunction для одной строки; "Устранено" — окончательный.
+#   Проверка и обновление — одним запросом, итог по каждому ID.
+# ============================================================
+
+MALFUNCTION_TRANSITIONS = [
+    ("Зафиксировано", "В процессе"),
+    ("В процессе", "Устранено"),
+]
+
+MALFUNCTION_OUTCOMES = {
+    "updated": "Статус изменён",
+    "unchanged": "Уже в этом статусе",
+    "final": "Неисправность уже устранена",
+    "invalid": "Недопустимый переход статуса",
+    "not_found": "Неисправность не найдена",
+    "conflict": "Изменено другим пользователем, повторите",
+}
+
+BULK_STATUS_SQL = """
+    WITH req AS (
+        SELECT DISTINCT unnest(%(ids)s::int[]) AS id
+    ),
+    transitions(from_status, to_status) AS (
+        SELECT * FROM unnest(%(from)s::text[], %(to)s::text[])
+    ),
+    cur AS (
+        SELECT "IDНеисправности" AS id, "СтатусУстранения" AS status
+        FROM "Неисправность"
+        WHERE "IDНеисправности" = ANY(%(ids)s)
+        FOR UPDATE
+    ),
+    checked AS (
+        SELECT
+            r.id,
+            c.status,
+            CASE
+                WHEN c.id IS NULL               THEN 'not_found'
+                WHEN c.status = 'Устранено'     THEN 'final'
+                WHEN c.status = %(status)s      THEN 'unchanged'
+                WHEN t.from_status IS NULL      THEN 'invalid'
+                ELSE 'ok'
+            END AS outcome
+        FROM req r
+        LEFT JOIN cur c ON c.id = r.id
+        LEFT JOIN transitions t
+               ON t.from_status = c.status
+              AND t.to_status = %(status)s
+    ),
+    upd AS (
+        UPDATE "Неисправность" n
+        SET "СтатусУстранения" = %(status)s,
+            "ДатаРешения" = CASE WHEN %(status)s = 'Устранено'
+                                 THEN CURRENT_DATE ELSE n."ДатаРешения" END
+        FROM checked ch
+        WHERE n."IDНеисправности" = ch.id
+          AND ch.outcome = 'ok'
+          AND n."СтатусУстранения" = ch.status
+        RETURNING n."IDНеисправности" AS id
+    )
+    SELECT
+        ch.id,
+        CASE
+            WHEN u.id IS NOT NULL   THEN 'updated'
+            WHEN ch.outcome = 'ok'  THEN 'conflict'
+            ELSE ch.outcome
+        END AS outcome
+    FROM checked ch
+    LEFT JOIN upd u ON u.id = ch.id
+    ORDER BY ch.id
+"""
+
+
+@router.post("/malfunctions/status/bulk")
+@role_required(["director"], ajax=True)
+async def edit_malfunctions_bulk(
+    request: Request,
+    ids: list[int] = Form(...),
+    status: str = Form(...),
+):
+    if status not in {to for _, to in MALFUNCTION_TRANSITIONS}:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "Некорректный статус"}
+        )
+
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    try:
+        cursor.execute(BULK_STATUS_SQL, {
+            "ids": ids,
+            "status": status,
+            "from": [f for f, _ in MALFUNCTION_TRANSITIONS],
+            "to": [t for _, t in MALFUNCTION_TRANSITIONS],
+        })
+        rows = cursor.fetchall()
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        conn.close()
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": str(e)}
+        )
+
+    conn.close()
+
+    updated = sum(1 for r in rows if r["outcome"] == "updated")
+    if updated:
+        bump("Неисправность")
+
+    return JSONResponse({
+        "success": True,
+        "status": status,
+        "updated": updated,
+        "results": [
+            {"id": r["id"], "outcome": r["outcome"], "message": MALFUNCTION_OUTCOMES[r["outcome"]]}
+            for r in rows
+        ],
+    })
+
+
 @router.get("/malfunctions/update-text/{mal_id}", response_class=HTMLResponse)
 @role_required(["manager", "zootechnician"])
 async def update_text_form(request: Request, mal_id: int):
@@ -237,5 +399,6 @@ async def update_text(request: Request, mal_id: int,
 
     conn.commit()
     conn.close()
+    bump("Неисправность")
 
     return RedirectResponse("/malfunctions", status_code=303)
\ No newline at end of file
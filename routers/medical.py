@@ -1,16 +1,29 @@
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+from markupsafe import Markup, escape
+from datetime import date
 
 import psycopg2.extras
 
-from db import get_connection
+from db import get_connection, get_read_connection
+from exports import csv_export_response
 from permissions import role_required
+from table_versions import bump
 from app import templates
 
 router = APIRouter()
 
 
+# ======================================================
+# 📌 Фильтр по виду (общий для списка и экспорта медкарт)
+# ======================================================
+def species_where(species: str | None) -> tuple[str, list]:
+    if species:
+        return ' WHERE j."Вид" ILIKE %s', [f"%{species}%"]
+    return "", []
+
+
 # ======================================================
 # 📌 /medical — список животных + фильтр по виду
 # ======================================================
@@ -18,7 +31,7 @@ router = APIRouter()
 @role_required(["manager", "zootechnician"])
 async def medical_animals_list(request: Request, species: str | None = None):
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
     base_sql = '''
@@ -32,12 +45,8 @@ async def medical_animals_list(request: Request, species: str | None = None):
                ON j."IDСотрудника" = s."IDСотрудника"
     '''
 
-    params = []
-    if species:
-        base_sql += ' WHERE j."Вид" ILIKE %s'
-        params.append(f"%{species}%")
-
-    base_sql += ' ORDER BY j."IDЖивотного"'
+    where_sql, params = species_where(species)
+    base_sql += where_sql + ' ORDER BY j."IDЖивотного"'
 
     cursor.execute(base_sql, params)
     animals = cursor.fetchall()
@@ -53,6 +62,177 @@ async def medical_animals_list(request: Request, species: str | None = None):
     )
 
 
+# ======================================================
+# 📌 /medical/export/csv — все записи медкарт животных из списка
+# ======================================================
+MEDICAL_EXPORT_COLUMNS = [
+    ("id", "ID записи"),
+    ("date", "Дата осмотра"),
+    ("animal_id", "ID животного"),
+    ("animal_name", "Кличка"),
+    ("species", "Вид"),
+    ("employee", "Сотрудник"),
+    ("diagnosis", "Диагноз"),
+    ("treatment", "Назначенное лечение"),
+    ("vaccines", "Прививки"),
+    ("result", "Результат процедуры"),
+]
+
+
+@router.get("/medical/export/csv")
+@role_required(["manager", "zootechnician"])
+async def medical_export_csv(request: Request, species: str | None = None):
+
+    where_sql, params = species_where(species)
+
+    sql = f'''
+        SELECT
+            m."IDМедкарты"         AS id,
+            m."ДатаОсмотра"        AS date,
+            j."IDЖивотного"        AS animal_id,
+            j."Кличка"             AS animal_name,
+            j."Вид"                AS species,
+            s."ФИО"                AS employee,
+            m."Диагноз"            AS diagnosis,
+            m."НазначенноеЛечение" AS treatment,
+            m."Прививки"           AS vaccines,
+            m."РезультатПроцедуры" AS result
+        FROM "Медкарта" m
+        JOIN "Животное" j       ON j."IDЖивотного"  = m."IDЖивотного"
+        LEFT JOIN "Сотрудник" s ON s."IDСотрудника" = m."IDСотрудника"
+        {where_sql}
+        ORDER BY j."IDЖивотного", m."ДатаОсмотра" DESC, m."IDМедкарты" DESC
+    '''
+
+    return await csv_export_response(
+        sql, params, MEDICAL_EXPORT_COLUMNS,
+        "t.animal_id, t.date DESC, t.id DESC", "medical.csv"
+    )
+
+
+# ======================================================
+# 📌 /medical/search — полнотекстовый поиск по медкартам
+#   Вектор и GIN-индекс: patch_medical_search.py
+# ======================================================
+SEARCH_PAGE_SIZE = 20
+
+# Маркеры подсветки из ts_headline; экранируем текст, затем меняем на <mark>
+HL_START, HL_STOP = "\u27e6", "\u27e7"
+
+SEARCH_SQL = """
+    WITH q AS (
+        SELECT websearch_to_tsquery('russian', %(q)s) AS query
+    ),
+    hits AS (
+        SELECT
+            m."IDМедкарты"                               AS id,
+            ts_rank_cd(m."ПоисковыйВектор", q.query)    AS rank,
+            COUNT(*) OVER ()                             AS total
+        FROM "Медкарта" m, q
+        WHERE m."ПоисковыйВектор" @@ q.query
+          AND (%(date_from)s::date IS NULL OR m."ДатаОсмотра" >= %(date_from)s::date)
+          AND (%(date_to)s::date   IS NULL OR m."ДатаОсмотра" <= %(date_to)s::date)
+        ORDER BY rank DESC, m."ДатаОсмотра" DESC, m."IDМедкарты" DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    )
+    SELECT
+        h.id,
+        h.rank,
+        h.total,
+        m."ДатаОсмотра"  AS date,
+        j."IDЖивотного"  AS animal_id,
+        j."Кличка"       AS animal_name,
+        j."Вид"          AS species,
+        s."ФИО"          AS employee,
+        ts_headline(
+            'russian',
+            concat_ws(' · ', m."Диагноз", m."НазначенноеЛечение",
+                             m."Прививки", m."РезультатПроцедуры"),
+            q.query,
+            %(headline_opts)s
+        ) AS snippet
+    FROM hits h
+    JOIN "Медкарта" m   ON m."IDМедкарты"   = h.id
+    JOIN "Животное" j   ON j."IDЖивотного"  = m."IDЖивотного"
+    LEFT JOIN "Сотрудник" s ON s."IDСотрудника" = m."IDСотрудника"
+    CROSS JOIN q
+    ORDER BY h.rank DESC, m."ДатаОсмотра" DESC, h.id DESC
+"""
+
+
+def highlight(snippet: str) -> Markup:
+    return Markup(
+        str(escape(snippet))
+        .replace(HL_START, "<mark>")
+        .replace(HL_STOP, "</mark>")
+    )
+
+
+@router.get("/medical/search", response_class=HTMLResponse)
+@role_required(["manager", "zootechnician"])
+async def medical_search(
+    request: Request,
+    q: str = Query(default=""),
+    date_from: str = Query(default=""),
+    date_to: str = Query(default=""),
+    page: int = Query(default=1, ge=1),
+):
+    q = q.strip()
+    results = []
+    total = 0
+    error = None
+
+    # Кривая дата из адресной строки — ошибка формы, а не 500
+    try:
+        start = date.fromisoformat(date_from) if date_from else None
+        end = date.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        start = end = None
+        error = "Некорректная дата."
+
+    # Ранжирование и сниппеты считаем только для одной страницы результатов
+    if q and not error:
+        conn = get_read_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        cursor.execute(
+            SEARCH_SQL,
+            {
+                "q": q,
+                "date_from": start,
+                "date_to": end,
+                "limit": SEARCH_PAGE_SIZE,
+                "offset": (page - 1) * SEARCH_PAGE_SIZE,
+                "headline_opts": f"StartSel={HL_START}, StopSel={HL_STOP}, "
+                                 f"MaxFragments=2, MaxWords=25, MinWords=8",
+            },
+        )
+        rows = cursor.fetchall()
+        conn.close()
+
+        for r in rows:
+            r["snippet"] = highlight(r["snippet"])
+        results = rows
+        total = rows[0]["total"] if rows else 0
+
+    pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+
+    return templates.TemplateResponse(
+        "medical_search.html",
+        {
+            "request": request,
+            "q": q,
+            "date_from": date_from,
+            "date_to": date_to,
+            "results": results,
+            "total": total,
+            "page": page,
+            "pages": pages,
+            "error": error,
+        }
+    )
+
+
 # ======================================================
 # 📌 Медкарта конкретного животного
 # ======================================================
@@ -60,7 +240,7 @@ async def medical_animals_list(request: Request, species: str | None = None):
 @role_required(["manager", "zootechnician"])
 async def medical_list(request: Request, animal_id: int):
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
     # Загружаем животное + состояние
@@ -280,4 +460,5 @@ async def medical_add(
         )
 
     conn.close()
+    bump("Медкарта")
     return RedirectResponse(url=f"/animals/{animal_id}/medical", status_code=303)
\ No newline at end of file
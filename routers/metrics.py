@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+import bulkheads
+import db
+import queries
+import singleflight
+from permissions import role_required
+
+router = APIRouter()
+
+
+# ============================================================
+# 📈 МЕТРИКИ ПРОЦЕССА — администратор
+#   Загрузка классов маршрутов (bulkheads.py), реплика,
+#   статистика именованных запросов (queries.py) и singleflight
+# ============================================================
+@router.get("/metrics")
+@role_required(["admin"], ajax=True)
+async def metrics(request: Request):
+    data = bulkheads.metrics()
+    data["replica"] = None
+    if db.replica_pool is not None:
+        data["replica"] = {
+            "usable": db.replica_state.usable,
+            "lag_seconds": db.replica_state.lag,
+        }
+    data["queries"] = queries.stats()
+    data["singleflight"] = dict(singleflight.stats, in_flight=len(singleflight._in_flight))
+    return JSONResponse(data)
@@ -14,30 +14,27 @@ router = APIRouter()
 # СПИСОК ЗАКУПОК
 # ============================================================
 from fastapi import APIRouter, Request, Form, Query
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
 import psycopg2.extras
 from psycopg2 import errors
 
-from db import get_connection
+from datetime import date
+
+from db import get_connection, get_read_connection
+from exports import csv_export_response
 from permissions import role_required
+from table_versions import etag_cached, bump
 from app import templates
 
 router = APIRouter()
 
 
 # ============================================================
-# СПИСОК ЗАКУПОК + ФИЛЬТРЫ
+# ФИЛЬТРЫ ЗАКУПОК (общие для страницы, фрагмента и экспорта)
 # ============================================================
-@router.get("/purchases", response_class=HTMLResponse)
-@role_required(["admin", "director", "manager"])
-async def purchases_list(
-        request: Request,
-        search: str = Query(default="", description="Поиск по ФИО"),
-        supplier: str = Query(default="", description="Фильтр по поставщику"),
-        status: str = Query(default="", description="Фильтр по статусу"),
-        date_from: str = Query(default="", description="Дата от"),
-        date_to: str = Query(default="", description="Дата до"),
-):
+def purchases_where(search: str, supplier: str, status: str,
+                    date_from: str, date_to: str) -> tuple[str, list]:
+    """Кривая дата — ValueError: вызывающий отвечает ошибкой формы или 400."""
 
     filters = []
     params = []
@@ -60,20 +57,25 @@ async def purchases_list(
     # Дата от
     if date_from:
         filters.append('z."ДатаЗаявки" >= %s')
-        params.append(date_from)
+        params.append(date.fromisoformat(date_from))
 
     # Дата до
     if date_to:
         filters.append('z."ДатаЗаявки" <= %s')
-        params.append(date_to)
+        params.append(date.fromisoformat(date_to))
 
     # Сборка WHERE
     where_sql = ""
     if filters:
         where_sql = "WHERE " + " AND ".join(filters)
 
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    return where_sql, params
+
+
+def fetch_purchases(cursor, search: str, supplier: str, status: str,
+                    date_from: str, date_to: str) -> list[dict]:
+
+    where_sql, params = purchases_where(search, supplier, status, date_from, date_to)
 
     cursor.execute(f"""
         SELECT
@@ -88,7 +90,32 @@ async def purchases_list(
         ORDER BY z."IDЗакупки" DESC
     """, params)
 
-    purchases = cursor.fetchall()
+    return cursor.fetchall()
+
+
+# ============================================================
+# СПИСОК ЗАКУПОК + ФИЛЬТРЫ
+# ============================================================
+@router.get("/purchases", response_class=HTMLResponse)
+@role_required(["admin", "director", "manager"])
+async def purchases_list(
+        request: Request,
+        search: str = Query(default="", description="Поиск по ФИО"),
+        supplier: str = Query(default="", description="Фильтр по поставщику"),
+        status: str = Query(default="", description="Фильтр по статусу"),
+        date_from: str = Query(default="", description="Дата от"),
+        date_to: str = Query(default="", description="Дата до"),
+):
+
+    conn = get_read_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    error = None
+    try:
+        purchases = fetch_purchases(cursor, search, supplier, status, date_from, date_to)
+    except ValueError:
+        purchases = []
+        error = "Некорректная дата."
 
     # Для фильтрации по поставщикам
     cursor.execute('SELECT DISTINCT "Поставщик" AS supplier FROM "Закупка" ORDER BY "Поставщик"')
@@ -107,11 +134,100 @@ async def purchases_list(
             "status_value": status,
             "date_from": date_from,
             "date_to": date_to,
+            "error": error,
             "user": request.state.user
         }
     )
 
 
+# ============================================================
+# ФРАГМЕНТ ТАБЛИЦЫ ЗАКУПОК (без списка поставщиков)
+# ============================================================
+@router.get("/purchases/rows", response_class=HTMLResponse)
+@role_required(["admin", "director", "manager"])
+async def purchases_rows(
+        request: Request,
+        search: str = Query(default=""),
+        supplier: str = Query(default=""),
+        status: str = Query(default=""),
+        date_from: str = Query(default=""),
+        date_to: str = Query(default=""),
+):
+
+    conn = get_read_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    try:
+        purchases = fetch_purchases(cursor, search, supplier, status, date_from, date_to)
+    except ValueError:
+        return HTMLResponse("Некорректная дата.", status_code=400)
+    finally:
+        conn.close()
+
+    return templates.TemplateResponse(
+        "purchases_rows.html",
+        {
+            "request": request,
+            "purchases": purchases,
+        }
+    )
+
+
+# ============================================================
+# ЭКСПОРТ CSV — закупки с составом, по строке на позицию
+# ============================================================
+PURCHASES_EXPORT_COLUMNS = [
+    ("id", "ID закупки"),
+    ("request_date", "Дата заявки"),
+    ("supplier", "Поставщик"),
+    ("status", "Статус"),
+    ("employee_name", "Сотрудник"),
+    ("feed_name", "Корм"),
+    ("quantity", "Количество"),
+    ("unit", "Ед. изм."),
+]
+
+
+@router.get("/purchases/export/csv")
+@role_required(["admin", "director", "manager"])
+async def purchases_export_csv(
+        request: Request,
+        search: str = Query(default=""),
+        supplier: str = Query(default=""),
+        status: str = Query(default=""),
+        date_from: str = Query(default=""),
+        date_to: str = Query(default=""),
+):
+
+    try:
+        where_sql, params = purchases_where(search, supplier, status, date_from, date_to)
+    except ValueError:
+        return PlainTextResponse("Некорректная дата.", status_code=400)
+
+    sql = f"""
+        SELECT
+            z."IDЗакупки"        AS id,
+            z."ДатаЗаявки"       AS request_date,
+            z."Поставщик"        AS supplier,
+            z."СтатусПоставки"   AS status,
+            s."ФИО"              AS employee_name,
+            k."Наименование"     AS feed_name,
+            sz."Количество"      AS quantity,
+            k."ЕдиницаИзмерения" AS unit
+        FROM "Закупка" z
+        JOIN "Сотрудник" s          ON z."IDСотрудника" = s."IDСотрудника"
+        LEFT JOIN "СоставЗакупки" sz ON sz."IDЗакупки"  = z."IDЗакупки"
+        LEFT JOIN "Корм" k          ON k."IDКорма"      = sz."IDКорма"
+        {where_sql}
+        ORDER BY z."IDЗакупки" DESC, k."Наименование"
+    """
+
+    return await csv_export_response(
+        sql, params, PURCHASES_EXPORT_COLUMNS,
+        "t.id DESC, t.feed_name", "purchases.csv"
+    )
+
+
 # ============================================================
 # ШАГ 1 — ФОРМА ВВОДА ПОСТАВЩИКА
 # ============================================================
@@ -220,6 +336,7 @@ async def purchase_create_add_item(
 
     conn.commit()
     conn.close()
+    bump("Закупка", "СоставЗакупки")
 
     return RedirectResponse(f"/purchases/{purchase_id}", status_code=303)
 
@@ -290,6 +407,7 @@ async def purchase_change_status(
 
     conn.commit()
     conn.close()
+    bump("Закупка", "Корм")
 
     return RedirectResponse(f"/purchases/{purchase_id}", status_code=303)
 
@@ -299,6 +417,7 @@ async def purchase_change_status(
 # ============================================================
 @router.get("/purchases/{purchase_id}", response_class=HTMLResponse)
 @role_required(["admin", "director", "manager"])
+@etag_cached("Закупка", "СоставЗакупки", "Сотрудник", "Корм")
 async def purchase_detail(request: Request, purchase_id: int, error_message: str = None):
 
     conn = get_connection()
@@ -413,5 +532,6 @@ async def purchase_add_item(
 
     conn.commit()
     conn.close()
+    bump("СоставЗакупки")
 
     return RedirectResponse(f"/purchases/{purchase_id}", status_code=303)
\ No newline at end of file
@@ -3,8 +3,10 @@ from fastapi.responses import RedirectResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 import psycopg2.extras
 
+import feeding_schedule
 from db import get_connection
 from permissions import role_required
+from table_versions import etag_cached, bump
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -16,6 +18,7 @@ templates = Jinja2Templates(directory="templates")
 
 @router.get("/rations", response_class=HTMLResponse)
 @role_required(["manager", "zootechnician"])
+@etag_cached("Рацион", "Корм")
 async def rations_list(
         request: Request,
         search: str | None = Query(default=None)
@@ -110,10 +113,15 @@ async def rations_add(
         INSERT INTO "Рацион"
         ("IDКорма", "ВидЖивотного", "Количество", "ЧастотаКормления")
         VALUES (%s, %s, %s, %s)
+        RETURNING "IDРациона"
     """, (feed_id, species, amount, frequency))
+    ration_id = cursor.fetchone()["IDРациона"]
+
+    feeding_schedule.sync_ration(cursor, ration_id, frequency)
 
     conn.commit()
     conn.close()
+    bump("Рацион", "СлотКормления")
     return RedirectResponse("/rations", status_code=303)
 
 
@@ -169,8 +177,15 @@ async def rations_edit(
             "Количество"=%s,
             "ЧастотаКормления"=%s
         WHERE "IDРациона"=%s
+        RETURNING "ВидЖивотного"
     """, (feed_id, amount, frequency, ration_id))
+    row = cursor.fetchone()
+
+    # Новая частота — слоты вида перестраиваются при следующем ensure_day
+    if row:
+        feeding_schedule.sync_ration(cursor, ration_id, frequency, species=row[0])
 
     conn.commit()
     conn.close()
+    bump("Рацион", "СлотКормления")
     return RedirectResponse("/rations", status_code=303)
\ No newline at end of file
@@ -0,0 +1,130 @@
+from fastapi import APIRouter, Request, Form
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse
+import os
+
+import reports
+from permissions import role_required
+from app import templates
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["reports"]
+)
+
+
+def task_json(task: dict) -> dict:
+    return {
+        "id": task["id"],
+        "type": task["type"],
+        "status": task["status"],
+        "progress": task["progress"],
+        "rows_done": task["rows_done"],
+        "rows_total": task["rows_total"],
+        "file_size": task["file_size"],
+        "error": task["error"],
+        "download_url": f"/reports/{task['id']}/download" if task["status"] == "done" else None,
+    }
+
+
+def own_task(request: Request, task_id: int) -> dict | None:
+    task = reports.get_task(task_id)
+    if not task or task["employee_id"] != request.state.user["id"]:
+        return None
+    return task
+
+
+# ============================================================
+# МОИ ОТЧЁТЫ
+# ============================================================
+@router.get("", response_class=HTMLResponse)
+@role_required(["admin", "director"])
+async def reports_list(request: Request):
+    tasks = reports.list_tasks(request.state.user["id"])
+
+    return templates.TemplateResponse(
+        "reports.html",
+        {
+            "request": request,
+            "tasks": tasks,
+            "report_types": reports.REPORT_TYPES,
+            "pending": any(t["status"] in ("queued", "running") for t in tasks),
+        }
+    )
+
+
+# ============================================================
+# ПОСТАНОВКА В ОЧЕРЕДЬ
+#   Ответ — номер задачи (JSON) или переход к списку отчётов
+# ============================================================
+@router.post("")
+@role_required(["admin", "director"])
+async def report_enqueue(
+        request: Request,
+        report_type: str = Form(...),
+        period: str = Form(""),
+        place: str = Form(""),
+        date_from: str = Form(""),
+        date_to: str = Form(""),
+):
+    user = request.state.user
+    wants_json = "application/json" in request.headers.get("accept", "")
+
+    rt = reports.REPORT_TYPES.get(report_type)
+    if not rt or user["role"] not in rt.roles:
+        return JSONResponse({"error": "Неизвестный тип отчёта"}, status_code=400)
+
+    if place and place not in ("Вольер", "Участок"):
+        return JSONResponse({"error": "Некорректное значение поля 'place'."}, status_code=400)
+
+    params = {
+        k: v for k, v in {
+            "period": period,
+            "place": place,
+            "date_from": date_from,
+            "date_to": date_to,
+        }.items() if v
+    }
+
+    task_id = reports.enqueue(report_type, params, user["id"])
+
+    if wants_json:
+        return JSONResponse(
+            {"id": task_id, "status_url": f"/reports/{task_id}"},
+            status_code=202
+        )
+    return RedirectResponse("/reports", status_code=303)
+
+
+# ============================================================
+# СОСТОЯНИЕ ЗАДАЧИ
+# ============================================================
+@router.get("/{task_id}")
+@role_required(["admin", "director"], ajax=True)
+async def report_status(request: Request, task_id: int):
+    task = own_task(request, task_id)
+    if not task:
+        return JSONResponse({"error": "Отчёт не найден"}, status_code=404)
+
+    return JSONResponse(task_json(task))
+
+
+# ============================================================
+# СКАЧИВАНИЕ
+#   FileResponse сам обрабатывает Range / If-Range (206)
+# ============================================================
+@router.get("/{task_id}/download")
+@role_required(["admin", "director"])
+async def report_download(request: Request, task_id: int):
+    task = own_task(request, task_id)
+    if not task or task["status"] != "done":
+        return HTMLResponse("Отчёт не найден или ещё не готов", status_code=404)
+
+    path = reports.file_path(task["file_name"])
+    if not os.path.exists(path):
+        return HTMLResponse("Файл отчёта удалён по сроку хранения", status_code=410)
+
+    return FileResponse(
+        path,
+        media_type="application/gzip",
+        filename=f"{task['type']}_{task['id']}.csv.gz",
+    )
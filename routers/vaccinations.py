@@ -0,0 +1,177 @@
+from datetime import date
+
+from fastapi import APIRouter, Request, Form, Query
+from fastapi.responses import HTMLResponse, RedirectResponse
+import psycopg2.extras
+
+from cache import TableCache
+import queries
+from db import get_connection
+from permissions import role_required
+from table_versions import bump
+from app import templates
+
+router = APIRouter()
+
+# За сколько дней вперёд показываем предстоящие ревакцинации
+UPCOMING_DAYS = 30
+
+# ======================================================
+# График ревакцинации для всех живых животных одним запросом:
+# последняя дата каждой вакцины + интервал (вид/вакцина → вид/* →
+# */вакцина → */*). Таблицы — patch_vaccinations.py.
+# ======================================================
+SCHEDULE_SQL = """
+    WITH last_vac AS (
+        SELECT
+            v."IDЖивотного",
+            v."Вакцина",
+            MAX(v."ДатаВакцинации") AS last_date
+        FROM "Вакцинация" v
+        GROUP BY v."IDЖивотного", v."Вакцина"
+    )
+    SELECT
+        j."IDЖивотного"              AS animal_id,
+        j."Кличка"                   AS animal_name,
+        j."Вид"                      AS species,
+        j."IDСотрудника"             AS employee_id,
+        s."ФИО"                      AS employee_name,
+        lv."Вакцина"                 AS vaccine,
+        lv.last_date                 AS last_date,
+        iv.days                      AS interval_days,
+        lv.last_date + iv.days       AS due_date,
+        (lv.last_date + iv.days) - CURRENT_DATE AS days_left
+    FROM last_vac lv
+    JOIN "Животное" j
+      ON j."IDЖивотного" = lv."IDЖивотного"
+     AND j."СостояниеЗдоровья" IS DISTINCT FROM 'Умер'
+    LEFT JOIN "Сотрудник" s ON s."IDСотрудника" = j."IDСотрудника"
+    JOIN LATERAL (
+        SELECT i."ИнтервалДней" AS days
+        FROM "ИнтервалРевакцинации" i
+        WHERE i."ВидЖивотного" IN (j."Вид", '*')
+          AND i."Вакцина" IN (lv."Вакцина", '*')
+        ORDER BY (i."ВидЖивотного" = j."Вид") DESC, (i."Вакцина" = lv."Вакцина") DESC
+        LIMIT 1
+    ) iv ON iv.days IS NOT NULL
+    WHERE lv.last_date + iv.days <= CURRENT_DATE + %(horizon)s
+    ORDER BY due_date, j."Кличка", lv."Вакцина"
+"""
+
+# Пересчёт раз в день или при изменении исходных таблиц
+schedule_cache = TableCache(
+    ["Медкарта", "Животное", "Сотрудник", "ИнтервалРевакцинации"]
+)
+
+
+def load_schedule() -> list[dict]:
+    key = (date.today(), UPCOMING_DAYS)
+
+    rows = schedule_cache.get(key)
+    if rows is None:
+        versions = schedule_cache.versions()
+
+        conn = get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(SCHEDULE_SQL, {"horizon": UPCOMING_DAYS})
+        rows = cursor.fetchall()
+        conn.close()
+
+        schedule_cache.set(key, rows, versions)
+
+    return rows
+
+
+# ======================================================
+# 📌 ГРАФИК РЕВАКЦИНАЦИИ
+#   Зоотехник видит только своих животных,
+#   менеджер — всех (с фильтром по зоотехнику)
+# ======================================================
+@router.get("/vaccinations", response_class=HTMLResponse)
+@role_required(["manager", "zootechnician"])
+async def vaccinations_schedule(
+    request: Request,
+    employee_id: int | None = Query(default=None),
+):
+    user = request.state.user
+
+    if user["role"] == "zootechnician":
+        employee_id = user["id"]
+
+    rows = load_schedule()
+    if employee_id:
+        rows = [r for r in rows if r["employee_id"] == employee_id]
+
+    overdue = [r for r in rows if r["days_left"] < 0]
+    upcoming = [r for r in rows if r["days_left"] >= 0]
+
+    keepers = []
+    intervals = []
+    if user["role"] == "manager":
+        conn = get_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        keepers = queries.fetchall(cursor, "zootechnicians")
+
+        cursor.execute(
+            """
+            SELECT "ВидЖивотного" AS species, "Вакцина" AS vaccine, "ИнтервалДней" AS days
+            FROM "ИнтервалРевакцинации"
+            ORDER BY "ВидЖивотного", "Вакцина"
+            """
+        )
+        intervals = cursor.fetchall()
+
+        conn.close()
+
+    return templates.TemplateResponse(
+        "vaccinations.html",
+        {
+            "request": request,
+            "overdue": overdue,
+            "upcoming": upcoming,
+            "upcoming_days": UPCOMING_DAYS,
+            "keepers": keepers,
+            "intervals": intervals,
+            "selected_employee": employee_id or "",
+        }
+    )
+
+
+# ======================================================
+# 📌 НАСТРОЙКА ИНТЕРВАЛА РЕВАКЦИНАЦИИ — менеджер
+#   days пустое → вакцина однократная
+# ======================================================
+@router.post("/vaccinations/intervals")
+@role_required(["manager"])
+async def vaccination_interval_save(
+    request: Request,
+    species: str = Form("*"),
+    vaccine: str = Form("*"),
+    days: str = Form(""),
+):
+    species = species.strip() or "*"
+    vaccine = vaccine.strip().lower() or "*"
+    days = days.strip()
+
+    if days and (not days.isdigit() or int(days) <= 0):
+        return HTMLResponse("Интервал должен быть положительным числом дней", status_code=400)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        INSERT INTO "ИнтервалРевакцинации" ("ВидЖивотного", "Вакцина", "ИнтервалДней")
+        VALUES (%s, %s, %s)
+        ON CONFLICT ("ВидЖивотного", "Вакцина")
+            DO UPDATE SET "ИнтервалДней" = EXCLUDED."ИнтервалДней"
+        """,
+        (species, vaccine, int(days) if days else None)
+    )
+
+    conn.commit()
+    conn.close()
+    bump("ИнтервалРевакцинации")
+
+    return RedirectResponse("/vaccinations", status_code=303)
@@ -0,0 +1,102 @@
+import asyncio
+import re
+
+import psycopg2.extras
+
+from db import detach_from_request, get_read_connection, primary_pinned
+
+# ==========================================================
+# ОБЪЕДИНЕНИЕ ОДИНАКОВЫХ ЗАПРОСОВ (single-flight)
+#
+# Несколько директоров открыли аналитику одновременно, или браузер
+# одного пользователя параллельно запросил график и таблицу — одинаковые
+# запросы к "Расход" / "Неисправность" выполнялись бы по разу на каждого.
+#
+# await fetchall(sql, params): если такой же запрос (SQL без учёта
+# пробелов + параметры) уже выполняется, вызов ждёт его результат
+# вместо нового обращения к БД. Запрос выполняется в потоке, в контексте
+# первого вызвавшего (класс маршрута, реплика/основной сервер).
+#
+# Это не кэш: как только запрос завершился, следующий вызов пойдёт в БД.
+# Только для чтения.
+# ==========================================================
+
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+_in_flight: dict[tuple, asyncio.Task] = {}
+stats = {"executed": 0, "coalesced": 0}
+
+
+def normalize(sql: str) -> str:
+    """Схлопывает пробелы и переводы строк вне строковых литералов и имён."""
+    parts = _QUOTED.split(sql)
+    # Нечётные элементы — литералы в кавычках, их не трогаем
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part)
+        for i, part in enumerate(parts)
+    ).strip()
+
+
+def _params_key(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return tuple(sorted((k, _params_key(v)) for k, v in params.items()))
+    if isinstance(params, (list, tuple)):
+        return tuple(_params_key(p) for p in params)
+    return params
+
+
+def _run(sql: str, params, fetch: str):
+    # Запрос общий для нескольких ожидающих и может пережить запрос
+    # первого из них — соединение закрывается здесь, а не по его завершении
+    detach_from_request()
+    conn = get_read_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute(sql, params)
+        return cursor.fetchall() if fetch == "all" else cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def _finished(key: tuple, task: asyncio.Task):
+    _in_flight.pop(key, None)
+    # Ошибку могли не забрать, если все ожидавшие ушли
+    if not task.cancelled():
+        task.exception()
+
+
+async def _execute(sql: str, params, fetch: str):
+    # Чтение после записи не должно получить результат запроса к реплике
+    key = (normalize(sql), _params_key(params), fetch, primary_pinned.get())
+
+    task = _in_flight.get(key)
+    if task is None:
+        stats["executed"] += 1
+        # Отдельная задача: отмена первого вызвавшего (клиент ушёл)
+        # не должна отменять запрос для остальных
+        task = asyncio.ensure_future(asyncio.to_thread(_run, sql, params, fetch))
+        _in_flight[key] = task
+        task.add_done_callback(lambda t: _finished(key, t))
+        leader = True
+    else:
+        stats["coalesced"] += 1
+        leader = False
+
+    result = await asyncio.shield(task)
+
+    # Строки — изменяемые словари; каждому ожидавшему своя копия
+    if leader or result is None:
+        return result
+    if fetch == "all":
+        return [dict(r) for r in result]
+    return dict(result)
+
+
+async def fetchall(sql: str, params=None) -> list[dict]:
+    return await _execute(sql, params, "all")
+
+
+async def fetchone(sql: str, params=None) -> dict | None:
+    return await _execute(sql, params, "one")
@@ -0,0 +1,82 @@
+/*
+ * Массовое изменение выбранных строк таблицы.
+ *
+ * <div data-bulk="/animals/health/bulk" data-target="animals-rows">
+ *     <select data-bulk-status>...</select>
+ *     <button data-bulk-apply>Применить</button>
+ *     <span data-bulk-result></span>
+ * </div>
+ * Отмечаются <input type="checkbox" data-bulk-id="N"> внутри tbody#target,
+ * флажок data-bulk-all в шапке выбирает все. Ответ сервера — итог по
+ * каждому ID; после применения таблица перечитывается через форму
+ * фильтров (fragments.js).
+ */
+(function () {
+
+    function checkboxes(target) {
+        return Array.from(document.querySelectorAll("#" + target + " input[data-bulk-id]"));
+    }
+
+    function refresh(target) {
+        const form = document.querySelector('form[data-fragment][data-target="' + target + '"]');
+        if (form) {
+            form.requestSubmit();
+        } else {
+            window.location.reload();
+        }
+    }
+
+    async function apply(panel) {
+        const target = panel.dataset.target;
+        const result = panel.querySelector("[data-bulk-result]");
+        const selected = checkboxes(target).filter(cb => cb.checked);
+
+        if (!selected.length) {
+            result.textContent = "Ничего не выбрано";
+            return;
+        }
+
+        const body = new URLSearchParams();
+        selected.forEach(cb => body.append("ids", cb.dataset.bulkId));
+        body.append("status", panel.querySelector("[data-bulk-status]").value);
+
+        try {
+            const response = await fetch(panel.dataset.bulk, {
+                method: "POST",
+                headers: { "Content-Type": "application/x-www-form-urlencoded" },
+                body: body
+            });
+            const data = await response.json();
+
+            if (!data.success) {
+                alert("Ошибка: " + data.error);
+                return;
+            }
+
+            const failed = data.results.filter(r => r.outcome !== "updated");
+            result.textContent = "Изменено: " + data.updated + " из " + data.results.length;
+
+            if (failed.length) {
+                alert("Не изменены:\n" + failed.map(r => "#" + r.id + " — " + r.message).join("\n"));
+            }
+
+            refresh(target);
+
+        } catch (error) {
+            alert("Ошибка: " + error.message);
+        }
+    }
+
+    document.querySelectorAll("[data-bulk]").forEach(function (panel) {
+        panel.querySelector("[data-bulk-apply]").addEventListener("click", function () {
+            apply(panel);
+        });
+    });
+
+    document.querySelectorAll("input[data-bulk-all]").forEach(function (all) {
+        all.addEventListener("change", function () {
+            checkboxes(all.dataset.bulkAll).forEach(cb => { cb.checked = all.checked; });
+        });
+    });
+
+})();
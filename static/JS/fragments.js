@@ -0,0 +1,67 @@
+/*
+ * Частичное обновление таблиц при смене фильтров.
+ *
+ * Форма с атрибутами
+ *     data-fragment="/animals/rows"   — URL фрагмента (только <tr>...</tr>)
+ *     data-target="animals-rows"      — id элемента <tbody>, который заменяем
+ * вместо полной перезагрузки страницы запрашивает фрагмент с теми же
+ * параметрами и подменяет содержимое tbody. Адрес в строке браузера
+ * обновляется, поэтому F5 и «Назад» по-прежнему открывают полную страницу.
+ * Без JS форма работает как обычный GET.
+ */
+(function () {
+
+    async function loadFragment(form) {
+        const target = document.getElementById(form.dataset.target);
+        if (!target) {
+            form.submit();
+            return;
+        }
+
+        const query = new URLSearchParams(new FormData(form)).toString();
+
+        try {
+            const response = await fetch(form.dataset.fragment + "?" + query, {
+                headers: { "X-Requested-With": "fetch" }
+            });
+
+            if (!response.ok) {
+                form.submit();
+                return;
+            }
+
+            target.innerHTML = await response.text();
+
+            const pageUrl = (form.getAttribute("action") || window.location.pathname)
+                + (query ? "?" + query : "");
+            window.history.replaceState(null, "", pageUrl);
+
+            document.dispatchEvent(new CustomEvent("fragment:loaded", { detail: { target: target } }));
+
+        } catch (error) {
+            form.submit();
+        }
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("form[data-fragment]").forEach(function (form) {
+
+            form.addEventListener("submit", function (event) {
+                // Кнопки с formaction (например, экспорт CSV) отправляют форму как обычно
+                if (event.submitter && event.submitter.hasAttribute("formaction")) {
+                    return;
+                }
+                event.preventDefault();
+                loadFragment(form);
+            });
+
+            // Выпадающие списки и чекбоксы применяем сразу
+            form.querySelectorAll("select, input[type=checkbox], input[type=date]").forEach(function (el) {
+                el.addEventListener("change", function () {
+                    loadFragment(form);
+                });
+            });
+        });
+    });
+
+})();
@@ -0,0 +1,98 @@
+/*
+ * Живое обновление таблиц через /events (Server-Sent Events).
+ *
+ * <tbody data-live="feeds"> подписывает страницу на тему. Изменённые строки
+ * правятся на месте (id строк — malfunction-N, feed-N, animal-N), а новые,
+ * удалённые и строки, у которых меняется набор кнопок, — перезагрузкой
+ * фрагмента таблицы через форму фильтров (fragments.js).
+ * Событие "reload" — часть событий потеряна, перечитываем всё.
+ */
+(function () {
+
+    const RELOAD_DELAY = 400;
+    const timers = {};
+
+    function refresh(tbody) {
+        clearTimeout(timers[tbody.id]);
+        timers[tbody.id] = setTimeout(function () {
+            const form = document.querySelector('form[data-fragment][data-target="' + tbody.id + '"]');
+            if (form) {
+                form.requestSubmit();
+            } else {
+                window.location.reload();
+            }
+        }, RELOAD_DELAY);
+    }
+
+    function setField(row, field, text) {
+        const cell = row.querySelector('[data-field="' + field + '"]');
+        if (cell) cell.textContent = text;
+    }
+
+    // Каждая функция возвращает true, если строка обновлена на месте
+    const patchers = {
+        malfunctions: function (e) {
+            const row = document.getElementById("malfunction-" + e.id);
+            if (!row || e.status === "Устранено") return false;
+
+            setField(row, "description", e.description);
+            setField(row, "status", e.status);
+            setField(row, "solved_at", e.solved_at || "—");
+            return true;
+        },
+
+        feeds: function (e) {
+            const row = document.getElementById("feed-" + e.id);
+            if (!row) return false;
+
+            const cell = row.querySelector('[data-field="stock"]');
+            if (cell) {
+                cell.textContent = e.stock + " кг ";
+                if (e.is_low) {
+                    const badge = document.createElement("span");
+                    badge.className = "badge-low";
+                    badge.textContent = "мало";
+                    cell.appendChild(badge);
+                }
+            }
+            row.classList.toggle("low-stock", !!e.is_low);
+            return true;
+        },
+
+        animals: function (e) {
+            const text = document.getElementById("text-" + e.id);
+            if (!text || e.health_status === "Умер") return false;
+
+            text.textContent = e.health_status;
+            const select = document.getElementById("select-" + e.id);
+            if (select) select.value = e.health_status;
+            return true;
+        }
+    };
+
+    document.addEventListener("DOMContentLoaded", function () {
+        const bodies = {};
+        document.querySelectorAll("tbody[data-live]").forEach(function (tbody) {
+            bodies[tbody.dataset.live] = tbody;
+        });
+
+        const topics = Object.keys(bodies);
+        if (topics.length === 0 || !window.EventSource) return;
+
+        const source = new EventSource("/events?topics=" + encodeURIComponent(topics.join(",")));
+
+        topics.forEach(function (topic) {
+            source.addEventListener(topic, function (message) {
+                const e = JSON.parse(message.data);
+                if (e.op !== "UPDATE" || !patchers[topic](e)) {
+                    refresh(bodies[topic]);
+                }
+            });
+        });
+
+        source.addEventListener("reload", function () {
+            topics.forEach(function (topic) { refresh(bodies[topic]); });
+        });
+    });
+
+})();
@@ -0,0 +1,78 @@
+import uuid
+
+import psycopg2.extras
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from db import get_read_connection
+
+# ================================
+# ПОТОКОВЫЙ РЕНДЕР БОЛЬШИХ ТАБЛИЦ
+# ================================
+# ServerCursor читает строки порциями через серверный (именованный)
+# курсор PostgreSQL, а stream_template отдаёт HTML по мере рендера
+# шаблона. Первые байты страницы уходят клиенту, пока остальные строки
+# ещё читаются из БД; в памяти держится только одна порция строк.
+#
+# В шаблоне такие строки перебираются только один раз и без |length:
+#     {% for row in rows %} ... {% else %} нет данных {% endfor %}
+
+ROWS_PER_FETCH = 500        # строк за один round trip к БД
+HTML_BUFFER_CHUNKS = 200    # сколько кусков шаблона склеивать в одну отправку
+
+
+class ServerCursor:
+    """Итератор по результату запроса через именованный курсор."""
+
+    def __init__(self, sql: str, params=None, itersize: int = ROWS_PER_FETCH):
+        self.sql = sql
+        self.params = params
+        self.itersize = itersize
+        self.conn = None
+
+    def __iter__(self):
+        self.conn = get_read_connection()
+        try:
+            cursor = self.conn.cursor(
+                name=f"stream_{uuid.uuid4().hex[:12]}",
+                cursor_factory=psycopg2.extras.RealDictCursor,
+            )
+            cursor.itersize = self.itersize
+            cursor.execute(self.sql, self.params)
+
+            for row in cursor:
+                yield row
+
+            cursor.close()
+        finally:
+            self.close()
+
+    def close(self):
+        # Вызывается и при обрыве соединения клиентом (BackgroundTask)
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+        self.conn = None
+
+
+def stream_template(templates, request: Request, name: str, context: dict,
+                    cursors: tuple = ()) -> StreamingResponse:
+    """
+    Аналог templates.TemplateResponse, но HTML отдаётся потоком.
+    cursors — ServerCursor'ы из context, которые надо гарантированно закрыть.
+    """
+    context["request"] = request
+    context.setdefault("user", getattr(request.state, "user", None))
+
+    stream = templates.get_template(name).stream(context)
+    stream.enable_buffering(HTML_BUFFER_CHUNKS)
+
+    def close_all():
+        for c in cursors:
+            c.close()
+
+    return StreamingResponse(
+        stream,
+        media_type="text/html; charset=utf-8",
+        background=BackgroundTask(close_all),
+    )
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import uuid
+from functools import wraps
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from session import session_data
+
+# ================================
+# СЧЁТЧИКИ ИЗМЕНЕНИЙ ТАБЛИЦ
+# ================================
+# Каждый путь записи в роутерах после commit() вызывает bump(...)
+# для затронутых таблиц. Страницы строят слабый ETag из версий
+# таблиц, которые они читают, и отвечают 304 без запроса к БД.
+#
+# Эпоха процесса входит в ETag: после перезапуска сервера
+# счётчики начинаются с нуля, и старые ETag браузеров не совпадут.
+#
+# Кроме таблиц можно отмечать произвольные ключи ("Сотрудник:5") —
+# для счётчиков это такие же имена.
+#
+# Другие процессы узнают об изменениях через invalidation_bus.py:
+# он подписан на bump() (on_bump) и вызывает apply_remote()/flush().
+
+_epoch = uuid.uuid4().hex[:8]
+_versions: dict[str, int] = {}
+_lock = threading.Lock()
+_bump_hooks: list = []
+
+
+def _increment(tables):
+    with _lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+def bump(*tables: str):
+    """Отмечает, что данные таблиц изменились (и сообщает другим процессам)."""
+    _increment(tables)
+    for hook in _bump_hooks:
+        hook(tables)
+
+
+def on_bump(hook):
+    """hook(tables) после каждого локального bump()."""
+    _bump_hooks.append(hook)
+
+
+def apply_remote(tables):
+    """Изменение из другого процесса: только локальные счётчики."""
+    _increment(tables)
+
+
+def flush():
+    """
+    Полный сброс: новая эпоха делает недействительными все ETag,
+    ключи TableCache и прочие снимки версий этого процесса.
+    """
+    global _epoch
+    with _lock:
+        _epoch = uuid.uuid4().hex[:8]
+
+
+def version(table: str) -> int:
+    return _versions.get(table, 0)
+
+
+def snapshot(tables) -> tuple:
+    """Текущие версии набора таблиц (для ключей кэша)."""
+    return (_epoch,) + tuple(_versions.get(t, 0) for t in tables)
+
+
+def make_etag(tables, *parts) -> str:
+    raw = "|".join(
+        [_epoch]
+        + [f"{t}:{_versions.get(t, 0)}" for t in tables]
+        + [str(p) for p in parts]
+    )
+    return 'W/"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Слабое сравнение: префикс W/ не учитываем
+    tag = etag.removeprefix("W/")
+    return any(c.strip().removeprefix("W/") == tag for c in header.split(","))
+
+
+def etag_cached(*tables: str):
+    """
+    Условный GET для HTML-страниц.
+    ETag = версии таблиц + текущий пользователь + путь и параметры запроса.
+    При совпадении If-None-Match сразу отдаём 304.
+    Ставится ПОСЛЕ @role_required.
+    """
+
+    def decorator(func):
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs.get("request")
+            if not request and len(args) > 0:
+                request = args[0]
+
+            # Внутренние вызовы из POST-обработчиков (с сообщением об ошибке) не кэшируем
+            if request is None or request.method != "GET":
+                return await func(*args, **kwargs)
+
+            etag = make_etag(
+                tables,
+                session_data.get("current_user_id"),
+                request.url.path,
+                sorted(request.query_params.multi_items()),
+            )
+
+            if _etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(
+                    status_code=304,
+                    headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+                )
+
+            response = await func(*args, **kwargs)
+
+            if response.status_code == 200:
+                response.headers["ETag"] = etag
+                response.headers["Cache-Control"] = "private, no-cache"
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,43 @@
+import pytest
+
+from feeding_schedule import FeedingFrequency, parse_frequency
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Несколько раз в день
+    ("2 раза в день", FeedingFrequency(2, 1)),
+    ("три раза в сутки", FeedingFrequency(3, 1)),
+    ("дважды в день", FeedingFrequency(2, 1)),
+    ("раз в день", FeedingFrequency(1, 1)),
+    ("ежедневно", FeedingFrequency(1, 1)),
+    ("утром и вечером", FeedingFrequency(2, 1)),
+    ("утро, обед, вечер", FeedingFrequency(3, 1)),
+    ("каждые 6 часов", FeedingFrequency(3, 1)),
+    ("каждые 4 ч", FeedingFrequency(4, 1)),
+
+    # Раз в несколько дней
+    ("через день", FeedingFrequency(1, 2)),
+    ("раз в 3 дня", FeedingFrequency(1, 3)),
+    ("1 раз в 2 дня", FeedingFrequency(1, 2)),
+    ("каждые 3 дня", FeedingFrequency(1, 3)),
+    ("каждые двое суток", FeedingFrequency(1, 2)),
+    ("каждый день", FeedingFrequency(1, 1)),
+
+    # Недельные
+    ("раз в неделю", FeedingFrequency(1, 7)),
+    ("еженедельно", FeedingFrequency(1, 7)),
+    ("3 раза в неделю", FeedingFrequency(1, 2)),
+    ("2 раза в неделю", FeedingFrequency(1, 4)),
+    ("7 раз в неделю", FeedingFrequency(1, 1)),
+    ("14 раз в неделю", FeedingFrequency(2, 1)),
+    ("раз в 2 недели", FeedingFrequency(1, 14)),
+
+    # Регистр, «ё» и пустые значения
+    ("2 Раза В День", FeedingFrequency(2, 1)),
+    ("через день, утром", FeedingFrequency(1, 2)),
+    (None, FeedingFrequency(2, 1)),
+    ("", FeedingFrequency(2, 1)),
+    ("по настроению", FeedingFrequency(2, 1)),
+])
+def test_parse_frequency(text, expected):
+    assert parse_frequency(text) == expected